@@ -0,0 +1,406 @@
+# RDBMS Normalizer benchmarks
+# Times every normalization stage on seeded, generated schemas and compares the results against stored baselines.
+
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Iterator
+
+import main
+
+BASELINE_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json"
+)
+
+# Generator settings and the normal form to normalize to for each named benchmark. "wide" and "tall" reach the target
+# scale of 1,000 attributes and 1M rows along one axis each; both at once is left to an explicit --attributes/--rows
+# run. Only "small" goes on to 5NF, whose join dependency search would dominate the larger timings.
+PRESETS = {
+    "small": {
+        "attributes": 40,
+        "fds": 12,
+        "shape": "mixed",
+        "mvds": 1,
+        "multivalued": 2,
+        "rows": 2000,
+        "target": "5NF",
+    },
+    "medium": {
+        "attributes": 200,
+        "fds": 60,
+        "shape": "mixed",
+        "mvds": 2,
+        "multivalued": 4,
+        "rows": 10000,
+        "target": "4NF",
+    },
+    "wide": {
+        "attributes": 1000,
+        "fds": 300,
+        "shape": "mixed",
+        "mvds": 0,
+        "multivalued": 10,
+        "rows": 1000,
+        "target": "BCNF",
+    },
+    "tall": {
+        "attributes": 12,
+        "fds": 4,
+        "shape": "mixed",
+        "mvds": 1,
+        "multivalued": 0,
+        "rows": 1000000,
+        "target": "4NF",
+    },
+}
+
+SHAPES = ["chain", "star", "cyclic", "mixed"]
+
+# The stages main.normalize records, in the order they run
+STAGES = [
+    "interpret_input",
+    "minimal_cover",
+    "one_nf",
+    "two_nf",
+    "three_nf",
+    "bcnf",
+    "four_nf",
+    "five_nf",
+    "drop_subsumed",
+    "lossless_join",
+    "lost_dependencies",
+    "output_results",
+]
+
+TARGETS = ["1NF", "2NF", "3NF", "BCNF", "4NF", "5NF"]
+
+# Rows of an MVD-independent attribute per entity, and values of the second key attribute per entity
+MVD_FANOUT = 2
+KEY_FANOUT = 5
+
+# A stage is only reported as a regression if it got slower by this share of its baseline and by at least
+# MIN_REGRESSION seconds, so timings too small to measure reliably don't fail a check
+DEFAULT_TOLERANCE = 0.5
+MIN_REGRESSION = 0.05
+
+# Values in the calibration workload
+CALIBRATION_SIZE = 200000
+
+
+class SchemaGenerator:
+    """Seeded generator for a schema file with a consistent data section.
+
+    The primary key is K0, K1 and one attribute M<i> per multivalued dependency. For each K0 the rows are the cross
+    product of KEY_FANOUT values of K1 and MVD_FANOUT values of every M<i>, so {K0} ->> {M<i>} holds. The other
+    attributes are split into fds groups, each determined by one FD whose determinant depends on the shape:
+        chain  - the first attribute of the previous group (a transitive chain through the whole relation)
+        star   - part of the key (partial dependencies radiating from K0 and K1)
+        cyclic - a key attribute, with the group's first attribute determining it back (alternative candidate keys)
+        mixed  - any of the above, picked per group
+    Every value is a deterministic function of the values it depends on, so all declared dependencies hold in the
+    data. The first multivalued attributes are declared as Multi-Valued Attributes for 1NF to split off.
+    """
+
+    def __init__(
+        self,
+        attributes: int,
+        fds: int,
+        shape: str = "mixed",
+        mvds: int = 0,
+        multivalued: int = 0,
+        rows: int = 1000,
+        seed: int = 0,
+    ):
+        if shape not in SHAPES:
+            raise ValueError(
+                f"Unknown FD shape {shape} (use one of {', '.join(SHAPES)})"
+            )
+        self.rng = random.Random(seed)
+        self.rows = rows
+        self.key = ["K0", "K1"]
+        self.mvd_attrs = [f"M{i}" for i in range(mvds)]
+        others = [f"A{i}" for i in range(max(attributes - len(self.key) - mvds, 1))]
+        self.types = {name: "INTEGER" for name in self.key}
+        for name in self.mvd_attrs + others:
+            self.types[name] = self.rng.choice(["INTEGER", "VARCHAR(20)"])
+        self.multivalued = others[:multivalued]
+
+        # Split the non-key attributes into fds groups, each with the FD (determinant, group) defining its values
+        fds = max(1, min(fds, len(others)))
+        size, extra = divmod(len(others), fds)
+        self.groups: list[tuple[list[str], list[str]]] = []
+        self.reverse: list[tuple[str, str]] = []
+        start = 0
+        for g in range(fds):
+            group = others[start : start + size + (g < extra)]
+            start += len(group)
+            group_shape = shape if shape != "mixed" else self.rng.choice(SHAPES[:3])
+            if group_shape == "chain" and self.groups:
+                det = [self.groups[-1][1][0]]
+            elif group_shape == "cyclic":
+                det = [self.rng.choice(self.key)]
+                self.reverse.append((group[0], det[0]))
+            else:
+                det = self.rng.choice([["K0"], ["K1"], ["K0", "K1"]])
+            self.groups.append((det, group))
+        # Attributes that mirror their determinant one to one (so the reverse FD holds) instead of hashing it
+        self.mirrors = {dep for dep, _ in self.reverse}
+        self.domains = {name: self.rng.randint(2, 1000) for name in others}
+        self.salts = {name: self.rng.getrandbits(32) for name in self.types}
+
+    def attributes(self) -> list[str]:
+        """Attribute names in schema order."""
+        return (
+            self.key
+            + self.mvd_attrs
+            + [name for _, group in self.groups for name in group]
+        )
+
+    def schema_lines(self) -> list[str]:
+        """The schema part of the file, up to (not including) the data section."""
+        lines = [
+            "Table: Generated",
+            "Attributes: "
+            + ", ".join(f"{name}:{self.types[name]}" for name in self.attributes()),
+            "Primary Key: {" + ", ".join(self.key + self.mvd_attrs) + "}",
+            "Candidate Keys: None",
+            "Multi-Valued Attributes: "
+            + (", ".join(self.multivalued) if self.multivalued else "None"),
+            "Functional Dependencies:",
+        ]
+        for det, group in self.groups:
+            lines.append("{" + ", ".join(det) + "} -> {" + ", ".join(group) + "}")
+        for dep, det in self.reverse:
+            lines.append("{" + dep + "} -> {" + det + "}")
+        rest = [name for name in self.attributes() if name != "K0"]
+        for mvd_attr in self.mvd_attrs:
+            others = [name for name in rest if name != mvd_attr]
+            lines.append("{K0} ->> {" + mvd_attr + "} | {" + ", ".join(others) + "}")
+        return lines
+
+    def data_rows(self) -> Iterator[list[int]]:
+        """Yield the tuples in attribute order as integers; text attributes are prefixed when written."""
+        per_entity = KEY_FANOUT * MVD_FANOUT ** len(self.mvd_attrs)
+        for r in range(self.rows):
+            k0, digits = divmod(r, per_entity)
+            values = {"K0": k0, "K1": digits % KEY_FANOUT}
+            digits //= KEY_FANOUT
+            for name in self.mvd_attrs:
+                digits, digit = divmod(digits, MVD_FANOUT)
+                values[name] = hash((self.salts[name], k0)) % 1000 * MVD_FANOUT + digit
+            for det, group in self.groups:
+                det_values = tuple([values[name] for name in det])
+                for name in group:
+                    if name in self.mirrors:
+                        values[name] = det_values[0]
+                    else:
+                        values[name] = (
+                            hash((self.salts[name],) + det_values) % self.domains[name]
+                        )
+            yield [values[name] for name in self.attributes()]
+
+    def write(self, filename: str) -> None:
+        """Write the schema and its data section to a file in the input format."""
+        prefixes = [
+            "s" if self.types[name].startswith("VARCHAR") else ""
+            for name in self.attributes()
+        ]
+        with open(filename, "w", buffering=main.OUTPUT_BUFFER_SIZE) as out:
+            out.writelines(line + "\n" for line in self.schema_lines())
+            if self.rows:
+                out.write("Data:\n")
+                out.writelines(
+                    ", ".join(
+                        [prefix + str(value) for prefix, value in zip(prefixes, row)]
+                    )
+                    + "\n"
+                    for row in self.data_rows()
+                )
+
+
+def run_stages(
+    filename: str, output_filename: str, target: str = "5NF"
+) -> dict[str, float]:
+    """Normalize a schema file to the target normal form with main.normalize, without prompts, and return the time
+    each stage took in seconds as recorded by main.instrument. The run's counters are left in main.instrument.
+    """
+    main.instrument.reset()
+    with main.instrument.stage("interpret_input"):
+        relation = main.interpret_input(filename)
+    tables, _, _ = main.normalize(relation, target, interactive=False)
+    with main.instrument.stage("output_results"):
+        main.output_results(output_filename, tables)
+    return {name: record[0] for name, record in main.instrument.stages.items()}
+
+
+def calibrate(rounds: int = 3) -> float:
+    """Seconds a fixed pure-Python workload takes on this machine, best of rounds. Baselines store it, so a check on
+    a faster or slower machine can scale the stored timings by the ratio before comparing.
+    """
+    rng = random.Random(0)
+    values = [rng.randrange(1 << 30) for _ in range(CALIBRATION_SIZE)]
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        buckets: dict[int, int] = {}
+        for value in values:
+            buckets[value & 0xFFF] = buckets.get(value & 0xFFF, 0) | value
+        sorted(values)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def benchmark(params: dict, seed: int = 0, repeat: int = 1) -> dict[str, float]:
+    """Generate the schema described by params and time every stage up to its target normal form on it, keeping each
+    stage's best of repeat runs. The normalizer runs in quiet mode, and what it still prints is discarded.
+    """
+    params = dict(params)
+    target = params.pop("target", "5NF")
+    best: dict[str, float] = {}
+    main.instrument.quiet = True
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "schema.txt")
+        SchemaGenerator(seed=seed, **params).write(filename)
+        for _ in range(repeat):
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                timings = run_stages(
+                    filename, os.path.join(directory, "normalized.txt"), target
+                )
+            for name, seconds in timings.items():
+                best[name] = min(seconds, best.get(name, seconds))
+    return best
+
+
+def regressions(
+    timings: dict[str, float], baseline: dict[str, float], tolerance: float
+) -> list[str]:
+    """The stages that got slower than the baseline allows."""
+    return [
+        name
+        for name, seconds in timings.items()
+        if name in baseline
+        and seconds > baseline[name] * (1 + tolerance)
+        and seconds - baseline[name] > MIN_REGRESSION
+    ]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in ["-h", "--help"]:
+        print("Usage: python benchmark.py [PRESET ...] [options]")
+        print(
+            f"Presets: {', '.join(PRESETS)} (default: small). Options override the preset's generator settings:"
+        )
+        print(
+            "  --attributes=N --fds=N --shape=chain|star|cyclic|mixed --mvds=N --multivalued=N --rows=N --seed=N"
+        )
+        print("  --target=NF     normalize up to this normal form (1NF ... 5NF)")
+        print("  --repeat=N      keep the best of N runs of each stage")
+        print("  --save          store the timings as the presets' baselines")
+        print(
+            f"  --check         exit with 1 if a stage is slower than its baseline (tolerance {DEFAULT_TOLERANCE})"
+        )
+        print(
+            "                  Baselines are scaled by this machine's calibration run against the one they were saved with"
+        )
+        print("  --tolerance=X   allowed slowdown as a share of the baseline")
+        print(
+            f"  --baseline=FILE baseline file (default {os.path.basename(BASELINE_FILE)})"
+        )
+        sys.exit()
+
+    overrides = {}
+    seed = 0
+    repeat = 1
+    tolerance = DEFAULT_TOLERANCE
+    baseline_file = BASELINE_FILE
+    for arg in sys.argv[1:]:
+        if not arg.startswith("--") or "=" not in arg:
+            continue
+        key, value = arg[2:].split("=", 1)
+        if key in ["attributes", "fds", "mvds", "multivalued", "rows"]:
+            overrides[key] = int(value)
+        elif key == "shape":
+            overrides[key] = value
+        elif key == "target":
+            overrides[key] = value.upper()
+        elif key == "seed":
+            seed = int(value)
+        elif key == "repeat":
+            repeat = int(value)
+        elif key == "tolerance":
+            tolerance = float(value)
+        elif key == "baseline":
+            baseline_file = value
+    presets = [arg for arg in sys.argv[1:] if not arg.startswith("--")] or ["small"]
+    for name in presets:
+        if name not in PRESETS:
+            print(f"Error: Unknown preset {name} (use one of {', '.join(PRESETS)}).")
+            sys.exit(1)
+    if overrides.get("target", "5NF") not in TARGETS:
+        print(f"Error: --target needs one of the following: {', '.join(TARGETS)}")
+        sys.exit(1)
+
+    baselines = {}
+    if os.path.isfile(baseline_file):
+        with open(baseline_file) as source:
+            baselines = json.load(source)
+
+    # Baselines are stored with the calibration time of the machine that made them, and scaled to this one's
+    calibration = calibrate()
+    print(f"Calibration: {calibration:.3f}s")
+    failed = []
+    for name in presets:
+        params = {**PRESETS[name], **overrides}
+        print(
+            f"Benchmark {name}: "
+            + ", ".join(f"{key}={value}" for key, value in params.items())
+            + f", seed={seed}"
+        )
+        timings = benchmark(params, seed, repeat)
+        stored = baselines.get(name)
+        # Timings are only comparable with a baseline generated from the same settings
+        if stored is not None and (
+            stored["params"] != params or stored["seed"] != seed
+        ):
+            stored = None
+        base = {}
+        if stored:
+            scale = calibration / stored.get("calibration", calibration)
+            base = {
+                stage: seconds * scale for stage, seconds in stored["seconds"].items()
+            }
+        slow = regressions(timings, base, tolerance)
+        for stage in [stage for stage in STAGES if stage in timings]:
+            line = f"  {stage:<18}{timings[stage]:>10.3f}s"
+            if stage in base:
+                line += f"  baseline {base[stage]:.3f}s ({timings[stage] / max(base[stage], 1e-9):.2f}x)"
+            if stage in slow:
+                line += "  REGRESSION"
+            print(line)
+        print(f"  {'total':<18}{sum(timings.values()):>10.3f}s")
+        for counter, amount in sorted(main.instrument.counters.items()):
+            print(f"  {counter:<22}{amount:>10}")
+        failed += [f"{name}.{stage}" for stage in slow]
+        if "--save" in sys.argv:
+            baselines[name] = {
+                "params": params,
+                "seed": seed,
+                "calibration": calibration,
+                "seconds": timings,
+            }
+
+    if "--save" in sys.argv:
+        with open(baseline_file, "w") as dest:
+            json.dump(baselines, dest, indent=4)
+            dest.write("\n")
+        print(f"Baselines have been saved to {baseline_file}")
+    if "--check" in sys.argv:
+        if failed:
+            print(f"Regressions: {', '.join(failed)}")
+            sys.exit(1)
+        print("No regressions against the baselines.")
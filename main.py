@@ -2,34 +2,269 @@
 # By Adam Burton
 
 
+import array
+import concurrent.futures
+import contextlib
+import cProfile
+import csv
+import datetime
+import decimal
+import glob
+import io
+import itertools
+import json
+import os
+import random
 import sys
-from typing import Self
+import time
+import tracemalloc
+from typing import Iterable, Iterator, Self
+
+# Tuples read per chunk by the bulk data loader
+DATA_CHUNK_SIZE = 10000
+# Buffer size of the files results are written to
+OUTPUT_BUFFER_SIZE = 1 << 20
+
+
+class Instrumentation:
+    """Progress messages, counters and per-stage measurements of a run.
+
+    Messages are logged with str.format arguments, which are only formatted if the message is printed: quiet mode
+    drops every message without formatting it except warnings, and trace messages (the step by step detail of the normal form
+    methods) are only printed when verbose. Counters record events such as FDs examined, relations created and
+    closures computed. stage() times a block and, when trace_memory is set, records the peak memory allocated in it
+    as seen by tracemalloc.
+    """
+
+    quiet: bool
+    verbose: bool
+    trace_memory: bool
+    counters: dict[str, int]
+    stages: dict[str, list]
+
+    def __init__(self):
+        self.quiet = False
+        self.verbose = False
+        self.trace_memory = False
+        self.reset()
+
+    def reset(self) -> None:
+        """Clear the counters and stage measurements."""
+        self.counters = {}
+        # Stage name -> [seconds, peak bytes allocated, runs]
+        self.stages = {}
+
+    def log(self, message: str, *args) -> None:
+        """Print a progress message, unless quiet."""
+        if not self.quiet:
+            print(message.format(*args) if args else message)
+
+    def warn(self, message: str, *args) -> None:
+        """Print a warning, even when quiet."""
+        print(message.format(*args) if args else message)
+
+    def trace(self, message: str, *args) -> None:
+        """Print a detail message, only when verbose (and not quiet)."""
+        if self.verbose and not self.quiet:
+            print(message.format(*args) if args else message)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def merge(self, counters: dict[str, int]) -> None:
+        """Add counters collected elsewhere (e.g. in a worker process)."""
+        for name, amount in counters.items():
+            self.count(name, amount)
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Measure the wall-clock time (and with trace_memory, the peak allocation) of the block as stage name."""
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = self.stages.setdefault(name, [0.0, 0, 0])
+            record[0] += time.perf_counter() - start
+            if self.trace_memory:
+                record[1] = max(record[1], tracemalloc.get_traced_memory()[1] - base)
+            record[2] += 1
+
+    @contextlib.contextmanager
+    def profile(self, filename: str | None) -> Iterator[None]:
+        """Run the block under cProfile and write the statistics to filename (for pstats); does nothing if filename is
+        None."""
+        if filename is None:
+            yield
+            return
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(filename)
+
+    def report(self) -> list[str]:
+        """Lines summarizing the stage measurements and counters."""
+        lines = []
+        for name, (seconds, peak, runs) in self.stages.items():
+            line = f"{name:<24}{seconds:>10.3f}s"
+            if self.trace_memory:
+                line += f"{peak / 1024 / 1024:>10.1f} MiB peak"
+            if runs > 1:
+                line += f"  ({runs} runs)"
+            lines.append(line)
+        for name, amount in sorted(self.counters.items()):
+            lines.append(f"{name:<24}{amount:>10}")
+        return lines
+
+
+# Shared by every part of the normalizer (each worker process has its own)
+instrument = Instrumentation()
+
+
+class AttributeTable:
+    """Interned attribute IDs for one schema. Attribute sets are stored as integer bitmasks over these IDs, so subset,
+    union and membership tests are single integer operations."""
+
+    names: list[str]
+    types: list[str]
+    ids: dict[str, int]
+
+    def __init__(self, attrs: list[list[str]] | None = None):
+        self.names = []
+        self.types = []
+        self.ids = {}
+        if attrs:
+            for attr in attrs:
+                self.intern(attr[0], attr[1] if len(attr) > 1 else "")
+
+    def intern(self, name: str, typ: str = "") -> int:
+        """Return the ID of the given attribute, assigning a new one if it hasn't been seen before."""
+        attr_id = self.ids.get(name)
+        if attr_id is None:
+            attr_id = len(self.names)
+            self.ids[name] = attr_id
+            self.names.append(name)
+            self.types.append(typ)
+        elif typ and not self.types[attr_id]:
+            self.types[attr_id] = typ
+        return attr_id
+
+    def bit(self, name: str) -> int:
+        """Bitmask of a single attribute (0 if the attribute is unknown)."""
+        attr_id = self.ids.get(name)
+        return 0 if attr_id is None else 1 << attr_id
+
+    def mask(self, names: list[str]) -> int:
+        """Bitmask of a list of attribute names, interning any that are new."""
+        result = 0
+        for name in names:
+            result |= 1 << self.intern(name)
+        return result
+
+    def names_of(self, mask: int) -> list[str]:
+        """Attribute names contained in a bitmask, in ID order."""
+        result = []
+        while mask:
+            low = mask & -mask
+            result.append(self.names[low.bit_length() - 1])
+            mask ^= low
+        return result
+
+    def typed(self, names: list[str]) -> list[list[str]]:
+        """Pair each attribute name with its data type, in the [name, type] form used by Relation.attributes."""
+        return [[name, self.types[self.intern(name)]] for name in names]
 
 
 class FunctionalDependency:
-    determinant: list[str]
-    dependents: list[str]
+    """An immutable functional (or multivalued) dependency. The attribute names are kept in tuples, so FDs derived
+    from one another share them, and operations that change an FD return a new one instead of modifying it, which
+    makes FDs safe to share between relations and decompositions."""
+
+    __slots__ = (
+        "determinant",
+        "dependents",
+        "attr_table",
+        "det_mask",
+        "dep_masks",
+        "dep_mask",
+    )
+
+    determinant: tuple[str, ...]
+    dependents: tuple[tuple[str, ...], ...]
+    attr_table: AttributeTable
+    det_mask: int
+    dep_masks: tuple[int, ...]
+    dep_mask: int
+
+    def __init__(
+        self,
+        det: Iterable[str],
+        deps: Iterable[Iterable[str]],
+        attr_table: AttributeTable | None = None,
+    ):
+        det = tuple(det)
+        deps = tuple(tuple(dep_set) for dep_set in deps)
+        attr_table = attr_table if attr_table is not None else AttributeTable()
+        # Interning the attributes caches the determinant/dependent bitmasks
+        dep_masks = tuple(attr_table.mask(dep_set) for dep_set in deps)
+        dep_mask = 0
+        for mask in dep_masks:
+            dep_mask |= mask
+        object.__setattr__(self, "determinant", det)
+        object.__setattr__(self, "dependents", deps)
+        object.__setattr__(self, "attr_table", attr_table)
+        object.__setattr__(self, "det_mask", attr_table.mask(det))
+        object.__setattr__(self, "dep_masks", dep_masks)
+        object.__setattr__(self, "dep_mask", dep_mask)
 
-    def __init__(self, det: list[str], deps: list[list[str]]):
-        self.determinant = det
-        self.dependents = deps
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError(f"FunctionalDependency is immutable (tried to set {name})")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(
+            f"FunctionalDependency is immutable (tried to delete {name})"
+        )
+
+    def __reduce__(self):
+        return (
+            FunctionalDependency,
+            (self.determinant, self.dependents, self.attr_table),
+        )
+
+    def rebind(self, attr_table: AttributeTable) -> Self:
+        """The same FD with its attributes interned in another attribute table (self if it already uses it)."""
+        if attr_table is self.attr_table:
+            return self
+        return FunctionalDependency(self.determinant, self.dependents, attr_table)
 
     def is_dep(self, attr: str) -> bool:
-        result = False
-        for i in range(len(self.dependents)):
-            if attr in self.dependents[i]:
-                result = True
-        return result
+        return bool(self.dep_mask & self.attr_table.bit(attr))
 
-    def remove_dep(self, attr: str) -> None:
-        for i in range(len(self.dependents)):
-            if attr in self.dependents[i]:
-                self.dependents[i].remove(attr)
-        # self.dependents.remove(attr)
+    def remove_dep(self, attr: str) -> Self:
+        """A copy of the FD without attr among its dependents."""
+        return FunctionalDependency(
+            self.determinant,
+            [
+                (
+                    dep_set
+                    if attr not in dep_set
+                    else [dep for dep in dep_set if dep != attr]
+                )
+                for dep_set in self.dependents
+            ],
+            self.attr_table,
+        )
 
     def det_contains(self, attrs: list[str]) -> bool:
-        for i in range(len(attrs)):
-            if attrs[i] in self.determinant:
+        for attr in attrs:
+            if self.det_mask & self.attr_table.bit(attr):
                 return True
         return False
 
@@ -40,33 +275,690 @@ class FunctionalDependency:
             return True
 
     def copy(self) -> Self:
-        return FunctionalDependency(self.determinant, self.dependents)
+        # FDs can't change, so a copy is the FD itself
+        return self
 
     def __str__(self) -> str:
         """Pretty print of FunctionalDependency"""
-        output = "{"
-        for det in self.determinant[:-1]:
-            output += det + ", "
-        if len(self.dependents) == 1:
-            output += self.determinant[-1] + "} -> {"
-        else:
-            output += self.determinant[-1] + "} ->> {"
-        if len(self.dependents) == 1:
-            for dep in self.dependents[0][:-1]:
-                output += dep + ", "
-            output += self.dependents[0][-1] + "}"
+        arrow = " -> " if len(self.dependents) == 1 else " ->> "
+        return (
+            "{"
+            + ", ".join(self.determinant)
+            + "}"
+            + arrow
+            + " | ".join("{" + ", ".join(deps) + "}" for deps in self.dependents)
+        )
+
+
+# Every modification of an FDList draws a fresh number, so a cache tagged with a version can never be mistaken for
+# one built from a different list
+_fd_versions = itertools.count(1)
+
+
+class FDList(list):
+    """A list of FunctionalDependency objects that takes a new version number whenever it is modified, letting
+    relations invalidate cached closures.
+
+    The list also keeps inverted indexes from each attribute ID to the FDs using it in their determinant and in their
+    dependents, so the FDs touching a set of attributes are found without scanning the whole list. Appending or
+    removing FDs updates the indexes for just those FDs; reordering the list rebuilds them. Since FDs are immutable,
+    an indexed FD never goes stale, and one is changed by replace()-ing it with its modified copy.
+    """
+
+    version: int
+    # Attribute ID -> {id(fd): fd} of the FDs using the attribute on that side, in insertion order
+    by_det: dict[int, dict[int, FunctionalDependency]]
+    by_dep: dict[int, dict[int, FunctionalDependency]]
+    # id(fd) -> [position key, occurrences]
+    entries: dict[int, list]
+
+    def __init__(self, fds=()):
+        super().__init__(fds)
+        self._rebuild()
+
+    def touch(self) -> None:
+        """Mark the list as changed."""
+        self.version = next(_fd_versions)
+
+    def _rebuild(self) -> None:
+        self.by_det = {}
+        self.by_dep = {}
+        self.entries = {}
+        self._next_key = 0
+        for fd in self:
+            self._add(fd)
+        self.touch()
+
+    @staticmethod
+    def _bits(mask: int) -> Iterator[int]:
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+    def _add(self, fd: FunctionalDependency) -> None:
+        entry = self.entries.get(id(fd))
+        if entry is not None:
+            entry[1] += 1
+            return
+        self.entries[id(fd)] = [self._next_key, 1]
+        self._next_key += 1
+        self._index(fd)
+
+    def _discard(self, fd: FunctionalDependency) -> None:
+        entry = self.entries[id(fd)]
+        entry[1] -= 1
+        if entry[1]:
+            return
+        del self.entries[id(fd)]
+        self._unindex(fd)
+
+    def _index(self, fd: FunctionalDependency) -> None:
+        for attr in self._bits(fd.det_mask):
+            self.by_det.setdefault(attr, {})[id(fd)] = fd
+        for attr in self._bits(fd.dep_mask):
+            self.by_dep.setdefault(attr, {})[id(fd)] = fd
+
+    def _unindex(self, fd: FunctionalDependency) -> None:
+        for attr in self._bits(fd.det_mask):
+            del self.by_det[attr][id(fd)]
+        for attr in self._bits(fd.dep_mask):
+            del self.by_dep[attr][id(fd)]
+
+    def replace(self, old: FunctionalDependency, new: FunctionalDependency) -> None:
+        """Put new in the place of every occurrence of old, e.g. to swap an FD for a modified copy."""
+        entry = self.entries.pop(id(old))
+        self._unindex(old)
+        start = 0
+        for _ in range(entry[1]):
+            start = self.index(old, start)
+            super().__setitem__(start, new)
+        if id(new) in self.entries:
+            self.entries[id(new)][1] += entry[1]
         else:
-            for i in range(len(self.dependents))[:-1]:
-                for dep in self.dependents[i][:-1]:
-                    output += dep + ", "
-                output += self.dependents[i][-1] + "}"
-                output += " | "
-            if output[-1] != "{":
-                output += "{"
-            for dep in self.dependents[-1][:-1]:
-                output += dep + ", "
-            output += self.dependents[-1][-1] + "}"
-        return output
+            self.entries[id(new)] = entry
+            self._index(new)
+        self.touch()
+
+    def _lookup(
+        self, index: dict[int, dict[int, FunctionalDependency]], mask: int
+    ) -> list[FunctionalDependency]:
+        found: dict[int, FunctionalDependency] = {}
+        for attr in self._bits(mask):
+            found.update(index.get(attr, {}))
+        return sorted(found.values(), key=lambda fd: self.entries[id(fd)][0])
+
+    def with_det(self, mask: int) -> list[FunctionalDependency]:
+        """FDs whose determinant uses any attribute in the bitmask, in list order."""
+        return self._lookup(self.by_det, mask)
+
+    def with_dep(self, mask: int) -> list[FunctionalDependency]:
+        """FDs with any attribute in the bitmask among their dependents, in list order."""
+        return self._lookup(self.by_dep, mask)
+
+    def with_attrs(self, mask: int) -> list[FunctionalDependency]:
+        """FDs using any attribute in the bitmask on either side, in list order."""
+        found = {id(fd): fd for fd in self.with_det(mask)}
+        found.update((id(fd), fd) for fd in self.with_dep(mask))
+        return sorted(found.values(), key=lambda fd: self.entries[id(fd)][0])
+
+    def append(self, fd: FunctionalDependency) -> None:
+        super().append(fd)
+        self._add(fd)
+        self.touch()
+
+    def extend(self, fds: Iterable[FunctionalDependency]) -> None:
+        fds = list(fds)
+        super().extend(fds)
+        for fd in fds:
+            self._add(fd)
+        self.touch()
+
+    def __iadd__(self, fds: Iterable[FunctionalDependency]) -> Self:
+        self.extend(fds)
+        return self
+
+    def pop(self, index: int = -1) -> FunctionalDependency:
+        fd = super().pop(index)
+        self._discard(fd)
+        self.touch()
+        return fd
+
+    def remove(self, fd: FunctionalDependency) -> None:
+        super().remove(fd)
+        self._discard(fd)
+        self.touch()
+
+    def remove_all(self, fds: Iterable[FunctionalDependency]) -> None:
+        """Remove every occurrence of the given FDs in one pass over the list."""
+        removed = {id(fd): fd for fd in fds if id(fd) in self.entries}
+        if not removed:
+            return
+        kept = [fd for fd in self if id(fd) not in removed]
+        super().__setitem__(slice(None), kept)
+        for key, fd in removed.items():
+            self.entries[key][1] = 1
+            self._discard(fd)
+        self.touch()
+
+    def clear(self) -> None:
+        super().clear()
+        self._rebuild()
+
+    def __reduce__(self):
+        # The indexes are keyed on object IDs, which don't survive pickling, so they are rebuilt on unpickling
+        return (type(self), (list(self),))
+
+
+def _rebuilding(name: str):
+    method = getattr(list, name)
+
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self._rebuild()
+        return result
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+# Operations that can reorder or replace FDs anywhere in the list rebuild the indexes
+for _name in ("insert", "sort", "reverse", "__setitem__", "__delitem__"):
+    setattr(FDList, _name, _rebuilding(_name))
+
+
+class ClosureEngine:
+    """Counter-based attribute closure (LinClosure). Each FD keeps a count of determinant attributes not yet in the
+    closure and fires when the count reaches zero, so one closure costs time linear in the total size of the FDs.
+    """
+
+    dets: list[int]
+    deps: list[int]
+    sizes: list[int]
+    by_attr: dict[int, list[int]]
+
+    def __init__(self, fds: list[tuple[int, int]]):
+        """Build the engine from (determinant mask, dependent mask) pairs."""
+        self.dets = []
+        self.deps = []
+        self.sizes = []
+        self.by_attr = {}
+        for det, dep in fds:
+            i = len(self.dets)
+            self.dets.append(det)
+            self.deps.append(dep)
+            self.sizes.append(det.bit_count())
+            while det:
+                low = det & -det
+                self.by_attr.setdefault(low.bit_length() - 1, []).append(i)
+                det ^= low
+
+    def closure(self, mask: int, skip: int = -1, target: int = 0) -> int:
+        """Closure of an attribute bitmask, optionally ignoring the FD at index skip. If a target bitmask is given, the
+        computation stops as soon as the closure contains it."""
+        instrument.count("closures computed")
+        counts = self.sizes[:]
+        result = mask
+        for i in range(len(counts)):
+            if not counts[i] and i != skip:
+                result |= self.deps[i]
+        pending = result
+        while pending:
+            if target and not target & ~result:
+                return result
+            low = pending & -pending
+            pending ^= low
+            for i in self.by_attr.get(low.bit_length() - 1, ()):
+                counts[i] -= 1
+                if not counts[i] and i != skip:
+                    new = self.deps[i] & ~result
+                    if new:
+                        result |= new
+                        pending |= new
+        return result
+
+
+def _stripped_partition(column: list[int]) -> list[list[int]]:
+    """Group row numbers by value, dropping classes of a single row (which can never violate an FD)."""
+    groups: dict[int, list[int]] = {}
+    for row in range(len(column)):
+        groups.setdefault(column[row], []).append(row)
+    return [array.array("i", rows) for rows in groups.values() if len(rows) > 1]
+
+
+def _partition_product(
+    first: list[list[int]], second: list[list[int]], owner: list[int]
+) -> list[list[int]]:
+    """Product of two stripped partitions in time proportional to their sizes. owner is a scratch list with one -1
+    entry per row and is left the way it was found."""
+    for i in range(len(first)):
+        for row in first[i]:
+            owner[row] = i
+    buckets: dict[int, list[int]] = {}
+    result = []
+    for rows in second:
+        for row in rows:
+            i = owner[row]
+            if i != -1:
+                if i in buckets:
+                    buckets[i].append(row)
+                else:
+                    buckets[i] = [row]
+        for rows_in_both in buckets.values():
+            if len(rows_in_both) > 1:
+                result.append(array.array("i", rows_in_both))
+        buckets.clear()
+    for rows in first:
+        for row in rows:
+            owner[row] = -1
+    return result
+
+
+def _g3_violations(
+    partition: list[list[int]], refined: list[list[int]], sizes: list[int]
+) -> int:
+    """Rows to delete so that X -> A holds, given the stripped partitions of X and of X plus A: in each class of X,
+    all rows but those of its largest class of X plus A (rows missing from refined are classes of one). sizes is a
+    scratch list with one 0 entry per row and is left the way it was found."""
+    for rows in refined:
+        sizes[rows[0]] = len(rows)
+    total = 0
+    for rows in partition:
+        largest = 1
+        for row in rows:
+            if sizes[row] > largest:
+                largest = sizes[row]
+        total += len(rows) - largest
+    for rows in refined:
+        sizes[rows[0]] = 0
+    return total
+
+
+def _column_violations(
+    partition: list[list[int]],
+    values: array.array,
+    counts: list[int],
+    limit: float | None = None,
+) -> int:
+    """Rows to delete so that every class of the partition agrees on a column of integer codes: in each class, all
+    rows but those holding its most common code. Counting stops as soon as there are more than limit. counts is a
+    scratch list with one 0 entry per code and is left the way it was found."""
+    total = 0
+    for rows in partition:
+        largest = 0
+        for row in rows:
+            value = values[row]
+            counts[value] += 1
+            if counts[value] > largest:
+                largest = counts[value]
+        for row in rows:
+            counts[values[row]] = 0
+        total += len(rows) - largest
+        if limit is not None and total > limit:
+            break
+    return total
+
+
+def _tane_search(
+    columns: list[array.array],
+    n: int,
+    max_lhs: int | None = None,
+    limit: float = 0,
+) -> list[tuple[int, int, int]]:
+    """Find the minimal, non-trivial FDs X -> A among integer-coded columns with TANE, as (X, A, violations) triples
+    of bitmasks and the number of rows violating the FD, in the order they are found. X -> A is accepted when at most
+    limit rows would have to be deleted for it to hold (its g3 error times n), so limit=0 finds the exact FDs.
+
+    Attribute sets are visited level by level (sets of size 1, then 2, ...). Each set X keeps the stripped partition
+    of the rows by their X values. X - A -> A holds exactly when X has as many classes as X - A, and otherwise its
+    violations are counted from the two partitions (see _g3_violations). Partitions of the next level are products of
+    two partitions of the current one. Candidate right-hand sides (C+) and key pruning keep the lattice small, and
+    only two levels of partitions are kept at a time. max_lhs caps the size of the determinants searched.
+    """
+    k = len(columns)
+    full = (1 << k) - 1
+
+    def bits(mask: int):
+        while mask:
+            low = mask & -mask
+            yield low
+            mask ^= low
+
+    def error(partition: list[list[int]]) -> int:
+        # Rows that would have to be removed for the set to be a key
+        return sum(map(len, partition)) - len(partition)
+
+    def refines(partition: list[list[int]], col: int) -> bool:
+        # Whether every class of the partition agrees on column col
+        values = columns[col]
+        for rows in partition:
+            value = values[rows[0]]
+            for row in rows:
+                if values[row] != value:
+                    return False
+        return True
+
+    owner = [-1] * n
+    sizes = [0] * n
+    counts = [0] * n
+    # Only the partitions of the current level and the one below it are kept
+    previous: dict[int, list[list[int]]] = {0: [list(range(n))] if n > 1 else []}
+    partitions: dict[int, list[list[int]]] = {}
+    errors = {0: n - 1 if n > 1 else 0}
+    cplus = {0: full}
+    level = []
+    for col in range(k):
+        partitions[1 << col] = _stripped_partition(columns[col])
+        errors[1 << col] = error(partitions[1 << col])
+        level.append(1 << col)
+
+    def holds(partition: list[list[int]], col: int) -> bool:
+        # Whether the FD from the partition's attributes to column col is accepted
+        if not limit:
+            return refines(partition, col)
+        return _column_violations(partition, columns[col], counts, limit) <= limit
+
+    found: list[tuple[int, int, int]] = []
+    size = 1
+    while level:
+        # Compute dependencies X - A -> A for the sets on this level
+        for lhs in level:
+            cand = full
+            for attr in bits(lhs):
+                cand &= cplus.get(lhs ^ attr, 0)
+            cplus[lhs] = cand
+        for lhs in level:
+            for attr in bits(lhs & cplus[lhs]):
+                exact = errors[lhs ^ attr] == errors[lhs]
+                violations = 0
+                if not exact:
+                    if not limit:
+                        continue
+                    violations = _g3_violations(
+                        previous[lhs ^ attr], partitions[lhs], sizes
+                    )
+                    if violations > limit:
+                        continue
+                found.append((lhs ^ attr, attr, violations))
+                cplus[lhs] &= ~attr
+                # Only an exact FD makes every other right-hand side of a superset non-minimal
+                if exact:
+                    cplus[lhs] &= lhs
+
+        # Prune sets with no candidates left, and keys (after emitting their minimal FDs). A set that is a key once
+        # limit rows are deleted determines every other attribute within the limit too. Its supersets that would test
+        # those FDs may never be generated, so they are emitted here, but only exact keys are pruned: the supersets of
+        # an approximate key can still hold minimal FDs with it on the right-hand side.
+        kept = []
+        for lhs in level:
+            if not cplus[lhs]:
+                continue
+            if errors[lhs] <= limit:
+                if max_lhs is None or size <= max_lhs:
+                    for attr in bits(cplus[lhs] & ~lhs):
+                        col = attr.bit_length() - 1
+                        if not any(
+                            holds(previous[lhs ^ other], col) for other in bits(lhs)
+                        ):
+                            violations = 0
+                            if errors[lhs]:
+                                violations = _column_violations(
+                                    partitions[lhs], columns[col], counts
+                                )
+                            found.append((lhs, attr, violations))
+                if not errors[lhs]:
+                    continue
+                cplus[lhs] &= lhs
+                if not cplus[lhs]:
+                    continue
+            kept.append(lhs)
+
+        # Build the next level from pairs of sets sharing all but their last attribute
+        previous = {}
+        if max_lhs is not None and size > max_lhs:
+            break
+        kept_set = set(kept)
+        blocks: dict[int, list[int]] = {}
+        for lhs in kept:
+            last = 1 << (lhs.bit_length() - 1)
+            blocks.setdefault(lhs ^ last, []).append(last)
+        next_level = []
+        next_partitions = {}
+        for prefix, lasts in blocks.items():
+            for i in range(len(lasts)):
+                for j in range(i + 1, len(lasts)):
+                    candidate = prefix | lasts[i] | lasts[j]
+                    if all(candidate ^ attr in kept_set for attr in bits(candidate)):
+                        partition = _partition_product(
+                            partitions[prefix | lasts[i]],
+                            partitions[prefix | lasts[j]],
+                            owner,
+                        )
+                        next_partitions[candidate] = partition
+                        errors[candidate] = error(partition)
+                        next_level.append(candidate)
+        previous = partitions
+        partitions = next_partitions
+        level = next_level
+        size += 1
+    return found
+
+
+def _minimize_key(closure, attr_mask: int, removable: int, candidate: int) -> int:
+    """Shrink a superkey to a minimal key by dropping removable attributes (lowest ID first) while it stays a
+    superkey."""
+    remaining = candidate & removable
+    while remaining:
+        low = remaining & -remaining
+        remaining ^= low
+        if not attr_mask & ~closure(candidate & ~low):
+            candidate &= ~low
+    return candidate
+
+
+# Closure engine and search bounds for candidate key minimization in worker processes
+_key_search_state: tuple[ClosureEngine, int, int] | None = None
+
+
+def _init_key_search(fds: list[tuple[int, int]], attr_mask: int, removable: int):
+    global _key_search_state
+    _key_search_state = (ClosureEngine(fds), attr_mask, removable)
+
+
+def _minimize_key_worker(candidate: int) -> int:
+    engine, attr_mask, removable = _key_search_state
+    return _minimize_key(engine.closure, attr_mask, removable, candidate)
+
+
+def _spurious_tuple(
+    store: "ColumnStore",
+    present: set[tuple[int, ...]],
+    components: list[list[int]],
+    cache: dict | None = None,
+) -> tuple[int, ...] | None:
+    """Join the projections of the store's tuples onto each component (lists of column positions) and return the first
+    joined tuple missing from present, or None if the join gives back exactly the original tuples.
+
+    The join is pipelined: each tuple of the first projection is extended depth first through hash indexes of the
+    others, so the search stops at the first spurious tuple without building the join. Indexes are kept in cache (if
+    given) for the next call: all plain projections, but only the latest index that adds attributes, since those are
+    rarely shared beyond consecutive candidates.
+    """
+    if cache is None:
+        cache = {}
+    columns = store.columns
+    bound: set[int] = set(components[0])
+    plan = []
+    for component in components[1:]:
+        shared = tuple([col for col in component if col in bound])
+        new = tuple([col for col in component if col not in bound])
+        index = cache.get((shared, new))
+        if index is None:
+            if new:
+                for key in [key for key in cache if key[1]]:
+                    del cache[key]
+                groups = store.group_by([store.names[col] for col in shared])
+                index = {
+                    key: {tuple([columns[col][row] for col in new]) for row in rows}
+                    for key, rows in groups.items()
+                }
+            else:
+                # A component adding nothing only filters the joined tuples
+                index = set(
+                    store.project([store.names[col] for col in shared]).code_rows()
+                )
+            cache[(shared, new)] = index
+        plan.append((shared, new, index))
+        bound.update(new)
+    row = [-1] * len(columns)
+
+    def extend(step: int) -> tuple[int, ...] | None:
+        if step == len(plan):
+            joined = tuple(row)
+            return None if joined in present else joined
+        shared, new, index = plan[step]
+        key = tuple([row[col] for col in shared])
+        if not new:
+            return extend(step + 1) if key in index else None
+        for values in index.get(key, ()):
+            for col, value in zip(new, values):
+                row[col] = value
+            found = extend(step + 1)
+            if found is not None:
+                return found
+        return None
+
+    first = components[0]
+    for values in store.project([store.names[col] for col in first]).code_rows():
+        for col, value in zip(first, values):
+            row[col] = value
+        found = extend(0)
+        if found is not None:
+            return found
+    return None
+
+
+_jd_search_state: tuple["ColumnStore", set[tuple[int, ...]], dict] | None = None
+
+
+def _init_jd_search(store: "ColumnStore"):
+    global _jd_search_state
+    _jd_search_state = (store, set(store.code_rows()), {})
+
+
+def _jd_worker(components: list[list[int]]) -> tuple[int, ...] | None:
+    store, present, cache = _jd_search_state
+    return _spurious_tuple(store, present, components, cache)
+
+
+class ColumnStore:
+    """Relation data stored column by column. Each column is an array of integer codes into a per-column dictionary of
+    its distinct values, so repeated values are stored once and projections, grouping and joins compare small ints.
+    Iteration, indexing and len() work on decoded tuples, so a store can stand in for a list of rows. Stores derived
+    from another (projections, joins) share its dictionaries, so their codes stay comparable.
+    """
+
+    names: list[str]
+    values: list[list]
+    codes: list[dict]
+    columns: list[array.array]
+
+    def __init__(self, names: list[str], rows: Iterable[list] | None = None):
+        self.names = list(names)
+        self.values = [[] for _ in self.names]
+        self.codes = [{} for _ in self.names]
+        self.columns = [array.array("i") for _ in self.names]
+        if rows:
+            self.extend(rows)
+
+    def _derive(self, sources: list[tuple[Self, int]]) -> Self:
+        """An empty store whose columns reuse the dictionaries of the given (store, column) pairs."""
+        result = ColumnStore([store.names[i] for store, i in sources])
+        result.values = [store.values[i] for store, i in sources]
+        result.codes = [store.codes[i] for store, i in sources]
+        return result
+
+    def append(self, row: list) -> None:
+        if len(row) != len(self.names):
+            raise ValueError(
+                f"Expected {len(self.names)} values but found {len(row)}: {row}"
+            )
+        for i, value in enumerate(row):
+            codes = self.codes[i]
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(self.values[i])
+                self.values[i].append(value)
+            self.columns[i].append(code)
+
+    def extend(self, rows: Iterable[list]) -> None:
+        """Append many tuples, encoding them a column at a time."""
+        rows = rows if isinstance(rows, list) else list(rows)
+        for row in rows:
+            if len(row) != len(self.names):
+                raise ValueError(
+                    f"Expected {len(self.names)} values but found {len(row)}: {row}"
+                )
+        if not rows:
+            return
+        for i, values in enumerate(zip(*rows)):
+            codes = self.codes[i]
+            known = self.values[i]
+            # A new value's code is the number of values before it, so the dictionary keeps the values in code order
+            self.columns[i].extend(
+                [codes.setdefault(value, len(codes)) for value in values]
+            )
+            if len(codes) > len(known):
+                known.extend(itertools.islice(codes, len(known), None))
+
+    def __len__(self) -> int:
+        return len(self.columns[0]) if self.columns else 0
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __getitem__(self, row: int) -> list:
+        return [
+            values[column[row]] for values, column in zip(self.values, self.columns)
+        ]
+
+    def __iter__(self) -> Iterator[list]:
+        for codes in zip(*self.columns):
+            yield [values[code] for values, code in zip(self.values, codes)]
+
+    def code_rows(self) -> Iterator[tuple[int, ...]]:
+        """Iterate over the tuples as code tuples, which compare and hash like the values they stand for."""
+        return zip(*self.columns)
+
+    def index(self, names: list[str]) -> list[int]:
+        """Column positions of the given attribute names."""
+        return [self.names.index(name) for name in names]
+
+    def project(self, names: list[str], distinct: bool = True) -> Self:
+        """The given columns of every tuple, without duplicates unless distinct is False. Runs in linear time."""
+        cols = self.index(names)
+        result = self._derive([(self, i) for i in cols])
+        if not distinct:
+            result.columns = [array.array("i", self.columns[i]) for i in cols]
+            return result
+        # The first occurrence of each tuple, in order
+        unique = dict.fromkeys(zip(*[self.columns[i] for i in cols]))
+        for column, codes in zip(result.columns, zip(*unique)):
+            column.extend(codes)
+        return result
+
+    def group_by(self, names: list[str]) -> dict[tuple[int, ...], array.array]:
+        """Row numbers of the tuples grouped by their codes on the given columns."""
+        groups: dict[tuple[int, ...], array.array] = {}
+        cols = [self.columns[i] for i in self.index(names)]
+        # Without columns every tuple has the empty key
+        keys = zip(*cols) if cols else itertools.repeat((), len(self))
+        for row, codes in enumerate(keys):
+            group = groups.get(codes)
+            if group is None:
+                group = groups[codes] = array.array("i")
+            group.append(row)
+        return groups
 
 
 class Relation:
@@ -75,100 +967,614 @@ class Relation:
     primary_key: list[str]
     candidate_keys: list[list[str]]
     multivalued_attributes: list[str]
-    fds: list[FunctionalDependency]
-    data: list[str]
+    _data: ColumnStore
+    attr_table: AttributeTable
+    attr_mask: int
+    _fds: FDList
+    _engine: ClosureEngine | None
+    _engine_version: int
+    _closures: dict[int, int]
 
-    def __init__(self, name, attrs, prim_key, can_keys, mv_attrs, fds=[], data=[]):
+    def __init__(
+        self,
+        name,
+        attrs,
+        prim_key,
+        can_keys,
+        mv_attrs,
+        fds=(),
+        data=(),
+        attr_table=None,
+    ):
         self.name = name
         self.attributes = attrs
         self.primary_key = prim_key
         self.candidate_keys = can_keys
         self.multivalued_attributes = mv_attrs
+        # Relations derived from the same schema share one attribute table so their bitmasks are comparable
+        self.attr_table = attr_table if attr_table is not None else AttributeTable()
+        self.attr_mask = 0
+        for attr in self.attributes:
+            self.attr_mask |= 1 << self.attr_table.intern(attr[0], attr[1])
+        if any(fd.attr_table is not self.attr_table for fd in fds):
+            fds = [fd.rebind(self.attr_table) for fd in fds]
         self.fds = fds
         self.data = data
+        instrument.count("relations created")
 
-    def __str__(self) -> str:
-        """Pretty print of Relation"""
-        result = "Relation: " + self.name + "\n"
-
-        result += "Attributes: "
-        for attr, typ in self.attributes[:-1]:
-            result += attr + ":" + typ + ", "
-        result += self.attributes[-1][0] + ":" + self.attributes[-1][1] + "\n"
-
-        result += "Primary Key: {"
-        for attr in self.primary_key[:-1]:
-            result += attr + ", "
-        result += self.primary_key[-1] + "}\n"
-
-        result += "Candidate Keys: "
-        if self.candidate_keys:
-            for attr_set in self.candidate_keys[:-1]:
-                result += "{"
-                for attr in attr_set[:-1]:
-                    result += attr + ", "
-                result += attr_set[-1] + "}, "
-            result += "{"
-            for attr in self.candidate_keys[-1][:-1]:
-                result += attr + ", "
-            result += self.candidate_keys[-1][-1] + "}\n"
-        else:
-            result += "None\n"
+    @property
+    def fds(self) -> FDList:
+        return self._fds
 
-        result += "Multi-Valued Attributes: "
-        if self.multivalued_attributes:
-            for attr in self.multivalued_attributes[:-1]:
-                result += attr + ", "
-            result += self.multivalued_attributes[-1] + "}\n"
-        else:
-            result += "None\n"
+    @fds.setter
+    def fds(self, fds: list[FunctionalDependency]) -> None:
+        self._fds = fds if isinstance(fds, FDList) else FDList(fds)
+        self._engine = None
+        self._closures = {}
+
+    @property
+    def data(self) -> ColumnStore:
+        return self._data
+
+    @data.setter
+    def data(self, rows: Iterable[list]) -> None:
+        # Rows are kept in a column store laid out in attribute order
+        names = self.attr_names()
+        if not isinstance(rows, ColumnStore):
+            rows = ColumnStore(names, rows)
+        elif rows.names != names:
+            rows = rows.project(names, distinct=False)
+        self._data = rows
+
+    def project_data(self, names: list[str]) -> ColumnStore:
+        """The relation's data projected onto the given attributes without duplicates (empty if any are missing)."""
+        if any(name not in self.data.names for name in names):
+            return ColumnStore(names)
+        return self.data.project(names)
+
+    def closure(self, mask: int) -> int:
+        """Closure of an attribute bitmask under the relation's FDs. Results are memoized until self.fds changes."""
+        if self._engine is None or self._engine_version != self.fds.version:
+            # Multi-valued dependencies don't contribute to FD closure
+            self._engine = ClosureEngine(
+                [(fd.det_mask, fd.dep_mask) for fd in self.fds if not fd.is_mv()]
+            )
+            self._engine_version = self.fds.version
+            self._closures = {}
+        result = self._closures.get(mask)
+        if result is None:
+            result = self._engine.closure(mask)
+            self._closures[mask] = result
+        return result
+
+    def is_superkey(self, mask: int) -> bool:
+        """Whether the attributes in the bitmask functionally determine every attribute of the relation."""
+        return not self.attr_mask & ~self.closure(mask)
+
+    def superkey_masks(self) -> list[int]:
+        """Bitmasks of the declared keys (primary key first) that really are superkeys under the FDs."""
+        return [mask for mask in self.key_masks() if self.is_superkey(mask)]
+
+    def prime_mask(self) -> int:
+        """Bitmask of the prime attributes, i.e. those that belong to some key."""
+        result = 0
+        for mask in self.superkey_masks():
+            result |= mask
+        return result
+
+    def minimal_cover(self) -> None:
+        """Replace the relation's FDs with a minimal (canonical) cover: split dependents into single attributes, drop
+        extraneous determinant attributes, drop FDs implied by the others, then merge FDs with equal determinants.
+        Implication tests use closures that stop as soon as the tested attribute is reached. Multi-valued
+        dependencies are kept as they are."""
+        original_count = len(self.fds)
+        # Split into single-attribute dependents, remembering where each FD came from to keep the output order stable
+        split: list[tuple[int, int, int]] = []
+        for i in range(len(self.fds)):
+            fd = self.fds[i]
+            if fd.is_mv():
+                continue
+            deps = fd.dep_mask & ~fd.det_mask
+            while deps:
+                low = deps & -deps
+                split.append((i, fd.det_mask, low))
+                deps ^= low
+
+        # An FD can only be redundant, or lose a determinant attribute, if its dependent is derivable some other way.
+        # Counting how many FDs derive each attribute rules most candidates out without computing a closure.
+        derivations: dict[int, int] = {}
+        for _, det, dep in split:
+            derivations[dep] = derivations.get(dep, 0) + 1
+
+        # Remove extraneous determinant attributes. The reduced FDs are equivalent to the originals, so the closure
+        # engine built from the originals stays valid throughout.
+        engine = ClosureEngine([(det, dep) for _, det, dep in split])
+        for j in range(len(split)):
+            pos, det, dep = split[j]
+            if det.bit_count() < 2:
+                continue
+            remaining = det
+            while remaining:
+                low = remaining & -remaining
+                remaining ^= low
+                if derivations[dep] == 1 and low not in derivations:
+                    continue
+                if engine.closure(det & ~low, target=dep) & dep:
+                    det &= ~low
+            split[j] = (pos, det, dep)
+
+        # Remove redundant FDs (including duplicates). A removed FD is disabled by clearing its dependents in the
+        # engine.
+        engine = ClosureEngine([(det, dep) for _, det, dep in split])
+        kept = []
+        for j in range(len(split)):
+            pos, det, dep = split[j]
+            if derivations[dep] > 1 and engine.closure(det, skip=j, target=dep) & dep:
+                engine.deps[j] = 0
+                derivations[dep] -= 1
+            else:
+                kept.append(split[j])
+
+        # Merge by determinant, placing each group where its earliest FD was
+        groups: dict[int, list[int]] = {}
+        for pos, det, dep in kept:
+            if det in groups:
+                groups[det][0] = min(groups[det][0], pos)
+                groups[det][1] |= dep
+            else:
+                groups[det] = [pos, dep]
+        ordered = [
+            (
+                pos,
+                FunctionalDependency(
+                    self.attr_table.names_of(det),
+                    [self.attr_table.names_of(dep)],
+                    self.attr_table,
+                ),
+            )
+            for det, (pos, dep) in groups.items()
+        ]
+        for i in range(len(self.fds)):
+            if self.fds[i].is_mv():
+                ordered.append((i, self.fds[i]))
+        ordered.sort(key=lambda x: x[0])
+        self.fds = [fd for _, fd in ordered]
+        instrument.log(
+            "Minimal cover of {}: {} dependencies reduced to {}",
+            self.name,
+            original_count,
+            len(self.fds),
+        )
+
+    def find_candidate_keys(
+        self,
+        max_keys: int | None = 1000,
+        timeout: float | None = 30.0,
+        workers: int = 1,
+    ) -> list[list[str]]:
+        """Discover the relation's minimal keys from its FDs and store them as the primary and candidate keys.
+
+        Attributes that never appear on the right of an FD belong to every key, and attributes that only appear on
+        the right belong to none, so only the remaining ones are searched. Keys are enumerated with the
+        Lucchesi-Osborn method (each key and FD X -> Y suggests the superkey X + (key - Y)), which runs in time
+        polynomial in the number of keys found. The search stops early once max_keys keys are found or timeout
+        seconds pass. With workers > 1, key minimization is spread over a process pool.
+        """
+        start = time.monotonic()
+        attrs = self.attr_mask
+        if not attrs:
+            return []
+        fds = [(fd.det_mask, fd.dep_mask) for fd in self.fds if not fd.is_mv()]
+        lhs = 0
+        rhs = 0
+        for det, dep in fds:
+            lhs |= det
+            rhs |= dep & ~det
+        core = attrs & ~rhs
+        right_only = attrs & rhs & ~lhs
+        # Right-only attributes that can't be derived from the rest of the relation must be in every key too
+        underivable = right_only & ~self.closure(attrs & ~right_only)
+        core |= underivable
+        right_only &= ~underivable
+        removable = attrs & ~core & ~right_only
+
+        keys = [_minimize_key(self.closure, attrs, removable, attrs & ~right_only)]
+        complete = True
+        if keys[0] != core:
+            # Each FD is used in the form X -> closure(X) restricted to the relation
+            derived: dict[int, int] = {}
+            for det, dep in fds:
+                if not det & ~attrs and det not in derived:
+                    derived[det] = self.closure(det) & attrs
+            pool = None
+            if workers > 1:
+                pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=_init_key_search,
+                    initargs=(fds, attrs, removable),
+                )
+            frontier = keys[:]
+            seen: set[int] = set()
+            while frontier and complete:
+                candidates = []
+                for key in frontier:
+                    for det, closed in derived.items():
+                        candidate = det | (key & ~closed)
+                        if candidate in seen:
+                            continue
+                        seen.add(candidate)
+                        for known in keys:
+                            if not known & ~candidate:
+                                break
+                        else:
+                            candidates.append(candidate)
+                if pool is not None and len(candidates) > 1:
+                    minimized = pool.map(
+                        _minimize_key_worker,
+                        candidates,
+                        chunksize=max(1, len(candidates) // (workers * 4)),
+                    )
+                else:
+                    minimized = (
+                        _minimize_key(self.closure, attrs, removable, candidate)
+                        for candidate in candidates
+                    )
+                frontier = []
+                for key in minimized:
+                    if key not in keys:
+                        keys.append(key)
+                        frontier.append(key)
+                    if max_keys is not None and len(keys) >= max_keys:
+                        complete = False
+                        break
+                if timeout is not None and time.monotonic() - start > timeout:
+                    complete = False
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        if not complete:
+            instrument.warn(
+                "Warning: candidate key search for {} stopped after {} keys; the list may be incomplete.",
+                self.name,
+                len(keys),
+            )
+
+        pk_mask = self.mask(self.primary_key)
+        if pk_mask not in keys:
+            # Prefer a key inside the declared primary key, otherwise take the first one found
+            new_pk = keys[0]
+            for key in keys:
+                if not key & ~pk_mask:
+                    new_pk = key
+                    break
+            new_pk_names = self.names_in(new_pk)
+            instrument.log(
+                "Primary key {} of {} is not a minimal key; using {} instead",
+                self.primary_key,
+                self.name,
+                new_pk_names,
+            )
+            self.primary_key = new_pk_names
+            pk_mask = new_pk
+        self.candidate_keys = [self.names_in(key) for key in keys if key != pk_mask]
+        return [self.primary_key] + self.candidate_keys
+
+    def discover_fds(self, max_lhs: int | None = None) -> list[FunctionalDependency]:
+        """Mine every minimal, non-trivial FD that holds in self.data using TANE (see _tane_search). max_lhs caps the
+        size of the determinants searched. The FDs found are returned merged by determinant; self.fds is left alone.
+        Without rows every FD holds vacuously, so none are returned.
+        """
+        names = self.attr_names()
+        n = len(self.data)
+        if not n:
+            return []
+        k = len(names)
+        # The column store already encodes each column as integers, so partitions and refinement checks compare
+        # small ints
+        columns = [self.data.columns[col] for col in self.data.index(names)]
+        found = _tane_search(columns, n, max_lhs)
+
+        # Merge by determinant, keeping the order in which determinants were found
+        merged: dict[int, int] = {}
+        for lhs, attr, _ in found:
+            merged[lhs] = merged.get(lhs, 0) | attr
+        result = []
+        for lhs, deps in merged.items():
+            result.append(
+                FunctionalDependency(
+                    [names[col] for col in range(k) if lhs >> col & 1],
+                    [[names[col] for col in range(k) if deps >> col & 1]],
+                    self.attr_table,
+                )
+            )
+        return result
 
-        result += "Functional Dependencies:\n"
-        if self.fds == []:
-            result += "N/A\n"
+    def discover_approximate_fds(
+        self,
+        max_error: float = 0.001,
+        sample_size: int = 10000,
+        seed: int = 0,
+        rows=None,
+        max_lhs: int | None = None,
+    ) -> list[FunctionalDependency]:
+        """Mine minimal FDs that hold on all but a fraction max_error of the rows (the g3 error: the share of rows that
+        would have to be deleted for the FD to hold exactly).
+
+        One pass over the rows encodes each column as integer codes and keeps a reservoir sample of sample_size row
+        numbers. Candidates are found on the sample with the TANE search discover_fds uses (see _tane_search),
+        allowing some slack for the sample, then checked against the full columns with g3 counted over stripped
+        partitions. A candidate that fails on the full data is retried with one more determinant attribute. rows is an
+        optional function returning an iterator over the tuples, so only the encoded columns are ever held; it defaults
+        to the encoded tuples of self.data. Without rows no FDs are returned, as in discover_fds.
+        """
+        if rows is None:
+            rows = self.data.code_rows
+        names = self.attr_names()
+        k = len(names)
+        rng = random.Random(seed)
+
+        # One pass: encode the columns and sample row numbers
+        codes: list[dict] = [{} for _ in range(k)]
+        full: list[array.array] = [array.array("i") for _ in range(k)]
+        sample = []
+        n = 0
+        for row in rows():
+            for col in range(k):
+                full[col].append(codes[col].setdefault(row[col], len(codes[col])))
+            if len(sample) < sample_size:
+                sample.append(n)
+            else:
+                slot = rng.randrange(n + 1)
+                if slot < sample_size:
+                    sample[slot] = n
+            n += 1
+        if not n:
+            return []
+        m = len(sample)
+        limit = max_error * n
+
+        def cols_of(mask: int) -> list[int]:
+            return [col for col in range(k) if mask >> col & 1]
+
+        # Level-wise search on the sample, with TANE's pruning. Sampled groups are smaller than the real ones, which
+        # hides violations, so the sample gets some slack and the full data has the final say. A sample of every row
+        # is the data itself and needs neither.
+        if m == n:
+            found = _tane_search(full, n, max_lhs, limit)
         else:
-            for i in range(len(self.fds)):
-                result += str(self.fds[i]) + "\n"
+            sample.sort()
+            columns = [array.array("i", [column[i] for i in sample]) for column in full]
+            found = _tane_search(columns, m, max_lhs, (2 * max_error + 1 / m) * m)
 
-        if self.data:
-            result += "Data:\n"
-            for tuple in self.data:
-                for value in tuple[:-1]:
-                    result += value + ", "
-                result += tuple[-1] + "\n"
+        owner = [-1] * n
+        counts = [0] * n
+        singles = [_stripped_partition(column) for column in full]
+        # Partitions of the full data, built from the determinant a retry extends or else by prefixes
+        partitions = {0: [array.array("i", range(n))] if n > 1 else []}
+
+        def partition_of(mask: int, base: int | None = None) -> list[list[int]]:
+            partition = partitions.get(mask)
+            if partition is None:
+                if base is None:
+                    base = mask ^ 1 << (mask.bit_length() - 1)
+                partition = _partition_product(
+                    partition_of(base), singles[(mask ^ base).bit_length() - 1], owner
+                )
+                partitions[mask] = partition
+            return partition
+
+        def violations(lhs: int, col: int, base: int | None = None) -> int:
+            return _column_violations(partition_of(lhs, base), full[col], counts, limit)
+
+        # Verify on the full data, retrying failures with one more determinant attribute
+        accepted: dict[int, list[int]] = {}
+        results: list[tuple[int, int, float]] = []
+        candidates = []
+        for lhs, attr, found_violations in found:
+            col = attr.bit_length() - 1
+            if m == n:
+                accepted.setdefault(col, []).append(lhs)
+                results.append((lhs, col, found_violations / n))
+            else:
+                candidates.append((lhs, col, None))
+        tried = {(lhs, col) for lhs, col, _ in candidates}
+        while candidates:
+            failed = []
+            for lhs, col, base in candidates:
+                if any(not other & ~lhs for other in accepted.get(col, ())):
+                    continue
+                found_violations = violations(lhs, col, base)
+                if found_violations <= limit:
+                    accepted.setdefault(col, []).append(lhs)
+                    results.append((lhs, col, found_violations / n))
+                else:
+                    failed.append((lhs, col))
+            candidates = []
+            for lhs, col in failed:
+                if max_lhs is not None and lhs.bit_count() >= max_lhs:
+                    continue
+                for extra in range(k):
+                    bigger = lhs | 1 << extra
+                    if extra == col or bigger == lhs or (bigger, col) in tried:
+                        continue
+                    tried.add((bigger, col))
+                    candidates.append((bigger, col, lhs))
+
+        # Keep the minimal accepted FDs, merged by determinant
+        merged: dict[int, int] = {}
+        for lhs, col, err in results:
+            if any(
+                other != lhs and not other & ~lhs for other in accepted.get(col, ())
+            ):
+                continue
+            instrument.log(
+                "{} -> {} holds for {:.3%} of rows",
+                [names[c] for c in cols_of(lhs)],
+                names[col],
+                1 - err,
+            )
+            merged[lhs] = merged.get(lhs, 0) | 1 << col
+        result = []
+        for lhs, deps in merged.items():
+            result.append(
+                FunctionalDependency(
+                    [names[col] for col in cols_of(lhs)],
+                    [[names[col] for col in cols_of(deps)]],
+                    self.attr_table,
+                )
+            )
         return result
 
+    def attr_names(self) -> list[str]:
+        """Names of the relation's attributes, in order."""
+        return [x[0] for x in self.attributes]
+
+    def names_in(self, mask: int) -> list[str]:
+        """Names of the relation's attributes that are in the bitmask, in relation order."""
+        return [x[0] for x in self.attributes if self.attr_table.bit(x[0]) & mask]
+
+    def has_attr(self, attr: str) -> bool:
+        return bool(self.attr_mask & self.attr_table.bit(attr))
+
+    def mask(self, attrs: list[str]) -> int:
+        """Bitmask of the given attribute names in this relation's attribute table."""
+        return self.attr_table.mask(attrs)
+
+    def key_masks(self) -> list[int]:
+        """Bitmasks of the primary key followed by each candidate key."""
+        return [self.mask(self.primary_key)] + [
+            self.mask(key) for key in self.candidate_keys
+        ]
+
+    def remove_attribute(self, attr: str) -> list[str] | None:
+        """Remove an attribute from the relation, returning its [name, type] pair (None if it wasn't present)."""
+        removed = self.remove_attributes(self.attr_table.bit(attr))
+        return removed[0] if removed else None
+
+    def remove_attributes(self, mask: int) -> list[list[str]]:
+        """Remove the attributes in a bitmask from the relation, returning their [name, type] pairs in attribute
+        order. The data is projected onto the remaining attributes once, however many are removed.
+        """
+        mask &= self.attr_mask
+        if not mask:
+            return []
+        self.attr_mask &= ~mask
+        removed = [
+            attr for attr in self.attributes if self.attr_table.bit(attr[0]) & mask
+        ]
+        self.attributes[:] = [
+            attr for attr in self.attributes if not self.attr_table.bit(attr[0]) & mask
+        ]
+        self.data = self.project_data(self.attr_names())
+        return removed
+
+    def prune_candidate_keys(self) -> None:
+        """Drop candidate keys that reference attributes no longer in the relation."""
+        self.candidate_keys = [
+            key for key in self.candidate_keys if not self.mask(key) & ~self.attr_mask
+        ]
+
+    def __str__(self) -> str:
+        """Pretty print of Relation"""
+        out = io.StringIO()
+        write_relation(out, self)
+        return out.getvalue()
+
+    def load_data(
+        self,
+        source: str,
+        delimiter: str | None = None,
+        chunk_size: int = DATA_CHUNK_SIZE,
+    ) -> int:
+        """Append the tuples of a CSV/TSV file (or stdin when source is "-") to self.data, converting each value to
+        its attribute's type. Returns the number of tuples loaded."""
+        if source != "-" and not os.path.isfile(source):
+            print(f"Error: Data file {source} does not exist.")
+            return 0
+        count = 0
+        for chunk in open_data(source, self.attributes, delimiter, chunk_size):
+            self.data.extend(chunk)
+            count += len(chunk)
+        instrument.log("Loaded {} tuples into relation {}.", count, self.name)
+        return count
+
+    def request_data(self, data_source: str | None = None) -> None:
+        """Make sure the relation has data for the data-dependent stages, loading it from data_source or, without
+        one, from tuples typed (or piped) on stdin."""
+        if self.data:
+            return
+        if data_source is not None:
+            self.load_data(data_source)
+            return
+        print(f"\nThe normalizer needs table data for relation {self.name}.")
+        print(
+            "Please enter comma separated values that adhere to the following schema:"
+        )
+        print(", ".join(self.attr_names()))
+        print("Each tuple is on its own line. Enter 'q' instead to stop input.")
+        self.load_data("-")
+
+    def mvd_violations(self, mvd: FunctionalDependency) -> list[list]:
+        """Check the MVD {X} ->> {Y} | {Z} against self.data, returning the X values of the groups where it fails.
+
+        The MVD holds in a group of tuples sharing an X value when every Y value there appears with every Z value, that
+        is when the group's distinct (Y, Z) pairs number |Y values| * |Z values|. The distinct tuples are grouped by X
+        (see ColumnStore.group_by) and only the Y and Z codes of each group are counted, so no cross product is ever
+        built. Attributes outside X, Y and Z count as one more
+        dependent set, as the MVD implies for the rest of the relation."""
+        det = self.names_in(mvd.det_mask)
+        groups = []
+        for dep_set in mvd.dependents:
+            names = self.names_in(self.mask(dep_set) & ~mvd.det_mask)
+            if names:
+                groups.append(names)
+        rest = self.attr_mask & ~mvd.det_mask & ~mvd.dep_mask
+        if rest:
+            groups.append(self.names_in(rest))
+        if len(groups) < 2 or not self.data:
+            return []
+        store = self.data.project(det + [name for names in groups for name in names])
+        bounds = []
+        start = len(det)
+        for names in groups:
+            bounds.append((start, start + len(names)))
+            start += len(names)
+
+        # The tuples are distinct, so each X group's size is its number of distinct (Y, Z) pairs
+        columns = store.columns
+        violations = []
+        for key, rows in store.group_by(det).items():
+            product = 1
+            for low, high in bounds:
+                product *= len(
+                    {
+                        tuple([columns[col][row] for col in range(low, high)])
+                        for row in rows
+                    }
+                )
+            if len(rows) != product:
+                violations.append([store.values[i][code] for i, code in enumerate(key)])
+        return violations
+
     def one_nf(self) -> list[Self]:
         """Normalize the relation to 1NF by separating all multivalued attributes into their own relations, which are returned."""
-        print("Processing table", self.name, "...")
-        fds_to_remove: list[int] = []
+        instrument.trace("Processing table {} ...", self.name)
+        fds_to_remove: list[FunctionalDependency] = []
         new_tables: list[Relation] = []
         # Create a list of functional dependencies that are based on the primary key. These will be copied to any new relations
         # that contain the primary key.
         transferred_fds: list[FunctionalDependency] = []
+        key_mask = self.mask(self.primary_key)
         if len(self.multivalued_attributes):
             for fd in self.fds:
-                keeper = True
-                for attr in fd.determinant:
-                    if attr not in self.primary_key:
-                        keeper = False
-                        break
-                for dep_set in fd.dependents:
-                    for attr in dep_set:
-                        if attr not in self.primary_key:
-                            keeper = False
-                            break
-                    if not keeper:
-                        break
-                if keeper:
-                    transferred_fds.append(fd.copy())
-        print("Identified keeper FDs")
+                if not (fd.det_mask | fd.dep_mask) & ~key_mask:
+                    transferred_fds.append(fd)
+        instrument.trace("Identified keeper FDs")
         for keeper in transferred_fds:
-            print(str(keeper))
+            instrument.trace("{}", keeper)
 
         for i in range(len(self.multivalued_attributes)):
-            print(f"Creating table for {self.multivalued_attributes[i]}...")
-            if self.multivalued_attributes[i] in [x[0] for x in self.attributes]:
+            instrument.trace("Creating table for {}...", self.multivalued_attributes[i])
+            if self.has_attr(self.multivalued_attributes[i]):
                 new_title = self.multivalued_attributes[i] + "Data"
                 new_prim = []
                 new_can = []
@@ -177,16 +1583,24 @@ class Relation:
                 # if removed attribute is alone in a functional dependency, separate based on the dependency
                 # instead of the primary key
                 table_based_on_fd = False
-                print(
-                    f"Testing for presence of {[[self.multivalued_attributes[i]]]} in FDs"
+                instrument.trace(
+                    "Testing for presence of {} in FDs",
+                    [[self.multivalued_attributes[i]]],
                 )
-                for j in range(len(self.fds)):
-                    if self.fds[j].dependents == [[self.multivalued_attributes[i]]]:
-                        new_prim = self.fds[j].determinant[:]
+                mv_bit = self.attr_table.bit(self.multivalued_attributes[i])
+                for fd in self.fds.with_dep(mv_bit):
+                    if len(fd.dependents) == 1:
+                        new_prim = list(fd.determinant)
                         new_prim.append(self.multivalued_attributes[i])
                         new_attrs = new_prim[:]
                         table_based_on_fd = True
-                        fds_to_remove.append(j)
+                        # FDs merged by the minimal cover may have other dependents, which stay behind
+                        if fd.dep_mask == mv_bit:
+                            fds_to_remove.append(fd)
+                        else:
+                            self.fds.replace(
+                                fd, fd.remove_dep(self.multivalued_attributes[i])
+                            )
                         break
                 # If the removed attribute is not alone in an FD, separate by putting it in a new table with the old one's
                 # primary key
@@ -196,31 +1610,23 @@ class Relation:
                     new_attrs = new_prim[:]
                 # assign data types to new_attrs and actually remove the removed attribute from the old relation
                 # (similar code will appear frequently in later normal forms)
-                for j in range(len(new_attrs)):
-                    loc = [x[0] for x in self.attributes].index(new_attrs[j])
-                    new_attrs[j] = [new_attrs[j], self.attributes[loc][1]]
-                    if new_attrs[j][0] == self.multivalued_attributes[i]:
-                        self.attributes.pop(loc)
+                new_mask = self.mask(new_attrs)
+                new_data = self.project_data(new_attrs)
+                new_attrs = self.attr_table.typed(new_attrs)
+                self.remove_attribute(self.multivalued_attributes[i])
 
                 # If the table wasn't based on an existing FD, move any matching FDs to the new table.
                 if not table_based_on_fd:
-                    print("this happened")
+                    instrument.trace(
+                        "{} is keyed on the primary key of {}", new_title, self.name
+                    )
                     new_fds += transferred_fds
-                    for j in range(len(self.fds)):
-                        if self.fds[j].is_dep(self.multivalued_attributes[i]):
-                            # new_fds.append(
-                            #     FunctionalDependency(
-                            #         self.fds[j].determinant,
-                            #         [[self.multivalued_attributes[i]]],
-                            #     )
-                            # )
-                            self.fds[j].remove_dep(self.multivalued_attributes[i])
+                    for fd in self.fds.with_dep(mv_bit):
+                        self.fds.replace(
+                            fd, fd.remove_dep(self.multivalued_attributes[i])
+                        )
                 for key in self.candidate_keys:
-                    transferable = True
-                    for attr in key:
-                        if attr not in [x[0] for x in new_attrs]:
-                            transferable = False
-                    if transferable:
+                    if not self.mask(key) & ~new_mask:
                         new_can.append(key)
                 new_tables.append(
                     Relation(
@@ -230,18 +1636,14 @@ class Relation:
                         can_keys=new_can,
                         mv_attrs=[],
                         fds=new_fds,
-                        data=[],
+                        data=new_data,
+                        attr_table=self.attr_table,
                     )
                 )
         self.multivalued_attributes = []
-        fds_to_remove.sort(reverse=True)
-        for i in range(len(fds_to_remove)):
-            self.fds.pop(fds_to_remove[i])
+        self.fds.remove_all(fds_to_remove)
 
-        for i in range(len(self.candidate_keys) - 1, 0, -1):
-            for attr in self.candidate_keys[i]:
-                if attr not in [x[0] for x in self.attributes]:
-                    self.candidate_keys.pop(i)
+        self.prune_candidate_keys()
 
         return new_tables
 
@@ -251,107 +1653,96 @@ class Relation:
         new_tables = []
         fds_to_remove = []
         removed_attributes = []
-        prime_attributes = self.primary_key[:]
-        for key in self.candidate_keys:
-            prime_attributes += key
-        # TODO: Incorporate candidate keys as prime attributes
-        # TODO: remove attributes from FD instead of killing the whole FD??
+        # Prime attributes come from the discovered keys rather than the ones typed into the schema file
+        self.find_candidate_keys()
+        key_masks = self.superkey_masks()
+        prime_mask = self.prime_mask()
 
+        instrument.count("FDs examined", len(self.fds))
         for i in range(len(self.fds)):
-            affected_attrs = []
+            # Skip FDs whose determinant has already been moved out of this relation
+            if self.fds[i].det_mask & ~self.attr_mask:
+                continue
             # If the FD's determinant contains a prime attribute, but not the entire primary key...
             if (
                 (len(self.fds[i].dependents) == 1)
-                and self.fds[i].det_contains(prime_attributes)
-                and not (
-                    self.fds[i].determinant == self.primary_key
-                    or self.fds[i].determinant in self.candidate_keys
-                )
+                and self.fds[i].det_mask & prime_mask
+                and self.fds[i].det_mask not in key_masks
             ):
-                print(f"FD {self.fds[i]} has a partial prime attribute determinant")
-                # try block because functional dependencies aren't removed until the end
-                try:
-                    # Locate non-prime attributes in the dependent of the FD
-                    for attr in self.fds[i].dependents[0]:
-                        if attr not in prime_attributes:
-                            affected_attrs.append(attr)
-                            print(
-                                f"!!! PFD DETECTED in {self.name} for attribute {attr}!!!"
-                            )
-                    # If non-prime attributes were found, remove these attributes and create a new table.
-                    if len(affected_attrs):
-                        new_name = ""
-                        for det in self.fds[i].determinant:
-                            new_name += det
-                        new_name += "Data"
-                        new_attrs = self.fds[i].determinant[:]
-                        new_attrs += affected_attrs
-                        for j in range(len(new_attrs)):
-                            # Reformat attributes to have data type and remove them from their old table
-                            loc = [x[0] for x in self.attributes].index(new_attrs[j])
-                            new_attrs[j] = [new_attrs[j], self.attributes[loc][1]]
-                            if new_attrs[j][0] not in self.primary_key:
-                                print(
-                                    f"removing attribute {self.attributes[loc]} from {self.name}"
-                                )
-                                removed_attributes.append(self.attributes[loc])
-                                self.attributes.pop(loc)
-                        # Incorporate the base functional dependency, and any others that involve the affected attributes
-                        new_fds = [self.fds[i]]
-                        for fd in self.fds[:i] + self.fds[i + 1 :]:
-                            print("testing", str(fd))
-                            for attr in affected_attrs:
-                                unpacked_dependents = []
-                                for dep_set in fd.dependents:
-                                    unpacked_dependents += dep_set
-                                # If any functional dependency contains any affected attributes as a determinant or dependent,
-                                # and all of the dependent attributes are in the new table...
-                                if fd.det_contains([attr]) or (
-                                    attr in unpacked_dependents
-                                    and (
-                                        False
-                                        not in [
-                                            (x in [y[0] for y in new_attrs])
-                                            for x in fd.determinant
-                                        ]
-                                    )
-                                ):
-                                    new_fds.append(fd)
-                                    fds_to_remove.append(self.fds.index(fd))
-                                    print(
-                                        f"Transferring {str(fd)} from {self.name} to {new_name}"
-                                    )
-                                    break
-                        new_can = []
-                        for key in self.candidate_keys:
-                            transferable = True
-                            for attr in key:
-                                if attr not in [x[0] for x in new_attrs]:
-                                    transferable = False
-                            if transferable:
-                                new_can.append(key)
-                        new_tables.append(
-                            Relation(
-                                name=new_name,
-                                attrs=new_attrs,
-                                prim_key=self.fds[i].determinant[:],
-                                can_keys=new_can,
-                                mv_attrs=[],
-                                fds=new_fds,
-                                data=[],
+                instrument.trace(
+                    "FD {} has a partial prime attribute determinant", self.fds[i]
+                )
+                # Locate non-prime attributes that depend on the determinant. The closure is used because a minimal
+                # cover lists attributes that are only transitively dependent under a different FD.
+                affected_mask = (
+                    self.closure(self.fds[i].det_mask)
+                    & ~self.fds[i].det_mask
+                    & ~prime_mask
+                    & self.attr_mask
+                )
+                affected_attrs = []
+                for attr in self.names_in(affected_mask):
+                    affected_attrs.append(attr)
+                    instrument.trace(
+                        "!!! PFD DETECTED in {} for attribute {}!!!", self.name, attr
+                    )
+                # If non-prime attributes were found, remove these attributes and create a new table.
+                if len(affected_attrs):
+                    new_name = ""
+                    for det in self.fds[i].determinant:
+                        new_name += det
+                    new_name += "Data"
+                    new_attrs = list(self.fds[i].determinant)
+                    new_attrs += affected_attrs
+                    new_mask = self.mask(new_attrs)
+                    new_data = self.project_data(new_attrs)
+                    # Reformat attributes to have data type and remove the dependent ones from their old table. The
+                    # determinant stays behind to join the two tables back together.
+                    new_attrs = self.attr_table.typed(new_attrs)
+                    for attr in self.remove_attributes(affected_mask):
+                        instrument.trace(
+                            "removing attribute {} from {}", attr[0], self.name
+                        )
+                        removed_attributes.append(attr)
+                    # Incorporate the base functional dependency, and any others that involve the affected attributes
+                    new_fds = [self.fds[i]]
+                    # Only FDs that use an affected attribute can qualify, so the indexes narrow down the search
+                    # MVDs stay behind: the new table's key is their determinant, so they would be trivial there, and
+                    # 4NF still has to split the rest of this relation on them
+                    for fd in self.fds.with_attrs(affected_mask):
+                        if fd is self.fds[i] or fd.is_mv():
+                            continue
+                        instrument.trace("testing {}", fd)
+                        # If any functional dependency contains any affected attributes as a determinant or dependent,
+                        # and all of the dependent attributes are in the new table...
+                        if fd.det_mask & affected_mask or (
+                            fd.dep_mask & affected_mask and not fd.det_mask & ~new_mask
+                        ):
+                            new_fds.append(fd)
+                            fds_to_remove.append(fd)
+                            instrument.trace(
+                                "Transferring {} from {} to {}", fd, self.name, new_name
                             )
+                    new_can = []
+                    for key in self.candidate_keys:
+                        if not self.mask(key) & ~new_mask:
+                            new_can.append(key)
+                    new_tables.append(
+                        Relation(
+                            name=new_name,
+                            attrs=new_attrs,
+                            prim_key=list(self.fds[i].determinant),
+                            can_keys=new_can,
+                            mv_attrs=[],
+                            fds=new_fds,
+                            data=new_data,
+                            attr_table=self.attr_table,
                         )
-                        fds_to_remove.append(i)
-                except:
-                    print(end="")
-        fds_to_remove.sort(reverse=True)
-        for i in range(len(fds_to_remove)):
-            self.fds.pop(fds_to_remove[i])
-
-        for i in range(len(self.candidate_keys) - 1, 0, -1):
-            for attr in self.candidate_keys[i]:
-                if attr not in [x[0] for x in self.attributes]:
-                    self.candidate_keys.pop(i)
+                    )
+                    fds_to_remove.append(self.fds[i])
+        self.fds.remove_all(fds_to_remove)
+
+        self.prune_candidate_keys()
         return new_tables
 
     def three_nf(self) -> list[Self]:
@@ -359,136 +1750,430 @@ class Relation:
         their own relations, which are returned."""
         new_tables = []
         fds_to_pop = []
+        self.find_candidate_keys()
+        instrument.count("FDs examined", len(self.fds))
         for i in range(len(self.fds)):
             # Ignore multi-valued dependencies
             if len(self.fds[i].dependents) > 1:
                 continue
-            # TODO: Check for superkey instead of primary key...
-            # If an FD's determinant isn't the primary key and there are non-prime dependents, the FD is violates 3NF and
-            # must be separated out.
-            violation = False
-            if set(self.primary_key) != set(self.fds[i].determinant):
-                for dep in self.fds[i].dependents[0]:
-                    if not (dep in self.primary_key):
-                        violation = True
-                        print(
-                            f"!!!!!!Found transitive dependency from {dep} in {self.name}"
-                        )
+            # Ignore FDs whose determinant has already been moved out of this relation
+            if self.fds[i].det_mask & ~self.attr_mask:
+                continue
+            # If an FD's determinant isn't a superkey and determines non-prime attributes, the FD violates 3NF and must
+            # be separated out. The closure also finds the attributes it determines through attributes already moved
+            # out of this relation.
+            det_mask = self.fds[i].det_mask
+            affected = 0
+            if not self.is_superkey(det_mask):
+                non_prime = self.attr_mask & ~self.prime_mask() & ~det_mask
+                affected = self.closure(det_mask) & non_prime
+                for dep in self.attr_table.names_of(affected):
+                    instrument.trace(
+                        "!!!!!!Found transitive dependency from {} in {}",
+                        dep,
+                        self.name,
+                    )
+            violation = affected != 0
 
             if violation:
                 new_name = ""
                 for det in self.fds[i].determinant:
                     new_name += det
                 new_name += "Data"
-                print(f"Creating new relation {new_name}")
+                instrument.log("Creating new relation {}", new_name)
                 # Add the transitive FD's involved attributes to the new table (with their data types)
-                new_attrs = self.fds[i].determinant[:]
-                for j in range(len(self.fds[i].dependents)):
-                    new_attrs += self.fds[i].dependents[j][:]
-                for j in range(len(new_attrs)):
-                    loc = [x[0] for x in self.attributes].index(new_attrs[j])
-                    new_attrs[j] = [new_attrs[j], self.attributes[loc][1]]
-                print(f"Contains attributes: {new_attrs}")
+                moved = affected | (self.fds[i].dep_mask & self.attr_mask)
+                new_attrs = self.attr_table.typed(
+                    list(self.fds[i].determinant) + self.names_in(moved & ~det_mask)
+                )
+                instrument.trace("Contains attributes: {}", new_attrs)
                 new_tables.append(
                     Relation(
                         name=new_name,
                         attrs=new_attrs,
-                        prim_key=self.fds[i].determinant[:],
+                        prim_key=list(self.fds[i].determinant),
                         can_keys=[],
                         mv_attrs=[],
-                        fds=[self.fds[i]],
-                        data=[],
+                        fds=self.projected_fds(det_mask | moved),
+                        data=self.project_data([x[0] for x in new_attrs]),
+                        attr_table=self.attr_table,
                     )
                 )
                 # Remove the transitively dependent attributes from the old table
-                unpacked_deps = []
-                for dep_set in self.fds[i].dependents:
-                    unpacked_deps += dep_set
-                for fd_dep in unpacked_deps:
-                    print(
-                        "popping:",
-                        self.attributes.pop(
-                            [x[0] for x in self.attributes].index(fd_dep)
-                        ),
-                    )
+                for removed in self.remove_attributes(moved & ~det_mask):
+                    instrument.trace("popping: {}", removed)
                 fds_to_pop.append(i)
-        # Remove all identified (and separated) transitive funcitonal dependencies
-        for i in fds_to_pop[::-1]:
-            self.fds.pop(i)
+        if fds_to_pop:
+            # Moving attributes out can leave new determinants behind (A -> B and {B, C} -> D leave {A, C} -> D once B
+            # is gone), so the FDs are projected onto the remaining attributes and the relation is checked again
+            self.fds = self.projected_fds(self.attr_mask)
+            self.minimal_cover()
+            new_tables += self.three_nf()
         return new_tables
 
-    def bcnf(self) -> list[Self]:
-        """Normalize the relation to BCNF by detecting functional dependencies with non-superkey determinants and
-        separating them into their own relations, which are returned."""
+    def synthesize_3nf(self) -> list[Self]:
+        """Normalize the relation to 3NF by Bernstein synthesis: one relation per determinant of a minimal cover, plus
+        a relation holding a key if none of them contains one, minus any relation contained in another. The result is
+        lossless and dependency-preserving. The returned relations replace this one."""
+        # Restrict the FDs to this relation's attributes before taking the cover
+        restricted = []
+        mvds = []
+        for fd in self.fds:
+            if fd.is_mv():
+                mvds.append(fd)
+            elif not fd.det_mask & ~self.attr_mask:
+                deps = fd.dep_mask & self.attr_mask & ~fd.det_mask
+                if deps:
+                    restricted.append(
+                        FunctionalDependency(
+                            fd.determinant,
+                            [self.names_in(deps)],
+                            self.attr_table,
+                        )
+                    )
+        self.fds = restricted
+        self.minimal_cover()
+        cover = self.fds[:]
+        self.find_candidate_keys()
+
+        # One relation per determinant (the cover has already merged FDs with equal determinants)
+        schemas: list[list] = []
+        for fd in cover:
+            schemas.append([fd.det_mask | fd.dep_mask, fd])
+        if not any(self.is_superkey(mask) for mask, _ in schemas):
+            schemas.append([self.mask(self.primary_key), None])
+
+        # Drop relations whose attributes are contained in another (keeping the first of any exact duplicates)
+        kept = []
+        for i in range(len(schemas)):
+            mask = schemas[i][0]
+            subsumed = False
+            for j in range(len(schemas)):
+                other = schemas[j][0]
+                if i != j and not mask & ~other and (mask != other or j < i):
+                    subsumed = True
+                    break
+            if not subsumed:
+                kept.append(schemas[i])
+
         new_tables = []
-        fds_to_pop = []
-        for i in range(len(self.fds)):
-            # Ignore multi-valued attributes
-            if len(self.fds[i].dependents) > 1:
-                continue
-            # If the FD's determinant isn't a superkey, the FD violates BCNF and must be separated out.
-            if set(self.primary_key) != set(self.fds[i].determinant):
-                print(
-                    f"Table {self.name}: PK = {self.primary_key}, FD {str(self.fds[i])} violates"
-                )
+        for mask, fd in kept:
+            if fd is None:
+                new_name = self.name
+                new_prim = self.primary_key[:]
+            else:
                 new_name = ""
-                for det in self.fds[i].determinant:
+                for det in fd.determinant:
                     new_name += det
                 new_name += "Data"
-                print(f"Creating new relation {new_name}")
-                # Add the violating FD's involved attributes to the new table (with their data types)
-                new_attrs = self.fds[i].determinant[:]
-                for j in range(len(self.fds[i].dependents)):
-                    new_attrs += self.fds[i].dependents[j][:]
-                for j in range(len(new_attrs)):
-                    loc = [x[0] for x in self.attributes].index(new_attrs[j])
-                    new_attrs[j] = [new_attrs[j], self.attributes[loc][1]]
-                print(f"Contains attributes: {new_attrs}")
-                new_tables.append(
-                    Relation(
-                        name=new_name,
-                        attrs=new_attrs,
-                        prim_key=self.fds[i].determinant[:],
-                        can_keys=[],
-                        mv_attrs=[],
-                        fds=[self.fds[i]],
-                        data=[],
+                new_prim = list(fd.determinant)
+            # Carry every cover FD (and MVD) that lies entirely inside the new relation
+            new_fds = []
+            for other in cover + mvds:
+                if not (other.det_mask | other.dep_mask) & ~mask:
+                    new_fds.append(other)
+            new_can = []
+            for key in self.candidate_keys:
+                if not self.mask(key) & ~mask:
+                    new_can.append(key)
+            instrument.log("Synthesized relation {}", new_name)
+            new_tables.append(
+                Relation(
+                    name=new_name,
+                    attrs=self.attr_table.typed(self.names_in(mask)),
+                    prim_key=new_prim,
+                    can_keys=new_can,
+                    mv_attrs=[],
+                    fds=new_fds,
+                    data=self.project_data(self.names_in(mask)),
+                    attr_table=self.attr_table,
+                )
+            )
+        return new_tables
+
+    def projected_fds(
+        self, mask: int, mvds: list[FunctionalDependency] | None = None
+    ) -> list[FunctionalDependency]:
+        """Dependencies of the relation that hold on the attributes in mask. Each determinant inside mask keeps
+        whatever it determines within mask, and each MVD {X} ->> {Y} | {Z} keeps its dependent sets intersected with
+        mask (as long as two remain). An MVD whose X reaches outside mask moves to the first determinant W inside mask
+        with W -> X, since W ->> Y follows from W -> X and X ->> Y. mvds defaults to the relation's MVDs.
+        """
+        if mvds is None:
+            mvds = [fd for fd in self.fds if fd.is_mv()]
+        fds = []
+        dets = self.projected_determinants(mask)
+        for det in dets:
+            deps = self.closure(det) & mask & ~det
+            if deps:
+                fds.append(
+                    FunctionalDependency(
+                        self.attr_table.names_of(det),
+                        [self.names_in(deps)],
+                        self.attr_table,
                     )
                 )
-                # Remove the violating attributes from the old table
-                unpacked_deps = []
-                for dep_set in self.fds[i].dependents:
-                    unpacked_deps += dep_set
-                for fd_dep in unpacked_deps:
-                    print(
-                        "popping:",
-                        self.attributes.pop(
-                            [x[0] for x in self.attributes].index(fd_dep)
-                        ),
+        for mvd in mvds:
+            det = mvd.det_mask
+            if det & ~mask:
+                det = next(
+                    (other for other in dets if not det & ~self.closure(other)), 0
+                )
+                if not det:
+                    continue
+            elif not mvd.dep_mask & ~mask:
+                fds.append(mvd)
+                continue
+            dep_sets = [dep_mask & mask & ~det for dep_mask in mvd.dep_masks]
+            dep_sets = [dep_set for dep_set in dep_sets if dep_set]
+            rest = mask & ~det & ~mvd.det_mask & ~mvd.dep_mask
+            if rest:
+                dep_sets.append(rest)
+            if len(dep_sets) > 1:
+                fds.append(
+                    FunctionalDependency(
+                        self.attr_table.names_of(det),
+                        [self.names_in(dep_set) for dep_set in dep_sets],
+                        self.attr_table,
                     )
-                fds_to_pop.append(i)
-        # Remove all identified (and separated) violating functional dependencies
-        for i in fds_to_pop[::-1]:
-            self.fds.pop(i)
-        print("-" * 50)
+                )
+        return fds
+
+    def projected_determinants(self, mask: int) -> list[int]:
+        """Determinants worth projecting onto the attributes in mask: those of the FDs that lie inside mask, then those
+        found by resolving FDs whose determinant reaches outside mask. The attributes outside mask are replaced with
+        determinants (inside mask) that determine them and the result is reduced to the attributes it needs, which
+        finds e.g. {A, C} for A -> B and {B, C} -> D on mask {A, C, D}. Finding every determinant of a projection takes
+        exponential time, so determinants that only arise from resolving FDs in other orders may be missed.
+        """
+        dets = []
+        for fd in self.fds:
+            if not fd.is_mv() and not fd.det_mask & ~mask and fd.det_mask not in dets:
+                dets.append(fd.det_mask)
+        outside = [
+            fd.det_mask for fd in self.fds if not fd.is_mv() and fd.det_mask & ~mask
+        ]
+        # Single attributes can stand in for outside attributes too, and smaller determinants are tried first
+        singles = self.attr_table.names_of(mask)
+        changed = True
+        while changed:
+            changed = False
+            parts = sorted(
+                dets + [self.attr_table.bit(name) for name in singles],
+                key=int.bit_count,
+            )
+            for target in outside:
+                # Each part that determines some of the target's outside attributes is tried as the starting point
+                for seed in parts:
+                    det = (target & mask) | seed
+                    closed = self.closure(det)
+                    if not self.closure(seed) & target & ~mask:
+                        continue
+                    for other in parts:
+                        if not target & ~closed:
+                            break
+                        # A part that reaches the target on its own is tried as a seed itself, and adding it here
+                        # would only reduce back to it
+                        if not target & ~mask & ~self.closure(other):
+                            continue
+                        # A part can help through the attributes it determines together with the others
+                        grown = self.closure(det | other)
+                        if grown & target & ~closed:
+                            det |= other
+                            closed = grown
+                    if target & ~closed:
+                        continue
+                    # Drop the attributes the determinant doesn't need to reach the target
+                    rest = det
+                    while rest:
+                        attr = rest & -rest
+                        rest ^= attr
+                        if not target & ~self.closure(det & ~attr):
+                            det &= ~attr
+                    if det and det not in dets:
+                        dets.append(det)
+                        changed = True
+        return dets
+
+    def inherit_dependencies(self, source: Self) -> None:
+        """Replace the relation's FDs with a minimal cover of those of source (the relation it was decomposed from)
+        projected onto its attributes. Dependencies that hold through attributes split off into other tables, and so
+        are missing from the relation's own FDs, are then seen too. The relation keeps its own MVDs.
+        """
+        self.fds = source.projected_fds(
+            self.attr_mask, [fd for fd in self.fds if fd.is_mv()]
+        )
+        self.minimal_cover()
+
+    def dependency_basis(
+        self,
+        det: int,
+        within: int | None = None,
+        mvds: list[FunctionalDependency] | None = None,
+    ) -> list[int]:
+        """The dependency basis of the determinant bitmask det within the attribute bitmask within (the relation by
+        default): the finest partition of within - det such that det ->> Y follows from the dependencies whenever Y is
+        a union of its blocks. Computed with Beeri's algorithm, which splits a block B by every MVD V ->> W with V
+        outside B until no block changes. Each FD V -> W counts as the MVDs V ->> A for every A in W. Only
+        dependencies whose determinant lies inside within are used, so the result also holds on a projection. mvds
+        defaults to the relation's MVDs. Blocks are returned ordered by their lowest attribute ID.
+        """
+        if within is None:
+            within = self.attr_mask
+        if mvds is None:
+            mvds = [fd for fd in self.fds if fd.is_mv()]
+        rules: list[tuple[int, int]] = []
+        for fd in self.fds:
+            if fd.is_mv() or fd.det_mask & ~within:
+                continue
+            deps = fd.dep_mask & within
+            while deps:
+                low = deps & -deps
+                rules.append((fd.det_mask, low))
+                deps ^= low
+        for mvd in mvds:
+            if mvd.det_mask & ~within:
+                continue
+            for dep_mask in mvd.dep_masks:
+                if dep_mask & within:
+                    rules.append((mvd.det_mask, dep_mask & within))
+        basis = [within & ~det] if within & ~det else []
+        changed = True
+        while changed:
+            changed = False
+            for lhs, rhs in rules:
+                refined = []
+                for block in basis:
+                    if not block & lhs and block & rhs and block & ~rhs:
+                        refined += [block & rhs, block & ~rhs]
+                        changed = True
+                    else:
+                        refined.append(block)
+                basis = refined
+        return sorted(basis, key=lambda block: block & -block)
+
+    def bcnf(self) -> list[Self]:
+        """Normalize the relation to BCNF by detecting functional dependencies with non-superkey determinants and
+        separating them into their own relations, which are returned.
+
+        A determinant X inside a relation R violates BCNF when closure(X) adds attributes of R without reaching all of
+        them. normalize() first replaces the relation's FDs with those of the relation it was split from projected onto
+        its attributes (see inherit_dependencies), so the closure also follows dependencies through attributes already
+        moved to other tables. Testing X -> closure(X) this way avoids computing the (possibly exponential) projected
+        FD set of every piece. R is split into closure(X) and R - (closure(X) - X), and both halves are checked again
+        until no determinant violates. Determinants that lose attributes to a split are rewritten with X in their
+        place, since X still determines the removed attributes. A piece none of those violate is also tested against
+        the determinants of its projection (see projected_determinants) before it is accepted.
+        """
+        dets = []
+        for fd in self.fds:
+            if not fd.is_mv() and fd.det_mask not in dets:
+                dets.append(fd.det_mask)
+
+        # Each piece remembers the determinant it was split on (0 for the piece that keeps this relation's identity)
+        # and the determinants still worth testing inside it
+        leaves: list[tuple[int, int]] = []
+        stack = [(self.attr_mask, 0, dets)]
+
+        def find_violation(mask: int, dets: list[int]) -> tuple[int, int] | None:
+            for det in dets:
+                if det & ~mask:
+                    continue
+                instrument.count("FDs examined")
+                closed = self.closure(det) & mask
+                if closed & ~det and closed != mask:
+                    return det, closed
+            return None
+
+        while stack:
+            mask, origin, dets = stack.pop()
+            violation = find_violation(mask, dets)
+            if violation is None:
+                # dets only holds determinants carried over from the parent piece, so those that only arise in the
+                # projection onto this piece are tested before it is accepted
+                extra = [
+                    det for det in self.projected_determinants(mask) if det not in dets
+                ]
+                dets = dets + extra
+                violation = find_violation(mask, extra)
+            if violation is None:
+                leaves.append((mask, origin))
+                continue
+            det, closed = violation
+            instrument.log(
+                "Table {}: {} determines {} but is not a superkey",
+                self.name,
+                self.attr_table.names_of(det),
+                self.names_in(closed & ~det),
+            )
+            removed = closed & ~det
+            rest_dets = []
+            for other in dets:
+                if other & removed:
+                    other = (other & ~removed) | det
+                if other not in rest_dets:
+                    rest_dets.append(other)
+            # Push the split-off piece first so the remainder is decomposed (and becomes a leaf) first
+            stack.append(
+                (closed, det, [other for other in dets if not other & ~closed])
+            )
+            stack.append((mask & ~removed, origin, rest_dets))
+
+        if len(leaves) == 1:
+            return []
+
+        new_tables = []
+        for mask, origin in leaves[1:]:
+            new_name = ""
+            for det in self.attr_table.names_of(origin):
+                new_name += det
+            new_name += "Data"
+            instrument.log("Creating new relation {}", new_name)
+            new_table = Relation(
+                name=new_name,
+                attrs=self.attr_table.typed(self.names_in(mask)),
+                prim_key=self.attr_table.names_of(origin),
+                can_keys=[],
+                mv_attrs=[],
+                fds=self.projected_fds(mask),
+                data=self.project_data(self.names_in(mask)),
+                attr_table=self.attr_table,
+            )
+            new_table.find_candidate_keys()
+            new_tables.append(new_table)
+
+        # This relation keeps the remainder
+        remainder = leaves[0][0]
+        self.fds = self.projected_fds(remainder)
+        for removed in self.remove_attributes(self.attr_mask & ~remainder):
+            instrument.trace("popping: {}", removed)
+        self.find_candidate_keys()
+        instrument.trace("-" * 50)
         return new_tables
 
-    def four_nf(self) -> list[Self]:
-        """Normalize the relation to 4NF by separating multivalued functional dependencies into their own relations,
-        which are returned."""
-        # TODO: Request if there are additional MVDs for each relation with enough attributes
-        # TODO: Request data. split based on the newly supplied MVDs
+    def four_nf(
+        self, data_source: str | None = None, interactive: bool = True
+    ) -> list[Self]:
+        """Normalize the relation to 4NF by decomposing on multivalued dependencies whose determinant isn't a superkey.
+        If a decomposition happens, the returned relations replace this one.
+
+        Table data is loaded from data_source if the relation has none (or, when interactive, typed on stdin) and any
+        MVD it contradicts is dropped. The pieces are found with the dependency basis and split recursively, so no
+        MVD has to be picked by hand. With interactive=False nothing is prompted for.
+        """
         new_tables = []
         # Tables with less than 3 attributes automatically satisfy 4NF
         if len(self.attributes) < 3:
             return new_tables
         # For other 3+ attribute tables, request multivalue dependencies from the user
-        print(f"\nHere is the schema for relation {self.name}:")
-        print(str(self))
-        print(
-            "Are there any multi-valued dependencies you want to add before normalization?"
-        )
-        user_in = input("Type a multi-valued dependency or 'q':\n")
+        instrument.log("\nHere is the schema for relation {}:", self.name)
+        instrument.log("{}", self)
+        user_in = "q"
+        if interactive:
+            print(
+                "Are there any multi-valued dependencies you want to add before normalization?"
+            )
+            user_in = input("Type a multi-valued dependency or 'q':\n")
         while user_in != "q":
             valid = True
             if not (" ->> " in user_in):
@@ -521,271 +2206,1839 @@ class Relation:
                 for dep_set in deps:
                     fd_attrs += dep_set
                 for attr in fd_attrs:
-                    if not attr in [x[0] for x in self.attributes]:
+                    if not self.has_attr(attr):
                         print(
                             "Error: Attribute in functional dependency not present in attribute set. Please try again."
                         )
                         valid = False
             if valid:
-                self.fds.append(FunctionalDependency(det, deps))
+                self.fds.append(FunctionalDependency(det, deps, self.attr_table))
                 print(f"The relation now has the following Functional Dependencies:")
                 for fd in self.fds:
                     print(str(fd))
 
             user_in = input("Type a multi-valued dependency or 'q':\n")
-        mvds = []
-        for fd in self.fds:
-            if len(fd.dependents) > 1:
-                mvds.append(fd)
+        mvds = [fd for fd in self.fds if fd.is_mv()]
         # If there are no multi-valued dependencies, return here. Otherwise, proceed with requesting table data to verify.
         if not mvds:
             return new_tables
-        print("This relation has the following MVDs:")
+        instrument.log("This relation has the following MVDs:")
         for mvd in mvds:
-            print(str(mvd))
-        print("\nThe normalizer needs table data to verify.")
-        print(
-            "Please enter data values separated by ', ' that adhere to the following schema:"
-        )
-        for attr in [x[0] for x in self.attributes[:-1]]:
-            print(attr, end=", ")
-        print(self.attributes[-1][0])
-        print("Each tuple is on its own line. Enter 'q' instead to stop input.")
-        user_in = input()
-        while user_in != "q":
-            user_in = user_in.split(", ")
-            if len(user_in) == len(self.attributes):
-                self.data.append(user_in)
-            else:
-                print(
-                    "Incorrect number of attributes. Please match the following schema or enter q to stop input."
-                )
-                for attr in [x[0] for x in self.attributes[:-1]]:
-                    print(attr, end=", ")
-                print(self.attributes[-1][0])
-            user_in = input()
-        print("\nData has been added to the relation!")
-        print(str(self))
+            instrument.log("{}", mvd)
+        if interactive or data_source is not None:
+            self.request_data(data_source)
+        if self.data:
+            instrument.log(
+                "\nRelation {} has {} tuples of data.", self.name, len(self.data)
+            )
 
         # Validate MVDs
-
-        # Separate MVDs
-        # Select which MVD to use
-        if len(mvds) > 1:
-            print(
-                "Which of the following MVDs should be prioritized for decomposition?"
-            )
-            for i in range(len(mvds)):
-                print(f"{i+1}: {str(mvds[i])}")
-            priority = input()
-            while not priority.isnumeric() or not int(priority) <= len(mvds):
-                print(f"Invalid input: enter a number between 1 and {len(mvds)}:")
-                priority = input()
-            priority = int(priority) - 1
+        if self.data:
+            valid_mvds = []
+            for mvd in mvds:
+                violations = self.mvd_violations(mvd)
+                if violations:
+                    instrument.log(
+                        "{} does not hold: {} {} group(s) violate it, e.g.:",
+                        mvd,
+                        len(violations),
+                        self.attr_table.names_of(mvd.det_mask),
+                    )
+                    for values in violations[:5]:
+                        instrument.log(
+                            ", ".join(format_value(value) for value in values)
+                        )
+                else:
+                    instrument.log("{} holds on the data.", mvd)
+                    valid_mvds.append(mvd)
+            mvds = valid_mvds
+            if not mvds:
+                instrument.log("No multi-valued dependencies hold in {}.", self.name)
+                return new_tables
         else:
-            priority = 0
-
-        chosen_fd = self.fds[priority]
+            instrument.log(
+                "Without data the multi-valued dependencies can't be verified."
+            )
 
-        for dep_set in chosen_fd.dependents:
-            new_name = ""
-            for attr in chosen_fd.determinant:
-                new_name += attr
-            for attr in dep_set:
-                new_name += attr
-            new_name += "Data"
-            new_attrs = chosen_fd.determinant[:] + dep_set
-
-            # Handle Data transfer:
-            used_attr_i = []
-            for i in range(len(self.attributes)):
-                if self.attributes[i][0] in new_attrs:
-                    used_attr_i.append(i)
-            new_data = []
-            for tuple in self.data:
-                new_tuple = []
-                for i in used_attr_i:
-                    new_tuple.append(tuple[i])
-                duplicate = False
-                for i in range(len(new_data)):
-                    if set(new_tuple) == set(new_data[i]):
-                        duplicate = True
+        # Separate MVDs: split on any determinant that isn't a superkey but has a non-trivial dependency basis, and
+        # keep splitting the pieces until none has one. Determinants are tried in FD order so output is deterministic.
+        dets = []
+        for fd in self.fds:
+            if (not fd.is_mv() or fd in mvds) and fd.det_mask not in dets:
+                dets.append(fd.det_mask)
+        leaves: list[tuple[int, str]] = []
+        stack = [(self.attr_mask, self.name)]
+        while stack:
+            mask, name = stack.pop()
+            split = None
+            for det in dets:
+                if det & ~mask or not mask & ~self.closure(det):
+                    continue
+                basis = self.dependency_basis(det, mask, mvds)
+                if len(basis) < 2:
+                    continue
+                # Prefer the attributes det determines, then a declared dependent set, then the first basis block
+                choices = [self.closure(det) & mask & ~det]
+                for mvd in mvds:
+                    if mvd.det_mask == det:
+                        for dep_mask in mvd.dep_masks:
+                            choices.append(
+                                sum(block for block in basis if block & dep_mask)
+                            )
+                choices.append(basis[0])
+                for dep in choices:
+                    if dep and dep != mask & ~det:
+                        split = (det, dep, dep == choices[0])
                         break
-                if not duplicate:
-                    new_data.append(new_tuple)
-
-            # Add data type info to attributes
-            for j in range(len(new_attrs)):
-                loc = [x[0] for x in self.attributes].index(new_attrs[j])
-                new_attrs[j] = [new_attrs[j], self.attributes[loc][1]]
-            for tuple in new_data:
-                print(tuple)
-            new_tables.append(
-                Relation(
-                    name=new_name,
-                    attrs=new_attrs,
-                    prim_key=[x[0] for x in new_attrs],
-                    can_keys=[],
-                    mv_attrs=[],
-                    fds=[],
-                    data=new_data,
+                break
+            if split is None:
+                leaves.append((mask, name))
+                continue
+            det, dep, functional = split
+            instrument.log(
+                "Table {}: {} ->> {} but is not a superkey",
+                name,
+                self.attr_table.names_of(det),
+                self.names_in(dep),
+            )
+            det_name = "".join(self.attr_table.names_of(det))
+            if functional:
+                # An FD split keeps the remainder under the current name, as in BCNF
+                split_name = det_name + "Data"
+                rest_name = name
+            else:
+                split_name = det_name + "".join(self.names_in(dep)) + "Data"
+                rest_name = (
+                    det_name + "".join(self.names_in(mask & ~det & ~dep)) + "Data"
                 )
+            stack.append((mask & ~dep, rest_name))
+            stack.append((det | dep, split_name))
+
+        if len(leaves) == 1:
+            return new_tables
+        for mask, name in leaves:
+            new_attrs = self.names_in(mask)
+            new_table = Relation(
+                name=name,
+                attrs=self.attr_table.typed(new_attrs),
+                prim_key=new_attrs[:],
+                can_keys=[],
+                mv_attrs=[],
+                fds=self.projected_fds(mask, mvds),
+                data=self.project_data(new_attrs),
+                attr_table=self.attr_table,
             )
-            print(f"Created\n{new_tables[-1]}")
+            new_table.find_candidate_keys()
+            new_tables.append(new_table)
+            instrument.log("Created\n{}", new_tables[-1])
         return new_tables
 
-    def five_nf(self) -> list[Self]:
-        """Normalize the relation to 5NF by prompting for table data, analyzing for join dependencies, and splitting the
-        relation into two new ones, which are returned (if the table can be split)."""
-        # TODO: Actually do have to test every combination... ugh
+    def join_dependency(
+        self, mask: int, max_components: int = 4, workers: int = 1
+    ) -> list[int] | None:
+        """Find a join dependency *{R1, ..., Rk} that holds in the data of the attributes in mask and isn't implied by
+        its keys, returning the components as bitmasks (None if there is none).
+
+        Candidates are the covers {R - A1, ..., R - Ak} for k = 3 up to max_components distinct attributes A1..Ak
+        (k = 2 is an MVD, which 4NF handles), tried smallest k first. A candidate is skipped when repeatedly merging
+        components whose common attributes form a superkey yields R, since the keys alone then imply it. The others
+        are tested by rejoining the projections of the data, which stops at the first spurious tuple. With workers > 1
+        the candidates are tested in a process pool; the first holding candidate in order is still the one returned.
+        """
+        names = self.names_in(mask)
+        if len(names) < 3 or not self.data:
+            return None
+        store = self.data.project(names)
+        bits = [self.attr_table.bit(name) for name in names]
+
+        def implied_by_keys(components: list[int]) -> bool:
+            merged = components[:]
+            changed = True
+            while changed and len(merged) > 1:
+                changed = False
+                for i, j in itertools.combinations(range(len(merged)), 2):
+                    if not mask & ~self.closure(merged[i] & merged[j]):
+                        merged[i] |= merged.pop(j)
+                        changed = True
+                        break
+            # A join dependency with a component covering R is trivial
+            return mask in merged
+
+        candidates: list[list[int]] = []
+        for k in range(3, min(max_components, len(names)) + 1):
+            for removed in itertools.combinations(range(len(names)), k):
+                components = [mask & ~bits[i] for i in removed]
+                if not implied_by_keys(components):
+                    candidates.append(components)
+        if not candidates:
+            return None
+
+        def positions(component: int) -> list[int]:
+            return [i for i in range(len(names)) if bits[i] & component]
+
+        jobs = [
+            [positions(component) for component in components]
+            for components in candidates
+        ]
+        if workers > 1 and len(jobs) > 1:
+            # Test in batches, so little work is wasted on candidates after the first one that holds
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_jd_search,
+                initargs=(store,),
+            ) as pool:
+                for start in range(0, len(jobs), workers):
+                    batch = pool.map(_jd_worker, jobs[start : start + workers])
+                    for components, spurious in zip(candidates[start:], batch):
+                        if spurious is None:
+                            return components
+            return None
+        present = set(store.code_rows())
+        cache: dict = {}
+        for components, job in zip(candidates, jobs):
+            if _spurious_tuple(store, present, job, cache) is None:
+                return components
+        return None
+
+    def five_nf(
+        self,
+        data_source: str | None = None,
+        interactive: bool = True,
+        max_components: int = 4,
+        workers: int = 1,
+        jds: list[list[int]] | None = None,
+    ) -> list[Self]:
+        """Normalize the relation to 5NF by loading table data (from data_source or, when interactive, stdin), finding
+        join dependencies in it, and splitting the relation into their components until none has one. If a
+        decomposition happens, the returned relations replace this one. See join_dependency for max_components and
+        workers. The join dependencies split on are appended to jds, if given, as lists of component bitmasks.
+        """
         new_tables = []
-        table_data = [[]]
         if len(self.attributes) > 2:
             # Data Entry
-            print(
-                f"Relation {self.name} has {len(self.attributes)} attributes and may be decomposed."
+            instrument.log(
+                "Relation {} has {} attributes and may be decomposed.",
+                self.name,
+                len(self.attributes),
+            )
+            if interactive or data_source is not None:
+                self.request_data(data_source)
+            if not self.data:
+                instrument.log(
+                    "Relation {} has no data, so it is left as it is.", self.name
+                )
+                return new_tables
+            instrument.log(
+                "Relation {} has {} tuples of data.", self.name, len(self.data)
             )
-            print(
-                "Please enter comma separated data that adheres to the following schema:"
-            )
-            for attr in [x[0] for x in self.attributes[:-1]]:
-                print(attr, end=", ")
-            print(self.attributes[-1][0])
-            print("Each tuple is on its own line. Enter 'q' instead to stop input.")
-            user_in = input()
-            while user_in != "q":
-                user_in = user_in.split()
-                if len(user_in) == len(self.attributes):
-                    table_data.append(user_in)
-                else:
-                    print(
-                        "Incorrect number of attributes. Please match the following schema or enter q to stop input."
-                    )
-                    for attr in [x[0] for x in self.attributes[:-1]]:
-                        print(attr, end=", ")
-                    print(self.attributes[-1][0])
-                user_in = input()
-            print("Input complete. You entered:")
-            for tuple in table_data:
-                print(tuple)
 
             # Computation
-
+            leaves = []
+            stack = [self.attr_mask]
+            # Components of different splits overlap, so the same attribute set can be reached more than once
+            seen = {self.attr_mask}
+            while stack:
+                mask = stack.pop()
+                components = self.join_dependency(mask, max_components, workers)
+                if components is None:
+                    leaves.append(mask)
+                    continue
+                instrument.log(
+                    "Table {}: join dependency *{{{}}} holds on the data",
+                    self.name,
+                    ", ".join(
+                        str(self.names_in(component)) for component in components
+                    ),
+                )
+                if jds is not None:
+                    jds.append(components)
+                for component in components[::-1]:
+                    if component not in seen:
+                        seen.add(component)
+                        stack.append(component)
+            if len(leaves) == 1:
+                return new_tables
+            for mask in leaves:
+                new_attrs = self.names_in(mask)
+                new_table = Relation(
+                    name="".join(new_attrs) + "Data",
+                    attrs=self.attr_table.typed(new_attrs),
+                    prim_key=new_attrs[:],
+                    can_keys=[],
+                    mv_attrs=[],
+                    fds=self.projected_fds(mask),
+                    data=self.project_data(new_attrs),
+                    attr_table=self.attr_table,
+                )
+                new_table.find_candidate_keys()
+                new_tables.append(new_table)
+                instrument.log("Created\n{}", new_tables[-1])
         else:
-            print(
-                f"Relation {self.name} only has 2 attributes and cannot be broken down."
+            instrument.log(
+                "Relation {} only has 2 attributes and cannot be broken down.",
+                self.name,
             )
         return new_tables
 
+    def lossless_join(
+        self, tables: list[Self], jds: list[list[int]] = (), max_rows: int = 10000
+    ) -> bool | None:
+        """Check with the chase whether the given relations always join back to this one under its FDs, MVDs and
+        declared keys, and the join dependencies in jds (each a list of component bitmasks, which may cover only some
+        of the attributes, like those five_nf splits on). Returns None if the tableau grows past max_rows before that
+        is decided.
 
-def interpret_input(input_filename: str) -> Relation:
-    """Read the contents of the given file and create a corresponding Relation class instance."""
-    schema = open(input_filename, "r")
-    # -- Name --
-    name = schema.readline().split()[1]
-    if len(name) < 1:
-        print("Error: Invalid relation name.")
-        sys.exit()
-    # -- Attributes --
-    attributes = schema.readline()[12:-1].split(", ")
-    if len(attributes) < 1:
-        print("Error: Invalid attributes.")
-        sys.exit()
-    for i in range(len(attributes)):
-        attributes[i] = attributes[i].split(":")
-    # -- Primary Key --
-    primary_key = schema.readline()[13:-1]
-    if (primary_key[0] == "{") and (primary_key[-1] == "}"):
-        primary_key = primary_key[1:-1].split(", ")
-        if len(primary_key) < 1:
-            print("Error: No attributes in the primary key.")
-            sys.exit()
+        The tableau starts with one row per table. Each row is a bitmask of the columns holding the distinguished
+        symbol; the other cells are union-find classes of equal symbols, kept per column. An FD X -> Y hashes the rows
+        by their X symbols and equates the Y symbols within each group. An MVD X ->> Y groups the rows by their X
+        symbols, and adds the pairs of a group's distinct XY and rest parts that no row has yet. A join dependency
+        joins the rows' projections onto its components and adds the joined tuples missing from the tableau, with new
+        symbols outside the components. The join is lossless as soon as some row is entirely distinguished.
+        """
+        attrs = self.attr_mask
+        cols = [col for col in range(attrs.bit_length()) if attrs >> col & 1]
+        position = {col: i for i, col in enumerate(cols)}
+        fds: list[tuple[list[int], list[int]]] = []
+        mvds: list[tuple[list[int], int]] = []
+
+        def cols_of(mask: int) -> list[int]:
+            return [col for col in cols if mask >> col & 1]
+
+        for fd in self.fds:
+            if fd.det_mask & ~attrs:
+                continue
+            if fd.is_mv():
+                for dep_mask in fd.dep_masks:
+                    mvds.append((cols_of(fd.det_mask), fd.det_mask | dep_mask & attrs))
+            else:
+                fds.append((cols_of(fd.det_mask), cols_of(fd.dep_mask & attrs)))
+        for key in self.key_masks():
+            if key and not key & ~attrs:
+                fds.append((cols_of(key), cols_of(attrs & ~key)))
+        join_deps = [
+            [[position[col] for col in cols_of(component)] for component in jd]
+            for jd in jds
+        ]
+
+        rows = [table.attr_mask & attrs for table in tables]
+        parent = {col: list(range(len(rows))) for col in cols}
+        members = {col: {row: [row] for row in range(len(rows))} for col in cols}
+
+        def find(col: int, row: int) -> int:
+            links = parent[col]
+            while links[row] != row:
+                links[row] = links[links[row]]
+                row = links[row]
+            return row
+
+        def symbols(row: int) -> tuple[int, ...]:
+            # -1 stands for the distinguished symbol, anything else for the class of equal symbols
+            bits = rows[row]
+            return tuple([-1 if bits >> col & 1 else find(col, row) for col in cols])
+
+        # The symbols of each row. Only FDs change the symbols of existing rows (and clear this); MVDs and join
+        # dependencies only add rows.
+        table: list[tuple[int, ...]] = []
+
+        def current_table() -> list[tuple[int, ...]]:
+            table.extend(symbols(row) for row in range(len(table), len(rows)))
+            return table
+
+        def add_row(cells: list[int | None]) -> None:
+            """Add a row holding the given symbols, one per column, where None is a new symbol."""
+            row = len(rows)
+            rows.append(0)
+            for col, cell in zip(cols, cells):
+                parent[col].append(row)
+                if cell is None or cell == -1:
+                    if cell == -1:
+                        rows[row] |= 1 << col
+                    members[col][row] = [row]
+                else:
+                    parent[col][row] = cell
+                    members[col][cell].append(row)
+
+        def apply_fd(det: list[int], deps: list[int]) -> bool:
+            groups: dict[tuple[int, ...], list[int]] = {}
+            for row in range(len(rows)):
+                bits = rows[row]
+                groups.setdefault(
+                    tuple([-1 if bits >> col & 1 else find(col, row) for col in det]),
+                    [],
+                ).append(row)
+            changed = False
+            for group in groups.values():
+                if len(group) < 2:
+                    continue
+                for col in deps:
+                    bit = 1 << col
+                    if any(rows[row] & bit for row in group):
+                        # Every symbol equal to the distinguished one becomes distinguished
+                        for row in group:
+                            if not rows[row] & bit:
+                                for member in members[col].pop(find(col, row)):
+                                    rows[member] |= bit
+                                changed = True
+                    else:
+                        first = find(col, group[0])
+                        for row in group[1:]:
+                            root = find(col, row)
+                            if root == first:
+                                continue
+                            if len(members[col][root]) > len(members[col][first]):
+                                first, root = root, first
+                            parent[col][root] = first
+                            members[col][first] += members[col].pop(root)
+                            changed = True
+            return changed
+
+        def apply_mvd(det: list[int], kept: int) -> bool:
+            det_pos = [position[col] for col in det]
+            kept_pos = [i for i, col in enumerate(cols) if kept >> col & 1]
+            rest_pos = [i for i, col in enumerate(cols) if not kept >> col & 1]
+            # Per X part: the distinct XY parts and rest parts, numbered, and the pairs of them the rows hold
+            groups: dict[tuple[int, ...], tuple[dict, dict, set]] = {}
+            for cells in current_table():
+                kept_parts, rest_parts, pairs = groups.setdefault(
+                    tuple([cells[i] for i in det_pos]), ({}, {}, set())
+                )
+                kept_part = tuple([cells[i] for i in kept_pos])
+                rest_part = tuple([cells[i] for i in rest_pos])
+                pairs.add(
+                    (
+                        kept_parts.setdefault(kept_part, len(kept_parts)),
+                        rest_parts.setdefault(rest_part, len(rest_parts)),
+                    )
+                )
+            changed = False
+            for kept_parts, rest_parts, pairs in groups.values():
+                if len(pairs) == len(kept_parts) * len(rest_parts):
+                    continue
+                for kept_part, kept_id in kept_parts.items():
+                    for rest_part, rest_id in rest_parts.items():
+                        if (kept_id, rest_id) in pairs:
+                            continue
+                        cells = [None] * len(cols)
+                        for i, cell in zip(kept_pos, kept_part):
+                            cells[i] = cell
+                        for i, cell in zip(rest_pos, rest_part):
+                            cells[i] = cell
+                        add_row(cells)
+                        changed = True
+                        if len(rows) > max_rows:
+                            return changed
+            return changed
+
+        # Per join dependency, the projection of the tableau onto its attributes after it was last applied, which
+        # the join dependency holds for
+        satisfied: dict[int, set[tuple[int, ...]]] = {}
+
+        def apply_jd(number: int, components: list[list[int]]) -> bool:
+            existing = current_table()
+            bound = list(components[0])
+            for component in components[1:]:
+                bound += [i for i in component if i not in bound]
+            present = {tuple([cells[i] for i in bound]) for cells in existing}
+            if satisfied.get(number) == present:
+                return False
+            joined = {tuple([cells[i] for i in components[0]]) for cells in existing}
+            width = len(components[0])
+            for component in components[1:]:
+                shared = [i for i in component if i in bound[:width]]
+                new = [i for i in component if i not in bound[:width]]
+                index: dict[tuple[int, ...], set[tuple[int, ...]]] = {}
+                for cells in existing:
+                    index.setdefault(tuple([cells[i] for i in shared]), set()).add(
+                        tuple([cells[i] for i in new])
+                    )
+                where = [bound.index(i) for i in shared]
+                joined = {
+                    part + extra
+                    for part in joined
+                    for extra in index.get(tuple([part[j] for j in where]), ())
+                }
+                width += len(new)
+            changed = False
+            for part in joined - present:
+                cells = [None] * len(cols)
+                for i, cell in zip(bound, part):
+                    cells[i] = cell
+                add_row(cells)
+                changed = True
+                if len(rows) > max_rows:
+                    return changed
+            # Every joined tuple is now present, and joining the projections again gives the same tuples
+            satisfied[number] = joined
+            return changed
+
+        while attrs not in rows:
+            changed = False
+            for det, deps in fds:
+                changed |= apply_fd(det, deps)
+            if changed:
+                table.clear()
+                continue
+            # Join dependencies go first: those five_nf split on join their components' rows straight back, where
+            # the MVDs would add rows to every group
+            for number, components in enumerate(join_deps):
+                changed |= apply_jd(number, components)
+                if len(rows) > max_rows:
+                    return None
+            if changed:
+                continue
+            for det, kept in mvds:
+                changed |= apply_mvd(det, kept)
+                if len(rows) > max_rows:
+                    return None
+            if not changed:
+                return False
+        return True
+
+    def lost_dependencies(self, tables: list[Self]) -> list[FunctionalDependency]:
+        """The relation's FDs that the given relations don't preserve, each reduced to its lost dependents.
+
+        X -> Y is preserved when Y lies in the closure of X under the union of the FDs projected onto each relation.
+        That closure is grown without projecting anything: starting from Z = X, each relation Ri adds
+        closure(Z & Ri) & Ri until Z stops changing. This takes polynomially many closures, where the projected FD
+        sets could be exponential.
+        """
+        masks = [table.attr_mask & self.attr_mask for table in tables]
+        lost = []
+        for fd in self.fds:
+            if fd.is_mv() or fd.det_mask & ~self.attr_mask:
+                continue
+            target = fd.dep_mask & self.attr_mask & ~fd.det_mask
+            reached = fd.det_mask
+            changed = True
+            while changed and target & ~reached:
+                changed = False
+                for mask in masks:
+                    if not reached & mask:
+                        continue
+                    grown = reached | self.closure(reached & mask) & mask
+                    if grown != reached:
+                        reached = grown
+                        changed = True
+            if target & ~reached:
+                lost.append(
+                    FunctionalDependency(
+                        fd.determinant,
+                        [self.names_in(target & ~reached)],
+                        self.attr_table,
+                    )
+                )
+        return lost
+
+    def absorb(self, other: Self) -> None:
+        """Take over the FDs and keys of a relation whose attributes all belong to this one and which is being dropped.
+        Only FDs that fit in this relation and keys that are superkeys here (and don't contain a known key) are kept.
+        """
+        known = [(fd.det_mask, fd.dep_masks) for fd in self.fds]
+        for fd in other.fds:
+            if (fd.det_mask | fd.dep_mask) & ~self.attr_mask:
+                continue
+            if (fd.det_mask, fd.dep_masks) not in known:
+                self.fds.append(fd)
+                known.append((fd.det_mask, fd.dep_masks))
+        keys = self.key_masks()
+        for key in other.key_masks():
+            if not key or key & ~self.attr_mask or not self.is_superkey(key):
+                continue
+            if not any(not known_key & ~key for known_key in keys):
+                self.candidate_keys.append(self.names_in(key))
+                keys.append(key)
+
+    def bind(self, attr_table: AttributeTable) -> None:
+        """Move the relation and its FDs onto another attribute table, e.g. the shared one after the relation has been
+        through a worker process."""
+        self.attr_table = attr_table
+        self.attr_mask = 0
+        for attr in self.attributes:
+            self.attr_mask |= 1 << attr_table.intern(attr[0], attr[1])
+        # Rebinding also rebuilds the FD indexes and resets the cached closures, which use the old bit positions
+        self.fds = [fd.rebind(attr_table) for fd in self.fds]
+
+    def __getstate__(self) -> dict:
+        # The closure engine and its cache are rebuilt on demand, so they aren't worth sending to other processes
+        state = self.__dict__.copy()
+        state["_engine"] = None
+        state["_closures"] = {}
+        return state
+
+    def snapshot(self, data: bool = True) -> "RelationSchema":
+        """An immutable snapshot of the relation (sharing its data store unless data is False)."""
+        return RelationSchema(self, data)
+
+    def schema_copy(self) -> Self:
+        """A copy of the relation's schema and dependencies, without data, that later normalization can't change."""
+        return self.snapshot(data=False).relation()
+
+
+class RelationSchema:
+    """An immutable snapshot of a relation: its name, attributes, keys and FDs, held in tuples. The snapshot shares
+    the FDs (which are immutable) and the data store with the relation, so taking one costs little more than copying
+    the attribute names. A relation rebuilt from it with relation() starts out as the original was, and normalizing
+    either one leaves the other alone, since normalization replaces data stores rather than modifying them.
+    """
+
+    __slots__ = (
+        "name",
+        "attributes",
+        "primary_key",
+        "candidate_keys",
+        "multivalued_attributes",
+        "fds",
+        "data",
+        "attr_table",
+    )
+
+    name: str
+    attributes: tuple[tuple[str, str], ...]
+    primary_key: tuple[str, ...]
+    candidate_keys: tuple[tuple[str, ...], ...]
+    multivalued_attributes: tuple[str, ...]
+    fds: tuple[FunctionalDependency, ...]
+    data: ColumnStore | None
+    attr_table: AttributeTable
+
+    def __init__(self, relation: "Relation", data: bool = True):
+        object.__setattr__(self, "name", relation.name)
+        object.__setattr__(
+            self, "attributes", tuple(tuple(attr) for attr in relation.attributes)
+        )
+        object.__setattr__(self, "primary_key", tuple(relation.primary_key))
+        object.__setattr__(
+            self, "candidate_keys", tuple(tuple(key) for key in relation.candidate_keys)
+        )
+        object.__setattr__(
+            self, "multivalued_attributes", tuple(relation.multivalued_attributes)
+        )
+        object.__setattr__(self, "fds", tuple(relation.fds))
+        object.__setattr__(self, "data", relation.data if data else None)
+        object.__setattr__(self, "attr_table", relation.attr_table)
+
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError(f"RelationSchema is immutable (tried to set {name})")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"RelationSchema is immutable (tried to delete {name})")
+
+    def __reduce__(self):
+        return (RelationSchema, (self.relation(), self.data is not None))
+
+    def relation(self) -> "Relation":
+        """A new relation in the state of the snapshot."""
+        return Relation(
+            name=self.name,
+            attrs=[list(attr) for attr in self.attributes],
+            prim_key=list(self.primary_key),
+            can_keys=[list(key) for key in self.candidate_keys],
+            mv_attrs=list(self.multivalued_attributes),
+            fds=self.fds,
+            data=self.data if self.data is not None else (),
+            attr_table=self.attr_table,
+        )
+
+
+class RelationRegistry:
+    """The output relations of a normalization, keyed by their attribute bitmask (the frozen attribute set), so an
+    exact duplicate is found with one dict lookup. Relations keep their registration order.
+    """
+
+    relations: dict[int, Relation]
+
+    def __init__(self, relations: Iterable[Relation] = ()):
+        self.relations = {}
+        self.extend(relations)
+
+    def register(self, relation: Relation) -> None:
+        """Add a relation. If one with the same attributes is registered, the new one replaces it (and moves to the
+        end), taking over its FDs and keys."""
+        previous = self.relations.pop(relation.attr_mask, None)
+        if previous is not None and previous is not relation:
+            relation.absorb(previous)
+        self.relations[relation.attr_mask] = relation
+
+    def extend(self, relations: Iterable[Relation]) -> None:
+        for relation in relations:
+            self.register(relation)
+
+    def remove(self, relation: Relation) -> None:
+        if self.relations.get(relation.attr_mask) is relation:
+            del self.relations[relation.attr_mask]
+
+    def __contains__(self, item: Relation | int) -> bool:
+        mask = item.attr_mask if isinstance(item, Relation) else item
+        return mask in self.relations
+
+    def __iter__(self) -> Iterator[Relation]:
+        # A snapshot, so relations can be registered or removed while iterating
+        return iter(list(self.relations.values()))
+
+    def __len__(self) -> int:
+        return len(self.relations)
+
+    def drop_subsumed(self) -> list[Relation]:
+        """Drop every relation whose attributes are strictly contained in another registered relation, which absorbs
+        its FDs and keys (the earliest registered container does). Containers are found through an index from each
+        attribute to the relations holding it, intersecting the smallest sets first. Returns the dropped relations.
+        """
+        holders: dict[int, set[int]] = {}
+        for mask in self.relations:
+            rest = mask
+            while rest:
+                bit = rest & -rest
+                holders.setdefault(bit, set()).add(mask)
+                rest ^= bit
+        order = {mask: i for i, mask in enumerate(self.relations)}
+        dropped = []
+        for mask in list(self.relations):
+            sets = []
+            rest = mask
+            while rest:
+                bit = rest & -rest
+                sets.append(holders[bit])
+                rest ^= bit
+            sets.sort(key=len)
+            containers = set(sets[0]) if sets else set(self.relations)
+            for other in sets[1:]:
+                containers &= other
+                if len(containers) <= 1:
+                    break
+            containers.discard(mask)
+            if not containers:
+                continue
+            container = self.relations[min(containers, key=order.__getitem__)]
+            relation = self.relations.pop(mask)
+            # Merging into a relation of the same name (both named after the same key) isn't worth reporting
+            if relation.name != container.name:
+                instrument.log(
+                    "Merging {} into {}, which holds all of its attributes",
+                    relation.name,
+                    container.name,
+                )
+            container.absorb(relation)
+            dropped.append(relation)
+            rest = mask
+            while rest:
+                bit = rest & -rest
+                holders[bit].discard(mask)
+                rest ^= bit
+        return dropped
+
+
+def _value_parser(typ: str):
+    """Return a function converting one text field to the Python value for an attribute of the given type. Empty
+    fields become None, except for text types where they stay empty strings."""
+    base = typ.split("(")[0].strip().upper()
+    if base in ["INTEGER", "INT", "SMALLINT", "BIGINT"]:
+        convert = int
+    elif base == "DATE":
+        convert = datetime.date.fromisoformat
+    elif base in ["MONEY", "DECIMAL", "NUMERIC"]:
+        convert = lambda value: decimal.Decimal(value.replace("$", "").replace(",", ""))
+    elif base in ["VARCHAR", "CHAR"] and "(" in typ:
+        limit = int(typ[typ.index("(") + 1 : typ.index(")")])
+
+        def check_length(value: str) -> str:
+            if len(value) > limit:
+                raise ValueError(f"'{value}' is longer than {typ}")
+            return value
+
+        return check_length
     else:
-        print("Error: Must include a primary key, surrounded by brackets.")
+        return str
+    return lambda value: convert(value) if value else None
+
+
+def format_value(value) -> str:
+    """Write a typed value back in the comma separated form read_rows accepts."""
+    if value is None:
+        return ""
+    value = str(value)
+    if "," in value or '"' in value:
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def read_rows(
+    lines: Iterable[str],
+    attributes: list[list[str]],
+    delimiter: str = ",",
+    chunk_size: int = DATA_CHUNK_SIZE,
+) -> Iterator[list[list]]:
+    """Parse delimited text lines into tuples typed by the given [name, type] attributes, yielding them in lists of
+    at most chunk_size so only one chunk is held in memory at a time. A first line naming every attribute is read as
+    a header and may list them in any order. Malformed lines are reported and skipped.
+    """
+    names = [attr[0] for attr in attributes]
+    parsers = [_value_parser(attr[1] if len(attr) > 1 else "") for attr in attributes]
+    order = None
+    identity = list(range(len(names)))
+    chunk = []
+    reader = csv.reader(lines, delimiter=delimiter, skipinitialspace=True)
+    for fields in reader:
+        fields = list(map(str.strip, fields))
+        if not any(fields):
+            continue
+        if order is None:
+            order = identity
+            if sorted(fields) == sorted(names):
+                order = [fields.index(name) for name in names]
+                continue
+        if len(fields) != len(names):
+            instrument.warn(
+                "Skipping line {}: expected {} values but found {}.",
+                reader.line_num,
+                len(names),
+                len(fields),
+            )
+            continue
+        if order != identity:
+            fields = [fields[i] for i in order]
+        try:
+            chunk.append([parse(field) for parse, field in zip(parsers, fields)])
+        except (ValueError, ArithmeticError) as error:
+            instrument.warn("Skipping line {}: {}", reader.line_num, error)
+            continue
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def open_data(
+    source: str,
+    attributes: list[list[str]],
+    delimiter: str | None = None,
+    chunk_size: int = DATA_CHUNK_SIZE,
+) -> Iterator[list[list]]:
+    """Stream typed tuple chunks from a CSV/TSV file, or from stdin when source is "-" (ending at EOF or a line
+    holding only 'q'). The delimiter defaults to a tab for .tsv files and a comma otherwise.
+    """
+    if source == "-":
+        lines = itertools.takewhile(lambda line: line.strip() != "q", sys.stdin)
+        yield from read_rows(lines, attributes, delimiter or ",", chunk_size)
+        return
+    if delimiter is None:
+        delimiter = "\t" if source.lower().endswith(".tsv") else ","
+    with open(source, "r", newline="") as file:
+        yield from read_rows(file, attributes, delimiter, chunk_size)
+
+
+def data_file_for(data_path: str | None, relation_name: str) -> str | None:
+    """Find the data file for a relation: data_path itself if it is a file, otherwise <relation_name>.csv or .tsv
+    inside the data_path directory."""
+    if data_path is None:
+        return None
+    if not os.path.isdir(data_path):
+        return data_path
+    for extension in [".csv", ".tsv"]:
+        path = os.path.join(data_path, relation_name + extension)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def _parse_set(text: str) -> list[str] | None:
+    """The names in a "{a, b}" set, or None if the text isn't one."""
+    text = text.strip()
+    if len(text) < 2 or text[0] != "{" or text[-1] != "}":
+        return None
+    return [name.strip() for name in text[1:-1].split(",") if name.strip()]
+
+
+def _parse_dependency(line: str) -> tuple[list[str], list[list[str]]] | str:
+    """Split "{X} -> {Y}" or "{X} ->> {Y} | {Z}" into its determinant and dependent sets, or return an error."""
+    if " ->> " in line:
+        det, deps = line.split(" ->> ", 1)
+        dep_sets = [_parse_set(dep_set) for dep_set in deps.split(" | ")]
+    elif " -> " in line:
+        det, deps = line.split(" -> ", 1)
+        dep_sets = [_parse_set(deps)]
+    else:
+        return "Functional Dependency requires '->' or '->>'"
+    if any(dep_set is None for dep_set in dep_sets):
+        return "Dependents must be surrounded by brackets."
+    det = _parse_set(det)
+    if det is None:
+        return "Determinant must be surrounded by brackets."
+    return det, dep_sets
+
+
+def parse_schema(lines: Iterable[str], source: str = "input") -> Iterator[Relation]:
+    """Parse schema text into relations, one per "Table:" block ("Relation:" as output_results writes them is read
+    too), yielding each as soon as its block ends so only one relation is held at a time. Every line is read once: it
+    is split into a "Key: value" header or, inside a Functional Dependencies or Data section, read as a dependency or a
+    tuple. FD attributes are checked against a set of the relation's attribute names. Errors name the line and stop
+    the program."""
+    numbered = enumerate(lines, 1)
+    number = 0
+    pending = None
+
+    def fail(message: str) -> None:
+        print(f"Error: {message} ({source}, line {number})")
         sys.exit()
-    # -- Candidate Keys --
-    candidate_keys = schema.readline()[16:-1].split("}, ")
-    if candidate_keys == ["None"]:
-        candidate_keys = []
-    elif len(candidate_keys):
-        for i in range(len(candidate_keys)):
-            if candidate_keys[i][0] == "{":
-                candidate_keys[i] = candidate_keys[i][1:].split(", ")
+
+    while True:
+        # -- Name --
+        if pending is None:
+            pending = next(
+                ((number, line) for number, line in numbered if line.strip()), None
+            )
+            if pending is None:
+                return
+        number, line = pending
+        pending = None
+        key, _, value = line.partition(":")
+        if key.strip() not in ["Table", "Relation"] or not value.strip():
+            fail("Invalid relation name.")
+        name = value.strip()
+        attributes: list[list[str]] = []
+        names: set[str] = set()
+        primary_key = None
+        candidate_keys: list[list[str]] = []
+        mv_attrs: list[str] = []
+        fds: list[tuple[list[str], list[list[str]]]] = []
+        section = None
+        for number, line in numbered:
+            line = line.strip()
+            if not line or line == "N/A":
+                continue
+            key, _, value = line.partition(":")
+            key = key.strip()
+            value = value.strip()
+            if key in ["Table", "Relation"]:
+                pending = (number, line)
+                break
+            if key == "Data":
+                section = "Data"
+                break
+            if section == "Functional Dependencies" and "->" in line:
+                parsed = _parse_dependency(line)
+                if isinstance(parsed, str):
+                    fail(parsed)
+                for attr in parsed[0] + [
+                    attr for dep_set in parsed[1] for attr in dep_set
+                ]:
+                    if attr not in names:
+                        fail(
+                            f"Attribute {attr} in functional dependency not present in attribute set."
+                        )
+                fds.append(parsed)
+            # -- Attributes --
+            elif key == "Attributes":
+                for attr in value.split(","):
+                    attr_name, _, typ = attr.strip().partition(":")
+                    if not attr_name:
+                        fail("Invalid attributes.")
+                    attributes.append([attr_name, typ])
+                    names.add(attr_name)
+            # -- Primary Key --
+            elif key == "Primary Key":
+                primary_key = _parse_set(value)
+                if primary_key is None:
+                    fail("Must include a primary key, surrounded by brackets.")
+                if not primary_key:
+                    fail("No attributes in the primary key.")
+            # -- Candidate Keys --
+            elif key == "Candidate Keys":
+                if value != "None":
+                    for key_set in value.split("}"):
+                        key_set = key_set.strip(" ,")
+                        if not key_set:
+                            continue
+                        key_set = _parse_set(key_set + "}")
+                        if key_set is None:
+                            fail(
+                                "Candidate key attributes must be surrounded by brackets."
+                            )
+                        candidate_keys.append(key_set)
+            # -- Multi-Value Attributes --
+            elif key == "Multi-Valued Attributes":
+                if value != "None":
+                    mv_attrs = [attr.strip() for attr in value.split(",")]
+            # -- Functional Dependencies --
+            elif key == "Functional Dependencies":
+                section = key
+            else:
+                fail(f"Unrecognized line '{line}'.")
+        if not attributes:
+            fail("Invalid attributes.")
+        if primary_key is None:
+            fail("Must include a primary key, surrounded by brackets.")
+        attr_table = AttributeTable(attributes)
+        relation = Relation(
+            name,
+            attributes,
+            primary_key,
+            candidate_keys,
+            mv_attrs,
+            fds=[FunctionalDependency(det, deps, attr_table) for det, deps in fds],
+            data=[],
+            attr_table=attr_table,
+        )
+        # -- Data (optional, one comma separated tuple per line, up to the next table) --
+        if section == "Data":
+
+            def data_lines() -> Iterator[str]:
+                nonlocal pending
+                for number, line in numbered:
+                    if line.startswith(("Table:", "Relation:")):
+                        pending = (number, line)
+                        return
+                    yield line
+
+            for chunk in read_rows(data_lines(), attributes):
+                relation.data.extend(chunk)
+        yield relation
+
+
+def read_schema(input_filename: str) -> Iterator[Relation]:
+    """Stream the relations of a schema file, one "Table:" block at a time."""
+    with open(input_filename, "r") as schema:
+        yield from parse_schema(schema, input_filename)
+
+
+def interpret_input(input_filename: str) -> Relation:
+    """Read the contents of the given file and create a corresponding Relation class instance (the file's first table)."""
+    for relation in read_schema(input_filename):
+        return relation
+    print(f"Error: No table found in {input_filename}.")
+    sys.exit()
+
+
+def _run_stage_job(
+    job: tuple[Relation, str, bool, bool],
+) -> tuple[Relation, list[Relation], str, dict[str, int]]:
+    """Stage worker: run one relation's stage method with the caller's quiet and verbose settings, returning the
+    changed relation, the relations it split off, everything it printed and the instrumentation counters.
+    """
+    relation, stage, quiet, verbose = job
+    instrument.quiet = quiet
+    instrument.verbose = verbose
+    instrument.reset()
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        children = getattr(relation, stage)()
+    return relation, children, log.getvalue(), instrument.counters
+
+
+def run_stage(
+    tables: Iterable[Relation], stage: str, workers: int = 1, requeue: bool = True
+) -> RelationRegistry:
+    """Run the Relation method named stage (e.g. "two_nf") on every table through a work queue, registering the
+    resulting tables in a new registry.
+
+    The queue is worked through in waves: every relation of a wave is normalized (in a process pool when workers > 1)
+    and the relations split off are queued as the next wave, so the order is the breadth-first order of a serial run
+    no matter which worker finishes first. Output printed in a worker is replayed in that same order and its counters
+    are added to the instrumentation. With
+    requeue=False the stage's results replace the relation instead (as synthesis does) and aren't processed again.
+    Relations coming back from a worker are rebound to the shared attribute table.
+    """
+    wave = list(tables)
+    attr_table = wave[0].attr_table if wave else None
+    result = RelationRegistry()
+    pool = None
+    if workers > 1:
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    try:
+        while wave:
+            if pool is not None and len(wave) > 1:
+                jobs = [
+                    (relation, stage, instrument.quiet, instrument.verbose)
+                    for relation in wave
+                ]
+                outcomes = list(pool.map(_run_stage_job, jobs))
+                for relation, children, log, counters in outcomes:
+                    print(log, end="")
+                    instrument.merge(counters)
+                    relation.bind(attr_table)
+                    for child in children:
+                        child.bind(attr_table)
             else:
-                print("Error: Candidate key attributes must be surrounded by brackets.")
+                outcomes = [
+                    (relation, getattr(relation, stage)(), "", {}) for relation in wave
+                ]
+            wave = []
+            for relation, children, _, _ in outcomes:
+                if requeue:
+                    result.register(relation)
+                    wave += children
+                else:
+                    result.extend(children if children else [relation])
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return result
+
+
+def discover_dependencies(relation: Relation, max_error: float | None = None) -> None:
+    """Add the FDs that hold on the relation's data (approximately, within max_error, if given) to its FDs."""
+    if relation.data:
+        instrument.log(
+            "Discovering functional dependencies from the relation's data..."
+        )
+        with instrument.stage("discover"):
+            if max_error is None:
+                discovered = relation.discover_fds()
+            else:
+                discovered = relation.discover_approximate_fds(max_error)
+        for fd in discovered:
+            instrument.log("{}", fd)
+        relation.fds += discovered
+    else:
+        instrument.log(
+            "The input file has no data section, so no dependencies can be discovered."
+        )
+
+
+def normalize(
+    relation: Relation,
+    target: str,
+    synthesize: bool = False,
+    discover: bool = False,
+    max_error: float | None = None,
+    data_path: str | None = None,
+    interactive: bool = True,
+    workers: int = 1,
+) -> tuple[list[Relation], bool | None, list[FunctionalDependency]]:
+    """Run the normalization stages on a relation up to the target normal form ("1NF" ... "5NF"). Returns the final
+    tables, whether they join back losslessly (None if undecided) and the FDs they no longer preserve. With
+    interactive=False nothing is prompted for, and 4NF/5NF only use data already loaded or found under data_path.
+    The 2NF, 3NF, BCNF and synthesis stages spread the relations over workers processes (see run_stage).
+    """
+    if discover:
+        discover_dependencies(relation, max_error)
+
+    # Kept to check the final tables against
+    original = relation.schema_copy()
+
+    instrument.log("Computing a minimal cover of the functional dependencies...")
+    with instrument.stage("minimal_cover"):
+        relation.minimal_cover()
+
+    instrument.log("Entering First normal form...")
+    with instrument.stage("one_nf"):
+        new_tables = relation.one_nf()
+    # The registry keys relations by their attributes, so the relation is registered after 1NF has changed them
+    tables = RelationRegistry([relation] + new_tables)
+    # The dependencies left by 1NF over all of the attributes. Later stages project them onto each table, since a
+    # table's own FDs miss those that hold through attributes split off into other tables.
+    source = Relation(
+        relation.name,
+        [attr[:] for attr in original.attributes],
+        [],
+        [],
+        [],
+        fds=list(dict.fromkeys(fd for table in tables for fd in table.fds)),
+        attr_table=relation.attr_table,
+    )
+
+    # After 1NF the relations are independent, so each stage can work on them concurrently
+    if synthesize and target in ["3NF", "BCNF", "4NF", "5NF"]:
+        # Synthesis produces 3NF directly, so it takes the place of the 2NF and 3NF passes
+        instrument.log("Time for Third Normal Form (by synthesis)...")
+        with instrument.stage("synthesize_3nf"):
+            tables = run_stage(tables, "synthesize_3nf", workers, requeue=False)
+    else:
+        if target in ["2NF", "3NF", "BCNF", "4NF", "5NF"]:
+            instrument.log("Time for Second Normal Form...")
+            with instrument.stage("two_nf"):
+                tables = run_stage(tables, "two_nf", workers)
+
+        if target in ["3NF", "BCNF", "4NF", "5NF"]:
+            instrument.log("Time for Third Normal Form...")
+            with instrument.stage("three_nf"):
+                for table in tables:
+                    table.inherit_dependencies(source)
+                tables = run_stage(tables, "three_nf", workers)
+
+    if target in ["BCNF", "4NF", "5NF"]:
+        instrument.log("Time for Boyce-Codd Normal Form...")
+        with instrument.stage("bcnf"):
+            for table in tables:
+                table.inherit_dependencies(source)
+            tables = run_stage(tables, "bcnf", workers)
+
+    if target in ["4NF", "5NF"]:
+        instrument.log("Time for Fourth Normal Form...")
+        with instrument.stage("four_nf"):
+            for x in tables:
+                new_tables = x.four_nf(data_file_for(data_path, x.name), interactive)
+                if len(new_tables):
+                    # The decomposed relation is replaced by its pieces. A piece already present only hands its FDs and
+                    # keys to the relation holding its attributes.
+                    tables.remove(x)
+                    for table in new_tables:
+                        if table in tables:
+                            tables.relations[table.attr_mask].absorb(table)
+                        else:
+                            tables.register(table)
+
+    jds: list[list[int]] = []
+    if target in ["5NF"]:
+        instrument.log("Time for Fifth Normal Form...")
+        if interactive:
+            instrument.log(
+                "NOTE: This normal form requires data for each relation, entered here or supplied with --data."
+            )
+        with instrument.stage("five_nf"):
+            for x in tables:
+                new_tables = x.five_nf(
+                    data_file_for(data_path, x.name), interactive, jds=jds
+                )
+                if len(new_tables):
+                    # Decomposed relations are replaced by their components
+                    tables.remove(x)
+                    tables.extend(new_tables)
+
+    with instrument.stage("drop_subsumed"):
+        tables.drop_subsumed()
+    tables = list(tables)
+
+    instrument.log("Checking that the tables join back into the original relation...")
+    with instrument.stage("lossless_join"):
+        # The join dependencies 5NF split on hold as well, so the tables can rely on them to join back
+        lossless = original.lossless_join(tables, jds)
+    if lossless:
+        instrument.log("The decomposition is lossless.")
+    elif lossless is None:
+        instrument.warn(
+            "Warning: the lossless-join check gave up before reaching an answer."
+        )
+    else:
+        instrument.warn(
+            "Warning: the decomposition is lossy; joining the tables can produce tuples that weren't in the relation."
+        )
+
+    instrument.log("Checking that the tables preserve the functional dependencies...")
+    with instrument.stage("lost_dependencies"):
+        lost = original.lost_dependencies(tables)
+    if lost:
+        instrument.warn(
+            "Warning: the following dependencies are no longer enforced by any table:"
+        )
+        for fd in lost:
+            instrument.warn(str(fd))
+    else:
+        instrument.log("All functional dependencies are preserved.")
+
+    return tables, lossless, lost
+
+
+def _normalize_file(job: tuple[str, str, str, dict]) -> tuple:
+    """Batch worker: normalize every table of one schema file without prompts and write their output. Progress
+    messages are skipped (quiet mode) and other console output is swallowed; a failure is reported with the last
+    message printed (or the exception)."""
+    input_filename, output_name, target, options = job
+    start = time.perf_counter()
+    log = io.StringIO()
+    quiet = instrument.quiet
+    instrument.quiet = True
+    try:
+        with contextlib.redirect_stdout(log):
+            tables = []
+            lossless = True
+            lost = []
+            for relation in read_schema(input_filename):
+                data_file = data_file_for(options.get("data_path"), relation.name)
+                if data_file is not None:
+                    relation.load_data(data_file)
+                normalized, relation_lossless, relation_lost = normalize(
+                    relation, target, interactive=False, **options
+                )
+                tables.extend(normalized)
+                lost.extend(relation_lost)
+                if relation_lossless is False:
+                    lossless = False
+                elif relation_lossless is None and lossless is True:
+                    lossless = None
+            if not tables:
+                print(f"Error: No table found in {input_filename}.")
                 sys.exit()
-        candidate_keys[-1][-1] = candidate_keys[-1][-1][:-1]
+            output_results(output_name, tables)
+    except (Exception, SystemExit) as error:
+        lines = log.getvalue().strip().splitlines()
+        message = lines[-1] if lines and isinstance(error, SystemExit) else repr(error)
+        return (input_filename, None, 0, None, 0, time.perf_counter() - start, message)
+    finally:
+        instrument.quiet = quiet
+    return (
+        input_filename,
+        output_name,
+        len(tables),
+        lossless,
+        len(lost),
+        time.perf_counter() - start,
+        None,
+    )
+
+
+def batch_normalize(
+    pattern: str,
+    target: str,
+    output_dir: str = "normalized",
+    workers: int | None = None,
+    output_format: str = "text",
+    **options,
+) -> list[tuple]:
+    """Normalize every schema file in a directory (*.txt) or matching a glob to the target normal form in a process
+    pool, writing each result to output_dir under the input's file name, plus a summary.txt. options are passed on to
+    normalize(). output_format "jsonl" writes the results as JSON Lines (*.jsonl). Returns one (input, output, tables,
+    lossless, lost FDs, seconds, error) tuple per file, in file order."""
+    if os.path.isdir(pattern):
+        filenames = sorted(glob.glob(os.path.join(pattern, "*.txt")))
     else:
-        print(
-            "Error: Candidate key definition is missing (use 'None' if there are none)."
+        filenames = sorted(glob.glob(pattern))
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [
+        (
+            filename,
+            os.path.join(
+                output_dir,
+                (
+                    os.path.basename(filename)
+                    if output_format == "text"
+                    else os.path.splitext(os.path.basename(filename))[0] + ".jsonl"
+                ),
+            ),
+            target,
+            options,
         )
-        sys.exit()
-    # -- Multi-Value Attributes --
-    mv_attrs = schema.readline()[25:-1].split(", ")
-    # -- Functional Dependencies --
-    fds: list[FunctionalDependency] = []
-    if schema.readline()[:24] == "Functional Dependencies:":
-        while fd := schema.readline():
-            if fd == "N/A":
-                break
-            if " -> " in fd:
-                det, deps = fd.split(" -> ")
-                deps = deps[:-1]
-                if deps[0] == "{" and deps[-1] == "}":
-                    deps = [deps[1:-1].split(", ")]
-                else:
-                    print("Error: Dependents must be surrounded by brackets.")
-                    sys.exit()
-            elif " ->> " in fd:
-                det, deps = fd.split(" ->> ")
-                deps = deps[:-1].split(" | ")
-                for i in range(len(deps)):
-                    if deps[i][0] == "{" and deps[i][-1] == "}":
-                        deps[i] = deps[i][1:-1].split(", ")
-                    else:
-                        print("Error: Dependents must be surrounded by brackets.")
-                        sys.exit()
+        for filename in filenames
+    ]
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(jobs) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(
+                pool.map(
+                    _normalize_file,
+                    jobs,
+                    chunksize=max(1, len(jobs) // (workers * 4)),
+                )
+            )
+    else:
+        results = [_normalize_file(job) for job in jobs]
+
+    summary = open(os.path.join(output_dir, "summary.txt"), "w")
+    for filename, output_name, count, lossless, lost, seconds, error in results:
+        if error is not None:
+            line = f"{filename}: FAILED ({error})"
+        else:
+            join = {True: "lossless", False: "LOSSY", None: "lossless join undecided"}
+            line = f"{filename} -> {output_name}: {count} tables, {join[lossless]}, {lost} lost dependencies"
+        summary.write(f"{line} [{seconds:.2f}s]\n")
+    failed = sum(1 for result in results if result[6] is not None)
+    lossy = sum(1 for result in results if result[3] is False)
+    summary.write(
+        f"{len(results)} files normalized to {target}: {failed} failed, {lossy} lossy\n"
+    )
+    summary.close()
+    return results
+
+
+class DecompositionExplorer:
+    """Explores the alternative decompositions of a relation to a normal form ("1NF" ... "4NF").
+
+    A normal form pass commits to one choice wherever several are possible: which violating FD or MVD to split on
+    first, which dependent set of an MVD to separate. The explorer branches on every such choice instead. After the
+    minimal cover and 1NF (which leave no choice), each resulting relation is split recursively: for every violation
+    in a piece, the piece is split in two (the violating determinant with what it determines, and the rest) and both
+    halves are explored in turn. Every split is lossless, since its halves share the determinant. The alternatives for
+    a piece only depend on its attributes (and the MVDs it carries, see piece_mvds), so they are memoized by attribute
+    bitmask and pieces reached along several branches are explored once. At most max_candidates alternatives are
+    kept for each piece and for the whole relation: those splitting the fewest of its FDs across tables, then those
+    with the fewest and smallest tables.
+    """
+
+    target: str
+    max_candidates: int
+    original: Relation
+    bases: list[Relation]
+    mvds: list[list[FunctionalDependency]]
+    pieces: dict[tuple[int, int], Relation]
+    memo: dict[tuple[int, int, int], list[tuple[int, ...]]]
+
+    def __init__(self, relation: Relation, target: str, max_candidates: int = 10):
+        self.target = target
+        self.max_candidates = max_candidates
+        self.original = relation.schema_copy()
+        with instrument.stage("minimal_cover"):
+            relation.minimal_cover()
+        with instrument.stage("one_nf"):
+            self.bases = [relation] + relation.one_nf()
+        # MVDs that the data contradicts are dropped, as in four_nf
+        self.mvds = []
+        for base in self.bases:
+            mvds = [fd for fd in base.fds if fd.is_mv()]
+            if base.data:
+                mvds = [mvd for mvd in mvds if not base.mvd_violations(mvd)]
+            self.mvds.append(mvds)
+        self.pieces = {}
+        self.memo = {}
+
+    def piece(self, base: int, mask: int) -> Relation:
+        """The attributes in mask of relation number base, with its keys. The piece keeps all of the relation's FDs,
+        so closures inside it give the projected dependencies."""
+        key = (base, mask)
+        if key not in self.pieces:
+            relation = self.bases[base]
+            piece = Relation(
+                name=relation.name,
+                attrs=relation.attr_table.typed(relation.names_in(mask)),
+                # Starting from the part of the relation's primary key in the piece lets the key search prefer it
+                prim_key=relation.names_in(relation.mask(relation.primary_key) & mask),
+                can_keys=[],
+                mv_attrs=[],
+                fds=relation.fds,
+                attr_table=relation.attr_table,
+            )
+            # Pieces are internal, so the key search's progress messages are left out
+            quiet = instrument.quiet
+            instrument.quiet = True
+            try:
+                piece.find_candidate_keys()
+            finally:
+                instrument.quiet = quiet
+            self.pieces[key] = piece
+        return self.pieces[key]
+
+    def piece_mvds(
+        self, base: int, mask: int, carried: int = 0
+    ) -> list[FunctionalDependency]:
+        """The MVDs of relation number base that hold in the piece with the attributes in mask: those whose
+        determinant it holds and whose dependent sets it still separates (meeting at least two of them), plus those
+        numbered in the bitmask carried (by position in self.mvds[base]). Like the tables four_nf runs on, a piece
+        holding only one of an MVD's dependent sets isn't decomposed by it, unless the piece was split off by an MVD
+        split, which keeps the MVDs of the table it was split from as four_nf does.
+        """
+        return [
+            mvd
+            for i, mvd in enumerate(self.mvds[base])
+            if not mvd.det_mask & ~mask
+            and (
+                carried >> i & 1
+                or sum(1 for dep_mask in mvd.dep_masks if dep_mask & mask) > 1
+            )
+        ]
+
+    def splits(
+        self, base: int, mask: int, carried: int = 0
+    ) -> list[tuple[int, int, int]]:
+        """Every way to split the piece on one of its violations of the target normal form, as (split off, rest,
+        carried MVDs) triples of bitmasks, in FD order. The halves of an MVD split carry the piece's MVDs (numbered
+        as in piece_mvds); those of an FD split carry none."""
+        if self.target == "1NF":
+            return []
+        piece = self.piece(base, mask)
+        prime = piece.prime_mask()
+        key_masks = piece.superkey_masks()
+        dets = []
+        for fd in piece.fds:
+            if not fd.is_mv() and not fd.det_mask & ~mask and fd.det_mask not in dets:
+                dets.append(fd.det_mask)
+        result = []
+        for det in dets:
+            closed = piece.closure(det) & mask
+            if self.target == "2NF":
+                if not det & prime or det in key_masks:
+                    continue
+                moved = closed & ~det & ~prime
+            elif self.target == "3NF":
+                if piece.is_superkey(det):
+                    continue
+                moved = closed & ~det & ~prime
             else:
-                print("Error: Functional Dependency requires '->' or '->>'")
-            if det[0] == "{" and det[-1] == "}":
-                det = det[1:-1].split(", ")
+                if piece.is_superkey(det):
+                    continue
+                moved = closed & ~det
+            if moved and (det | moved, mask & ~moved, 0) not in result:
+                result.append((det | moved, mask & ~moved, 0))
+        # As four_nf runs on the tables left by BCNF, MVDs are only split on once a piece is in BCNF
+        if self.target == "4NF" and not result:
+            held = self.piece_mvds(base, mask, carried)
+            carried = sum(
+                1 << i for i, mvd in enumerate(self.mvds[base]) if mvd in held
+            )
+            mvds = [
+                fd for fd in self.bases[base].projected_fds(mask, held) if fd.is_mv()
+            ]
+            for mvd in mvds:
+                det = mvd.det_mask
+                if det & ~mask or piece.is_superkey(det):
+                    continue
+                basis = piece.dependency_basis(det, mask, mvds)
+                if len(basis) < 2:
+                    continue
+                # Each declared dependent set can be split off (as the basis blocks it meets), falling back on the
+                # first block as four_nf does
+                choices = [
+                    sum(block for block in basis if block & dep_mask)
+                    for dep_mask in mvd.dep_masks
+                ] + [basis[0]]
+                for dep in choices:
+                    split = (det | dep, mask & ~dep, carried)
+                    if dep and dep != mask & ~det and split not in result:
+                        result.append(split)
+        return result
+
+    def alternatives(
+        self, base: int, mask: int | None = None, carried: int = 0
+    ) -> list[tuple[int, ...]]:
+        """The decompositions of a piece of relation number base (all of it by default), carrying the MVDs numbered
+        in carried, that satisfy the target normal form, each a sorted tuple of table attribute bitmasks.
+        """
+        if mask is None:
+            mask = self.bases[base].attr_mask
+        key = (base, mask, carried)
+        if key in self.memo:
+            instrument.count("explorer memo hits")
+            return self.memo[key]
+        instrument.count("pieces explored")
+        splits = self.splits(base, mask, carried)
+        if not splits:
+            self.memo[key] = [(mask,)]
+            return self.memo[key]
+        found: dict[tuple[int, ...], None] = {}
+        for split_off, rest, inherited in splits:
+            instrument.trace(
+                "Splitting {} into {} and {}",
+                self.bases[base].names_in(mask),
+                self.bases[base].names_in(split_off),
+                self.bases[base].names_in(rest),
+            )
+            for left in self.alternatives(base, split_off, inherited):
+                for right in self.alternatives(base, rest, inherited):
+                    tables = set(left + right)
+                    # A table whose attributes all belong to another one is redundant
+                    tables = [
+                        table
+                        for table in tables
+                        if not any(
+                            table != other and not table & ~other for other in tables
+                        )
+                    ]
+                    found[tuple(sorted(tables))] = None
+        # Prefer alternatives that keep each FD of the piece inside one table, then fewer and smaller tables
+        fds = [
+            fd.det_mask | fd.dep_mask
+            for fd in self.bases[base].fds
+            if not fd.is_mv() and not (fd.det_mask | fd.dep_mask) & ~mask
+        ]
+        ranked = sorted(
+            found,
+            key=lambda tables: (
+                sum(1 for fd in fds if all(fd & ~table for table in tables)),
+                len(tables),
+                sum(table.bit_count() for table in tables),
+                tables,
+            ),
+        )
+        self.memo[key] = ranked[: self.max_candidates]
+        return self.memo[key]
+
+    def candidates(self) -> list[tuple[tuple[int, ...], ...]]:
+        """The candidate decompositions of the whole relation: one alternative per relation left by 1NF."""
+        alternatives = [self.alternatives(base) for base in range(len(self.bases))]
+        return list(
+            itertools.islice(itertools.product(*alternatives), self.max_candidates)
+        )
+
+    @staticmethod
+    def table_masks(candidate: tuple[tuple[int, ...], ...]) -> list[tuple[int, int]]:
+        """The (relation number, attribute bitmask) pairs of a candidate's tables, leaving out tables whose attributes
+        all belong to another table (which may come from a different relation left by 1NF).
+        """
+        masks = [
+            (base, mask) for base, tables in enumerate(candidate) for mask in tables
+        ]
+        kept = []
+        for i, (base, mask) in enumerate(masks):
+            if not any(
+                not mask & ~other and (mask != other or j < i)
+                for j, (_, other) in enumerate(masks)
+                if j != i
+            ):
+                kept.append((base, mask))
+        return kept
+
+    def rank(
+        self, workers: int = 1
+    ) -> list[tuple[tuple[int, int, int, int], tuple[tuple[int, ...], ...]]]:
+        """Evaluate every candidate (in a process pool when workers > 1) and return them as (score, candidate) pairs,
+        best first. A score is (lost dependencies, joins, tables, estimated storage), compared in that order; see
+        _evaluate_decomposition.
+        """
+        with instrument.stage("explore"):
+            candidates = self.candidates()
+        with instrument.stage("evaluate"):
+            if workers > 1 and len(candidates) > 1:
+                with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=_init_explorer,
+                    initargs=(self.original, self.bases),
+                ) as pool:
+                    scores = list(
+                        pool.map(
+                            _evaluate_decomposition,
+                            candidates,
+                            chunksize=max(1, len(candidates) // (workers * 4)),
+                        )
+                    )
             else:
-                print("Error: Determinant must be surrounded by brackets.")
-                sys.exit()
-            fd_attrs = det[:]
-            for dep_set in deps:
-                fd_attrs += dep_set
-            for attr in fd_attrs:
-                if not attr in [x[0] for x in attributes]:
-                    print(
-                        "Error: Attribute in functional dependency not present in attribute set."
+                _init_explorer(self.original, self.bases)
+                scores = [
+                    _evaluate_decomposition(candidate) for candidate in candidates
+                ]
+        order = sorted(range(len(candidates)), key=lambda i: scores[i])
+        return [(scores[i], candidates[i]) for i in order]
+
+    def tables(self, candidate: tuple[tuple[int, ...], ...]) -> list[Relation]:
+        """Build the relations of a candidate decomposition, with their projected dependencies and data. The table
+        holding a relation's primary key keeps its name; the others are named after their own primary key.
+        """
+        result = []
+        for base, mask in self.table_masks(candidate):
+            relation = self.bases[base]
+            key_mask = relation.mask(relation.primary_key)
+            piece = self.piece(base, mask)
+            names = relation.names_in(mask)
+            if key_mask and not key_mask & ~mask:
+                new_name = relation.name
+            else:
+                new_name = "".join(piece.primary_key) + "Data"
+            table = Relation(
+                name=new_name,
+                attrs=relation.attr_table.typed(names),
+                prim_key=piece.primary_key[:],
+                can_keys=[key[:] for key in piece.candidate_keys],
+                mv_attrs=[],
+                fds=relation.projected_fds(mask, self.piece_mvds(base, mask)),
+                data=relation.project_data(names),
+                attr_table=relation.attr_table,
+            )
+            result.append(table)
+        return result
+
+
+# The original relation, the relations left by 1NF and the storage estimates made so far, set up once per process
+_explorer_state: tuple[Relation, list[Relation], dict] | None = None
+
+
+def _init_explorer(original: Relation, bases: list[Relation]):
+    global _explorer_state
+    _explorer_state = (original, bases, {})
+
+
+def _evaluate_decomposition(
+    candidate: tuple[tuple[int, ...], ...],
+) -> tuple[int, int, int, int]:
+    """Score a candidate decomposition as (lost dependencies, joins, tables, estimated storage), lower being better.
+    Joins counts, over the original FDs, how many joins checking each one takes (the tables needed to cover its
+    attributes, picked greedily, minus one). Storage is the number of values stored: each table's distinct projected
+    tuples times its attributes, or just its attributes when there is no data."""
+    original, bases, storage = _explorer_state
+    kept = DecompositionExplorer.table_masks(candidate)
+    masks = [mask for _, mask in kept]
+    tables = [
+        Relation(
+            name="",
+            attrs=original.attr_table.typed(original.attr_table.names_of(mask)),
+            prim_key=[],
+            can_keys=[],
+            mv_attrs=[],
+            attr_table=original.attr_table,
+        )
+        for mask in masks
+    ]
+    lost = len(original.lost_dependencies(tables))
+    joins = 0
+    for fd in original.fds:
+        needed = (fd.det_mask | fd.dep_mask) & original.attr_mask
+        if fd.is_mv() or any(not needed & ~mask for mask in masks):
+            continue
+        used = 0
+        while needed:
+            best = max(masks, key=lambda mask: (mask & needed).bit_count())
+            if not best & needed:
+                break
+            needed &= ~best
+            used += 1
+        joins += max(used - 1, 0)
+    size = 0
+    for base, mask in kept:
+        if (base, mask) not in storage:
+            rows = 1
+            if bases[base].data:
+                rows = len(bases[base].project_data(bases[base].names_in(mask)))
+            storage[(base, mask)] = rows * mask.bit_count()
+        size += storage[(base, mask)]
+    return (lost, joins, len(masks), size)
+
+
+def explore(
+    relation: Relation,
+    target: str,
+    workers: int = 1,
+    max_candidates: int = 10,
+) -> tuple[list[Relation], bool | None, list[FunctionalDependency]]:
+    """Explore the alternative decompositions of a relation to the target normal form ("1NF" ... "4NF"), print them
+    ranked best first, and return the best one like normalize() does: its tables, whether they join back losslessly
+    and the FDs they no longer preserve. See DecompositionExplorer."""
+    explorer = DecompositionExplorer(relation, target, max_candidates)
+    ranked = explorer.rank(workers)
+    print(f"{len(ranked)} candidate decomposition(s) of {relation.name} to {target}:")
+    for rank, ((lost, joins, tables, size), candidate) in enumerate(ranked, 1):
+        print(
+            f"{rank}. {lost} lost dependencies, {joins} joins, {tables} tables, {size} values stored"
+        )
+        for base, mask in explorer.table_masks(candidate):
+            names = explorer.bases[base].names_in(mask)
+            print("   {" + ", ".join(names) + "}")
+    tables = explorer.tables(ranked[0][1])
+    # The splits themselves are lossless, but the tables are still checked like a normal run's (1NF can lose tuples)
+    with instrument.stage("lossless_join"):
+        lossless = explorer.original.lossless_join(tables)
+    if lossless is None:
+        instrument.warn(
+            "Warning: the lossless-join check gave up before reaching an answer."
+        )
+    elif not lossless:
+        instrument.warn(
+            "Warning: the decomposition is lossy; joining the tables can produce tuples that weren't in the relation."
+        )
+    lost = explorer.original.lost_dependencies(tables)
+    if lost:
+        instrument.warn(
+            "Warning: the following dependencies are no longer enforced by any table:"
+        )
+        for fd in lost:
+            instrument.warn(str(fd))
+    return tables, lossless, lost
+
+
+def write_relation(out, relation: Relation) -> None:
+    """Write a relation in the human readable schema format to a text handle, a line at a time."""
+    out.write(f"Relation: {relation.name}\n")
+    out.write(
+        "Attributes: "
+        + ", ".join(f"{attr}:{typ}" for attr, typ in relation.attributes)
+        + "\n"
+    )
+    out.write("Primary Key: {" + ", ".join(relation.primary_key) + "}\n")
+    if relation.candidate_keys:
+        out.write(
+            "Candidate Keys: "
+            + ", ".join("{" + ", ".join(key) + "}" for key in relation.candidate_keys)
+            + "\n"
+        )
+    else:
+        out.write("Candidate Keys: None\n")
+    if relation.multivalued_attributes:
+        out.write(
+            "Multi-Valued Attributes: "
+            + ", ".join(relation.multivalued_attributes)
+            + "\n"
+        )
+    else:
+        out.write("Multi-Valued Attributes: None\n")
+    out.write("Functional Dependencies:\n")
+    if relation.fds:
+        out.writelines(str(fd) + "\n" for fd in relation.fds)
+    else:
+        out.write("N/A\n")
+    if relation.data:
+        out.write("Data:\n")
+        out.writelines(
+            ", ".join(map(format_value, row)) + "\n" for row in relation.data
+        )
+
+
+def _json_value(value):
+    """A typed value as JSON: numbers and None as they are, dates and decimals as the text read_rows accepts."""
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    return str(value)
+
+
+def write_relation_jsonl(out, relation: Relation) -> None:
+    """Write a relation as JSON Lines: one object describing the schema (with its number of rows), then one array per
+    tuple."""
+    header = {
+        "relation": relation.name,
+        "attributes": relation.attributes,
+        "primary_key": relation.primary_key,
+        "candidate_keys": relation.candidate_keys,
+        "multivalued_attributes": relation.multivalued_attributes,
+        "functional_dependencies": [
+            {"determinant": fd.determinant, "dependents": fd.dependents}
+            for fd in relation.fds
+        ],
+        "rows": len(relation.data),
+    }
+    out.write(json.dumps(header) + "\n")
+    out.writelines(
+        json.dumps([_json_value(value) for value in row]) + "\n"
+        for row in relation.data
+    )
+
+
+def read_results_jsonl(filename: str) -> Iterator[Relation]:
+    """Stream the relations of a JSON Lines file written by output_results, one at a time, converting each value back
+    to its attribute's type."""
+    with open(filename, "r") as source:
+        for line in source:
+            if not line.strip():
+                continue
+            header = json.loads(line)
+            attributes = header["attributes"]
+            attr_table = AttributeTable(attributes)
+            relation = Relation(
+                header["relation"],
+                attributes,
+                header["primary_key"],
+                header["candidate_keys"],
+                header["multivalued_attributes"],
+                fds=[
+                    FunctionalDependency(
+                        fd["determinant"], fd["dependents"], attr_table
                     )
-                    sys.exit()
-            fds.append(FunctionalDependency(det, deps))
-    schema.close()
-    table = Relation(name, attributes, primary_key, candidate_keys, mv_attrs, fds=fds)
-    return table
-
-
-def output_results(filename: str, tables: list[Relation]) -> None:
-    """Fill a specified output file with the given list of tables."""
-    dest = open(filename, "w")
-    for i in range(len(tables)):
-        dest.write(str(tables[i]) + "\n\n")
-    dest.close()
-
-
-# def remove_redundant_relations(tables: list[Relation]) -> list[Relation]:
-#     attr_sets: list[list[str]] = [[x[0] for x in tables[-1].attributes]]
-#     non_dupes: list[Relation] = [tables[-1]]
-#     for i in range(len(tables) - 2, 0, -1):
-#         attrs = [[x[0] for x in tables[-1].attributes]]
-#         if attrs in attr_sets:
-#             tables.pop(i)
-#         else:
-#             non_dupes.append(tables[i])
-#             attrs.append(attrs)
-#     return tables
+                    for fd in header["functional_dependencies"]
+                ],
+                data=[],
+                attr_table=attr_table,
+            )
+            parsers = [_value_parser(typ) for _, typ in attributes]
+            rows = (json.loads(next(source)) for _ in range(header["rows"]))
+            while chunk := list(itertools.islice(rows, DATA_CHUNK_SIZE)):
+                relation.data.extend(
+                    [
+                        None if value is None else parse(str(value))
+                        for parse, value in zip(parsers, row)
+                    ]
+                    for row in chunk
+                )
+            yield relation
+
+
+def output_results(
+    filename: str, tables: list[Relation], format: str | None = None
+) -> None:
+    """Fill a specified output file with the given list of tables, streaming each one into a buffered handle. format
+    is "text" (the input format) or "jsonl" (JSON Lines); by default it follows the file's extension.
+    """
+    if format is None:
+        format = "jsonl" if filename.endswith(".jsonl") else "text"
+    with open(filename, "w", buffering=OUTPUT_BUFFER_SIZE) as dest:
+        for table in tables:
+            if format == "jsonl":
+                write_relation_jsonl(dest, table)
+            else:
+                write_relation(dest, table)
+                dest.write("\n\n")
 
 
 if __name__ == "__main__":
@@ -793,6 +4046,36 @@ if __name__ == "__main__":
         print(
             "Please add an input file of the following form as a command-line argument and try again."
         )
+        print(
+            "Add --synthesize to reach 3NF by Bernstein synthesis instead of splitting the relation one FD at a time."
+        )
+        print(
+            "Add --discover to mine functional dependencies from a 'Data:' section at the end of the input file."
+        )
+        print(
+            "Add --max-error=0.001 (with --discover) to also accept dependencies that fail on up to that share of rows."
+        )
+        print(
+            "Add --explore to list the alternative decompositions (up to 4NF) ranked by the FDs they preserve, and keep"
+            " the best; --candidates=N sets how many are kept (default 10)."
+        )
+        print(
+            "Add --data=PATH to load table data from a CSV/TSV file, or from <Relation>.csv files in a directory."
+        )
+        print(
+            "Use --batch=3NF with a directory or glob of input files (and optionally an output directory) to normalize"
+            " them all without prompts; --workers=N sets the number of processes (also used within a single file)."
+        )
+        print(
+            "Add --format=jsonl to write the results as JSON Lines (also chosen by an output file ending in .jsonl)."
+        )
+        print(
+            "Add --quiet to skip progress messages, or --verbose to also show each step of the normal form methods."
+        )
+        print(
+            "Add --stats to report the time spent in each stage and counts of FDs examined, relations created and"
+            " closures computed; --trace-memory adds peak allocations and --profile=FILE saves cProfile statistics."
+        )
         print(
             Relation(
                 name="example",
@@ -805,105 +4088,131 @@ if __name__ == "__main__":
             )
         )
         sys.exit()
-    print(
+    synthesize = "--synthesize" in sys.argv
+    discover = "--discover" in sys.argv
+    explore_mode = "--explore" in sys.argv
+    max_candidates = 10
+    max_error = None
+    data_path = None
+    batch_target = None
+    workers = None
+    output_format = None
+    profile_file = None
+    instrument.quiet = "--quiet" in sys.argv
+    instrument.verbose = "--verbose" in sys.argv
+    instrument.trace_memory = "--trace-memory" in sys.argv
+    stats = "--stats" in sys.argv or instrument.trace_memory
+    for arg in sys.argv:
+        if arg.startswith("--max-error="):
+            max_error = float(arg.split("=", 1)[1])
+        elif arg.startswith("--data="):
+            data_path = arg.split("=", 1)[1]
+        elif arg.startswith("--batch="):
+            batch_target = arg.split("=", 1)[1].upper()
+        elif arg.startswith("--workers="):
+            workers = int(arg.split("=", 1)[1])
+        elif arg.startswith("--format="):
+            output_format = arg.split("=", 1)[1].lower()
+        elif arg.startswith("--profile="):
+            profile_file = arg.split("=", 1)[1]
+        elif arg.startswith("--candidates="):
+            max_candidates = int(arg.split("=", 1)[1])
+    sys.argv = [arg for arg in sys.argv if not arg.startswith("--")]
+    if output_format not in [None, "text", "jsonl"]:
+        print('Error: --format needs one of the following: "text", "jsonl"')
+        sys.exit(1)
+    instrument.log(
         "Thank you for using the RDBMS Normalizer!\nPlease note that input file format must match the provided example inputs."
     )
-    tables: list[Relation] = []
-    input_filename = sys.argv[1]
-    tables.append(interpret_input(input_filename))
-    print(tables[0])
-
-    user_in = input(
-        'How far do you want to normalize the relation?\n(Enter one of the following: "1NF", "2NF", "3NF", "BCNF", "4NF", "5NF")\n'
-    ).upper()
-    while user_in not in ["1NF", "2NF", "3NF", "BCNF", "4NF", "5NF"]:
-        user_in = input(
-            'Invalid input, please enter one of the following: "1NF", "2NF", "3NF", "BCNF", "4NF", "5NF"\n'
-        ).upper()
-    print(f"You chose {user_in}.")
-
-    print("Entering First normal form...")
-    new_tables = tables[0].one_nf()
-    if len(new_tables):
-        tables += new_tables
-
-    if user_in in ["2NF", "3NF", "BCNF", "4NF", "5NF"]:
-        print("Time for Second Normal Form...")
-        for x in tables:
-            new_tables = x.two_nf()
-            if len(new_tables):
-                tables += new_tables
-                tables += new_tables
-
-    if user_in in ["3NF", "BCNF", "4NF", "5NF"]:
-        print("Time for Third Normal Form...")
-        for x in tables:
-            new_tables = x.three_nf()
-            if len(new_tables):
-                tables += new_tables
-
-    if user_in in ["BCNF", "4NF", "5NF"]:
-        print("Time for Boyce-Codd Normal Form... (not really)")
-        # for x in tables:
-        #     new_tables = x.bcnf()
-        #     if len(new_tables):
-        #         tables += new_tables
-
-    # Remove duplicate tables
-    # Remove duplicate tables
-    table_attr_sets: list[set[str]] = []
-    for i in range(len(tables) - 1, -1, -1):
-        my_attrs = [x[0] for x in tables[i].attributes]
-        if not (set(my_attrs) in table_attr_sets):
-            table_attr_sets.append(set(my_attrs))
-        else:
-            tables.pop(i)
-
-    if user_in in ["4NF", "5NF"]:
-        print("Time for Fourth Normal Form...")
-        old_tables = []
-        for x in tables:
-            new_tables = x.four_nf()
-            if len(new_tables):
-                for table in new_tables:
-                    my_attrs = [x[0] for x in table.attributes]
-                    if not (set(my_attrs) in table_attr_sets):
-                        tables.append(table)
-                        table_attr_sets.append(set(my_attrs))
-                old_tables.append(tables.index(x))
-        old_tables.sort(reverse=True)
-        for i in old_tables:
-            tables.pop(i)
-
-    if user_in in ["5NF"]:
-        print("Time for Fifth Normal Form...")
+
+    if batch_target is not None:
+        if batch_target not in ["1NF", "2NF", "3NF", "BCNF", "4NF", "5NF"]:
+            print(
+                'Error: --batch needs one of the following: "1NF", "2NF", "3NF", "BCNF", "4NF", "5NF"'
+            )
+            sys.exit(1)
+        output_dir = sys.argv[2] if len(sys.argv) > 2 else "normalized"
+        results = batch_normalize(
+            sys.argv[1],
+            batch_target,
+            output_dir,
+            workers,
+            output_format or "text",
+            synthesize=synthesize,
+            discover=discover,
+            max_error=max_error,
+            data_path=data_path,
+        )
+        failed = sum(1 for result in results if result[6] is not None)
+        lossy = sum(1 for result in results if result[3] is False)
         print(
-            "NOTE: This normal form requires data that will have to be entered for each relation."
-        )
-        for x in tables:
-            new_tables = x.five_nf()
-            if len(new_tables):
-                tables += new_tables
-
-    # Duplicate checking:
-    # Remove duplicate tables
-    table_attr_sets: list[set[str]] = []
-    for i in range(len(tables) - 1, -1, -1):
-        print("Curr attr sets")
-        for attrs in table_attr_sets:
-            print(attrs)
-        my_attrs = [x[0] for x in tables[i].attributes]
-        print(my_attrs, "?")
-        if not (set(my_attrs) in table_attr_sets):
-            table_attr_sets.append(set(my_attrs))
-            print("Added to set")
-        else:
-            tables.pop(i)
-            print("Nope")
-
-    output_name = "normalized_schema.txt"
-    if len(sys.argv) > 2:
-        output_name = sys.argv[3]
-    output_results(output_name, tables)
-    print(f"The noramlized schema has been outputted to {output_name}")
-    print("Thank you for using the RDBMS Normalizer!")
+            f"Normalized {len(results) - failed} of {len(results)} files to {batch_target} ({lossy} lossy)."
+        )
+        print(
+            f"The summary has been written to {os.path.join(output_dir, 'summary.txt')}"
+        )
+        sys.exit(1 if failed or lossy else 0)
+
+    with instrument.profile(profile_file):
+        # Each table in the file is normalized as soon as it is parsed, all to the same normal form
+        tables: list[Relation] = []
+        lossless = True
+        user_in = None
+        forms = ["1NF", "2NF", "3NF", "BCNF", "4NF", "5NF"]
+        if explore_mode:
+            # 5NF decompositions come from the data rather than from a choice among dependencies
+            forms = forms[:-1]
+        choices = ", ".join(f'"{form}"' for form in forms)
+        for relation in read_schema(sys.argv[1]):
+            if (data_file := data_file_for(data_path, relation.name)) is not None:
+                with instrument.stage("load_data"):
+                    relation.load_data(data_file)
+            instrument.log("{}", relation)
+
+            if user_in is None:
+                user_in = input(
+                    f"How far do you want to normalize the relation?\n(Enter one of the following: {choices})\n"
+                ).upper()
+                while user_in not in forms:
+                    user_in = input(
+                        f"Invalid input, please enter one of the following: {choices}\n"
+                    ).upper()
+                instrument.log("You chose {}.", user_in)
+
+            if explore_mode:
+                if discover:
+                    discover_dependencies(relation, max_error)
+                normalized, relation_lossless, lost = explore(
+                    relation, user_in, workers or 1, max_candidates
+                )
+            else:
+                normalized, relation_lossless, lost = normalize(
+                    relation,
+                    user_in,
+                    synthesize,
+                    discover,
+                    max_error,
+                    data_path,
+                    workers=workers or 1,
+                )
+            tables.extend(normalized)
+            if relation_lossless is False:
+                lossless = False
+        if user_in is None:
+            print(f"Error: No table found in {sys.argv[1]}.")
+            sys.exit()
+
+        output_name = "normalized_schema.txt"
+        if output_format == "jsonl":
+            output_name = "normalized_schema.jsonl"
+        if len(sys.argv) > 2:
+            output_name = sys.argv[-1]
+        with instrument.stage("output_results"):
+            output_results(output_name, tables, output_format)
+        instrument.log("The noramlized schema has been outputted to {}", output_name)
+        instrument.log("Thank you for using the RDBMS Normalizer!")
+    if stats:
+        print("\n".join(instrument.report()))
+    # A lossy decomposition fails the run, so scripted checks can catch it
+    if lossless is False:
+        sys.exit(1)
@@ -0,0 +1,131 @@
+import itertools
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    """Keep progress messages out of the test output."""
+    main.instrument.quiet = True
+    main.instrument.reset()
+    yield
+    main.instrument.quiet = False
+
+
+def make_relation(names, fds, primary_key, data=(), mv_attrs=()):
+    """A relation over the given attribute names with FDs given as (determinant, dependents) name lists."""
+    attr_table = main.AttributeTable()
+    return main.Relation(
+        "R",
+        [[name, "INTEGER"] for name in names],
+        list(primary_key),
+        [],
+        list(mv_attrs),
+        fds=[main.FunctionalDependency(det, [deps], attr_table) for det, deps in fds],
+        data=[list(row) for row in data],
+        attr_table=attr_table,
+    )
+
+
+def brute_closure(fds, attrs):
+    """Closure of a set of names under (determinant, dependents) pairs, by repeated passes."""
+    result = set(attrs)
+    changed = True
+    while changed:
+        changed = False
+        for det, deps in fds:
+            if set(det) <= result and not set(deps) <= result:
+                result |= set(deps)
+                changed = True
+    return result
+
+
+def brute_keys(names, fds):
+    """Every minimal key, by trying all subsets."""
+    keys = []
+    for size in range(len(names) + 1):
+        for subset in itertools.combinations(names, size):
+            if set(names) <= brute_closure(fds, subset) and not any(
+                set(key) <= set(subset) for key in keys
+            ):
+                keys.append(subset)
+    return [set(key) for key in keys]
+
+
+def brute_lossless(names, fds, tables, mvds=()):
+    """Whether tables (sets of names) join back losslessly under the FDs and (determinant, dependents) MVDs, with a
+    textbook tableau chase."""
+    rows = [
+        [("a", name) if name in table else ("b", i, name) for name in names]
+        for i, table in enumerate(tables)
+    ]
+    changed = True
+    while changed:
+        changed = False
+        for det, deps in fds:
+            cols = [names.index(name) for name in det]
+            for first, second in itertools.combinations(rows, 2):
+                if all(first[col] == second[col] for col in cols):
+                    for name in deps:
+                        col = names.index(name)
+                        if first[col] != second[col]:
+                            # Prefer the distinguished symbol when equating
+                            keep = min(
+                                first[col], second[col], key=lambda v: v[0] != "a"
+                            )
+                            old = second[col] if keep == first[col] else first[col]
+                            for row in rows:
+                                if row[col] == old:
+                                    row[col] = keep
+                            changed = True
+        if changed:
+            continue
+        for det, deps in mvds:
+            cols = [names.index(name) for name in det]
+            kept = set(det) | set(deps)
+            for first, second in itertools.permutations(rows, 2):
+                if all(first[col] == second[col] for col in cols):
+                    new = [
+                        first[col] if name in kept else second[col]
+                        for col, name in enumerate(names)
+                    ]
+                    if new not in rows:
+                        rows.append(new)
+                        changed = True
+    return any(all(value[0] == "a" for value in row) for row in rows)
+
+
+def brute_violates(fds, table, target):
+    """Whether a table (set of names) violates 3NF or BCNF under the FDs, by testing every subset as a determinant."""
+    keys = brute_keys(sorted(table), fds)
+    prime = set().union(*keys)
+    for size in range(1, len(table)):
+        for subset in itertools.combinations(sorted(table), size):
+            closed = brute_closure(fds, subset) & table
+            implied = closed - set(subset)
+            if not implied or closed == table:
+                continue
+            if target == "BCNF" or implied - prime:
+                return True
+    return False
+
+
+def random_schema(seed, width=6, count=5):
+    """A random schema of width attributes A0, A1, ... with count FDs and a two-attribute primary key."""
+    rng = random.Random(seed)
+    names = [f"A{i}" for i in range(width)]
+    fds = []
+    for _ in range(count):
+        det = rng.sample(names, rng.randint(1, 2))
+        deps = rng.sample(
+            [name for name in names if name not in det], rng.randint(1, 2)
+        )
+        fds.append((det, deps))
+    return names, fds, rng.sample(names, 2)
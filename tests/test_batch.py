@@ -0,0 +1,80 @@
+import datetime
+import decimal
+import os
+import shutil
+
+import pytest
+
+import main
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLES = ["example1.txt", "example2.txt", "example3.txt", "example4.txt"]
+
+
+def read_outputs(directory):
+    return {
+        name: open(os.path.join(directory, name)).read()
+        for name in sorted(os.listdir(directory))
+        if name != "summary.txt"
+    }
+
+
+@pytest.mark.parametrize("target", ["3NF", "BCNF"])
+def test_batch_output_is_the_same_with_workers(tmp_path, target):
+    inputs = tmp_path / "in"
+    inputs.mkdir()
+    for example in EXAMPLES:
+        shutil.copy(os.path.join(ROOT, example), inputs)
+    serial = main.batch_normalize(str(inputs), target, str(tmp_path / "serial"), 1)
+    parallel = main.batch_normalize(str(inputs), target, str(tmp_path / "parallel"), 2)
+    assert all(result[6] is None for result in serial)
+    # Everything but the file names and timings is the same
+    assert [result[2:5] + result[6:] for result in serial] == [
+        result[2:5] + result[6:] for result in parallel
+    ]
+    assert read_outputs(tmp_path / "serial") == read_outputs(tmp_path / "parallel")
+    assert len(read_outputs(tmp_path / "serial")) == len(EXAMPLES)
+
+
+@pytest.mark.parametrize("example", EXAMPLES)
+def test_normalize_output_is_the_same_with_workers(tmp_path, example):
+    outputs = []
+    for workers in [1, 2]:
+        relation = main.interpret_input(os.path.join(ROOT, example))
+        tables, _, _ = main.normalize(
+            relation, "BCNF", interactive=False, workers=workers
+        )
+        main.output_results(str(tmp_path / f"{workers}.txt"), tables)
+        outputs.append(open(tmp_path / f"{workers}.txt").read())
+    assert outputs[0] == outputs[1]
+
+
+def test_jsonl_results_read_back_as_written(tmp_path):
+    path = str(tmp_path / "out.jsonl")
+    relation = main.Relation(
+        "Orders",
+        [["ID", "INTEGER"], ["Day", "DATE"], ["Cost", "MONEY"], ["Note", "TEXT"]],
+        ["ID"],
+        [["Note"]],
+        ["Note"],
+        data=[
+            [1, datetime.date(2024, 2, 29), decimal.Decimal("1234.50"), 'a "b", c'],
+            [2, None, decimal.Decimal("3"), ""],
+        ],
+    )
+    relation.fds.append(
+        main.FunctionalDependency(
+            ["ID"], [["Day", "Cost", "Note"]], relation.attr_table
+        )
+    )
+    main.output_results(path, [relation, relation])
+    read = list(main.read_results_jsonl(path))
+    assert len(read) == 2
+    for copy in read:
+        assert copy.name == relation.name
+        assert copy.attributes == relation.attributes
+        assert copy.primary_key == relation.primary_key
+        assert copy.candidate_keys == relation.candidate_keys
+        assert copy.multivalued_attributes == relation.multivalued_attributes
+        assert [str(fd) for fd in copy.fds] == [str(fd) for fd in relation.fds]
+        assert list(copy.data) == list(relation.data)
@@ -0,0 +1,114 @@
+import itertools
+import random
+
+import main
+from conftest import brute_closure, brute_lossless, make_relation, random_schema
+
+
+def random_tables(rng, names):
+    """Two to four random attribute sets that together cover names."""
+    tables = [
+        set(rng.sample(names, rng.randint(2, 4))) for _ in range(rng.randint(2, 4))
+    ]
+    for name in names:
+        if not any(name in table for table in tables):
+            rng.choice(tables).add(name)
+    return tables
+
+
+def relations(relation, tables):
+    return [
+        main.Relation(
+            "T",
+            relation.attr_table.typed(sorted(table)),
+            [],
+            [],
+            [],
+            attr_table=relation.attr_table,
+        )
+        for table in tables
+    ]
+
+
+def test_chase_matches_the_textbook_tableau():
+    for seed in range(150):
+        names, fds, primary_key = random_schema(seed)
+        relation = make_relation(names, fds, primary_key)
+        tables = random_tables(random.Random(seed), names)
+        # The declared primary key counts as a key
+        expected = brute_lossless(names, fds + [(primary_key, names)], tables)
+        assert relation.lossless_join(relations(relation, tables)) == expected
+
+
+def test_chase_matches_the_textbook_tableau_with_mvds():
+    for seed in range(150):
+        names, fds, primary_key = random_schema(seed)
+        rng = random.Random(seed)
+        det = rng.sample(names, 1)
+        deps = rng.sample([name for name in names if name not in det], 2)
+        rest = [name for name in names if name not in det + deps]
+        relation = make_relation(names, fds, primary_key)
+        relation.fds.append(
+            main.FunctionalDependency(det, [deps, rest], relation.attr_table)
+        )
+        tables = random_tables(rng, names)
+        expected = brute_lossless(
+            names, fds + [(primary_key, names)], tables, [(det, deps)]
+        )
+        assert relation.lossless_join(relations(relation, tables)) == expected
+
+
+def test_chase_applies_join_dependencies():
+    relation = make_relation(["A", "B", "C"], [], ["A", "B", "C"])
+    tables = relations(relation, [{"A", "B"}, {"B", "C"}, {"A", "C"}])
+    jd = [
+        relation.mask(["A", "B"]),
+        relation.mask(["B", "C"]),
+        relation.mask(["A", "C"]),
+    ]
+    assert relation.lossless_join(tables) is False
+    assert relation.lossless_join(tables, [jd]) is True
+
+
+def test_chase_applies_embedded_join_dependencies():
+    # The join dependency only covers A, B and C; D comes back through A, C -> D
+    relation = make_relation(["A", "B", "C", "D"], [(["A", "C"], ["D"])], ["A", "B"])
+    relation.primary_key = []
+    tables = relations(relation, [{"A", "B"}, {"B", "C"}, {"A", "C", "D"}])
+    jd = [
+        relation.mask(["A", "B"]),
+        relation.mask(["B", "C"]),
+        relation.mask(["A", "C"]),
+    ]
+    assert relation.lossless_join(tables) is False
+    assert relation.lossless_join(tables, [jd]) is True
+
+
+def brute_lost(fds, tables):
+    """The (det, dep) pairs of the FDs not implied by the union of their projections onto the tables, each projection
+    found by trying every subset of a table as a determinant."""
+    projected = []
+    for table in tables:
+        for size in range(1, len(table) + 1):
+            for subset in itertools.combinations(sorted(table), size):
+                projected.append((subset, brute_closure(fds, subset) & table))
+    return {
+        (tuple(sorted(det)), dep)
+        for det, deps in fds
+        for dep in deps
+        if dep not in brute_closure(projected, det)
+    }
+
+
+def test_lost_dependencies_match_the_projected_fds():
+    for seed in range(150):
+        names, fds, primary_key = random_schema(seed)
+        relation = make_relation(names, fds, primary_key)
+        tables = random_tables(random.Random(seed), names)
+        lost = relation.lost_dependencies(relations(relation, tables))
+        found = {
+            (tuple(sorted(fd.determinant)), dep)
+            for fd in lost
+            for dep in fd.dependents[0]
+        }
+        assert found == brute_lost(fds, tables)
@@ -0,0 +1,112 @@
+import itertools
+import random
+
+import main
+from conftest import brute_closure, brute_keys, make_relation, random_schema
+
+
+def subsets(names):
+    return [
+        subset
+        for size in range(len(names) + 1)
+        for subset in itertools.combinations(names, size)
+    ]
+
+
+def pairs(relation):
+    return [(fd.determinant, fd.dependents[0]) for fd in relation.fds]
+
+
+def test_closure_matches_brute_force():
+    for seed in range(100):
+        names, fds, primary_key = random_schema(seed, width=7, count=6)
+        relation = make_relation(names, fds, primary_key)
+        for subset in subsets(names):
+            closed = relation.closure(relation.mask(list(subset)))
+            assert set(relation.attr_table.names_of(closed)) == brute_closure(
+                fds, subset
+            )
+
+
+def test_candidate_keys_match_brute_force():
+    for seed in range(100):
+        names, fds, primary_key = random_schema(seed, width=7, count=6)
+        relation = make_relation(names, fds, primary_key)
+        keys = relation.find_candidate_keys()
+        assert sorted(map(sorted, keys)) == sorted(map(sorted, brute_keys(names, fds)))
+        assert relation.primary_key in keys
+
+
+def test_minimal_cover_is_equivalent_and_minimal():
+    for seed in range(100):
+        names, fds, primary_key = random_schema(seed, width=7, count=6)
+        relation = make_relation(names, fds, primary_key)
+        relation.minimal_cover()
+        cover = pairs(relation)
+        for subset in subsets(names):
+            assert brute_closure(cover, subset) == brute_closure(fds, subset)
+        dets = [set(det) for det, _ in cover]
+        # One FD per determinant
+        assert all(dets.count(det) == 1 for det in dets)
+        for i, (det, deps) in enumerate(cover):
+            assert not set(det) & set(deps)
+            for dep in deps:
+                others = (
+                    cover[:i] + [(det, [d for d in deps if d != dep])] + cover[i + 1 :]
+                )
+                # No dependent is implied by the rest of the cover...
+                assert dep not in brute_closure(others, det)
+                # ...and no determinant attribute is extraneous
+                for attr in det:
+                    assert dep not in brute_closure(
+                        cover, [a for a in det if a != attr]
+                    )
+
+
+def assert_indexed(fds):
+    """The FDList's by_det and by_dep hold exactly the FDs in the list, under each attribute they use."""
+    for index, mask_of in [(fds.by_det, "det_mask"), (fds.by_dep, "dep_mask")]:
+        expected = {}
+        for fd in fds:
+            for attr in range(getattr(fd, mask_of).bit_length()):
+                if getattr(fd, mask_of) >> attr & 1:
+                    expected.setdefault(attr, {})[id(fd)] = fd
+        assert {attr: found for attr, found in index.items() if found} == expected
+    for attr in range(8):
+        bit = 1 << attr
+        assert fds.with_det(bit) == [fd for fd in fds if fd.det_mask & bit]
+        assert fds.with_dep(bit) == [fd for fd in fds if fd.dep_mask & bit]
+
+
+def test_fd_indexes_follow_additions_removals_and_transfers():
+    names = [f"A{i}" for i in range(8)]
+    for seed in range(50):
+        rng = random.Random(seed)
+        attr_table = main.AttributeTable()
+
+        def random_fd():
+            det = rng.sample(names, rng.randint(1, 2))
+            deps = rng.sample([name for name in names if name not in det], 2)
+            return main.FunctionalDependency(det, [deps], attr_table)
+
+        source = main.FDList(random_fd() for _ in range(6))
+        target = main.FDList()
+        for _ in range(20):
+            step = rng.randrange(5)
+            if step == 0:
+                source.append(random_fd())
+            elif step == 1 and source:
+                source.remove(rng.choice(source))
+            elif step == 2 and source:
+                # Move some FDs to the other list, as decompositions do
+                moved = rng.sample(list(source), rng.randint(1, len(source)))
+                source.remove_all(moved)
+                target.extend(moved)
+            elif step == 3 and source:
+                fd = rng.choice(source)
+                if len(fd.dependents[0]) > 1:
+                    source.replace(fd, fd.remove_dep(fd.dependents[0][0]))
+            elif step == 4 and target:
+                source.insert(0, target.pop(rng.randrange(len(target))))
+            assert_indexed(source)
+            assert_indexed(target)
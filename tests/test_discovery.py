@@ -0,0 +1,75 @@
+import itertools
+import random
+
+from conftest import make_relation
+
+
+def test_no_fds_are_discovered_without_rows():
+    relation = make_relation(["A", "B", "C"], [], ["A"])
+    assert relation.discover_fds() == []
+    assert relation.discover_approximate_fds(0.1) == []
+
+
+def random_rows(seed, width, count):
+    rng = random.Random(seed)
+    domains = [rng.randint(1, 4) for _ in range(width)]
+    return [[rng.randrange(domain) for domain in domains] for _ in range(count)]
+
+
+def g3_error(rows, det, dep):
+    """Rows to delete for det -> dep to hold: each det group keeps only its most common dep value."""
+    groups = {}
+    for row in rows:
+        counts = groups.setdefault(tuple(row[col] for col in det), {})
+        counts[row[dep]] = counts.get(row[dep], 0) + 1
+    return len(rows) - sum(max(counts.values()) for counts in groups.values())
+
+
+def brute_fds(names, rows, max_error=0.0):
+    """Every minimal, non-trivial det -> dep with a g3 error of at most max_error, as (det set, dep) pairs."""
+    found = set()
+    for dep in range(len(names)):
+        others = [col for col in range(len(names)) if col != dep]
+        holding = []
+        for size in range(len(others) + 1):
+            for det in itertools.combinations(others, size):
+                if any(set(smaller) <= set(det) for smaller in holding):
+                    continue
+                if g3_error(rows, det, dep) <= max_error * len(rows):
+                    holding.append(det)
+                    found.add((frozenset(names[col] for col in det), names[dep]))
+    return found
+
+
+def discovered(fds):
+    return {(frozenset(fd.determinant), dep) for fd in fds for dep in fd.dependents[0]}
+
+
+def test_tane_finds_the_minimal_fds_of_the_data():
+    names = ["A", "B", "C", "D", "E"]
+    for seed in range(60):
+        rows = random_rows(seed, len(names), 12)
+        relation = make_relation(names, [], ["A"], data=rows)
+        assert discovered(relation.discover_fds()) == brute_fds(names, rows)
+
+
+def test_approximate_discovery_finds_the_minimal_fds_within_the_error():
+    names = ["A", "B", "C", "D"]
+    for seed in range(60):
+        rows = random_rows(seed, len(names), 40)
+        relation = make_relation(names, [], ["A"], data=rows)
+        for max_error in [0.0, 0.05, 0.2]:
+            found = discovered(relation.discover_approximate_fds(max_error))
+            assert found == brute_fds(names, rows, max_error)
+
+
+def test_approximate_fds_found_on_a_sample_hold_on_all_rows():
+    names = ["A", "B", "C", "D"]
+    for seed in range(30):
+        rows = random_rows(seed, len(names), 400)
+        relation = make_relation(names, [], ["A"], data=rows)
+        for det, dep in discovered(
+            relation.discover_approximate_fds(0.05, sample_size=50, seed=seed)
+        ):
+            cols = [names.index(name) for name in sorted(det)]
+            assert g3_error(rows, cols, names.index(dep)) <= 0.05 * len(rows)
@@ -0,0 +1,27 @@
+import os
+
+import pytest
+
+import main
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize(
+    "example", ["example1.txt", "example2.txt", "example3.txt", "example4.txt"]
+)
+@pytest.mark.parametrize("target", ["2NF", "3NF", "BCNF", "4NF"])
+def test_normalize_result_is_among_the_candidates(example, target, capsys):
+    relation = main.interpret_input(os.path.join(ROOT, example))
+    tables, _, lost = main.normalize(relation, target, interactive=False)
+    explorer = main.DecompositionExplorer(
+        main.interpret_input(os.path.join(ROOT, example)), target, max_candidates=1000
+    )
+    ranked = explorer.rank()
+    candidates = [
+        sorted(mask for _, mask in explorer.table_masks(candidate))
+        for _, candidate in ranked
+    ]
+    assert sorted(table.attr_mask for table in tables) in candidates
+    # The best candidate loses no more dependencies than normalize() does
+    assert ranked[0][0][0] <= len(lost)
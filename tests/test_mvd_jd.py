@@ -0,0 +1,173 @@
+import itertools
+import random
+
+import main
+from conftest import make_relation
+
+
+def mvd_fails_in(rows, det, dep_sets):
+    """The det values whose group isn't the product of its values on each dependent set, by building the product."""
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(row[col] for col in det), set()).add(tuple(row))
+    failing = set()
+    for key, group in groups.items():
+        parts = [{tuple(row[col] for col in dep) for row in group} for dep in dep_sets]
+        product = set()
+        for combination in itertools.product(*parts):
+            row = [None] * len(rows[0])
+            for col, value in zip(det, key):
+                row[col] = value
+            for dep, values in zip(dep_sets, combination):
+                for col, value in zip(dep, values):
+                    row[col] = value
+            product.add(tuple(row))
+        if product != group:
+            failing.add(key)
+    return failing
+
+
+def test_mvd_violations_match_brute_force():
+    names = ["A", "B", "C", "D"]
+    for seed in range(100):
+        rng = random.Random(seed)
+        rows = set()
+        # Cross products of a few B and C values per A value satisfy {A} ->> {B} | {C}, stray rows break it
+        for a in range(3):
+            bs = rng.sample(range(3), rng.randint(1, 2))
+            cds = [
+                (rng.randrange(2), rng.randrange(2)) for _ in range(rng.randint(1, 2))
+            ]
+            rows |= {(a, b, c, d) for b in bs for c, d in cds}
+        for _ in range(rng.randint(0, 2)):
+            rows.add(tuple(rng.randrange(3) for _ in names))
+        rows = sorted(rows)
+        relation = make_relation(names, [], names, data=rows)
+        mvd = main.FunctionalDependency(["A"], [["B"], ["C"]], relation.attr_table)
+        found = {tuple(values) for values in relation.mvd_violations(mvd)}
+        # Attributes outside the MVD form one more dependent set
+        assert found == mvd_fails_in(rows, [0], [[1], [2], [3]])
+
+
+def mvd_implied(width, mvds, det, dep):
+    """Whether det ->> dep follows from the (det, dep) MVDs over attributes 0 .. width - 1, by chasing a two-row
+    tableau until a row of distinguished symbols appears."""
+    rest = set(range(width)) - set(det) - set(dep)
+    rows = {
+        tuple("a" if col in det or col in dep else "b1" for col in range(width)),
+        tuple("a" if col in det or col in rest else "b2" for col in range(width)),
+    }
+    changed = True
+    while changed:
+        changed = False
+        for lhs, rhs in mvds:
+            for first, second in itertools.product(list(rows), repeat=2):
+                if all(first[col] == second[col] for col in lhs):
+                    row = tuple(
+                        first[col] if col in lhs or col in rhs else second[col]
+                        for col in range(width)
+                    )
+                    if row not in rows:
+                        rows.add(row)
+                        changed = True
+    return ("a",) * width in rows
+
+
+def test_dependency_basis_matches_the_implied_mvds():
+    width = 5
+    names = [f"A{i}" for i in range(width)]
+    for seed in range(60):
+        rng = random.Random(seed)
+        relation = make_relation(names, [], names)
+        mvds = []
+        for _ in range(rng.randint(1, 3)):
+            det = rng.sample(range(width), rng.randint(1, 2))
+            others = [col for col in range(width) if col not in det]
+            dep = rng.sample(others, rng.randint(1, 2))
+            rest = [col for col in others if col not in dep]
+            mvds.append((det, dep))
+            relation.fds.append(
+                main.FunctionalDependency(
+                    [names[col] for col in det],
+                    [[names[col] for col in dep], [names[col] for col in rest]],
+                    relation.attr_table,
+                )
+            )
+        det = rng.sample(range(width), 1)
+        basis = relation.dependency_basis(relation.mask([names[col] for col in det]))
+        others = [col for col in range(width) if col not in det]
+        # det ->> Y is implied exactly when Y is a union of blocks of the basis
+        for size in range(1, len(others) + 1):
+            for dep in itertools.combinations(others, size):
+                mask = relation.mask([names[col] for col in dep])
+                union = all(not block & mask or not block & ~mask for block in basis)
+                assert mvd_implied(width, mvds, det, dep) == union
+
+
+def natural_join(rows, components):
+    """The natural join of the projections of rows (tuples) onto components (lists of column numbers)."""
+    width = len(rows[0])
+    result = [dict()]
+    for component in components:
+        projected = {tuple(row[col] for col in component) for row in rows}
+        result = [
+            {**partial, **dict(zip(component, values))}
+            for partial in result
+            for values in projected
+            if all(
+                partial.get(col, value) == value
+                for col, value in zip(component, values)
+            )
+        ]
+    return {tuple(joined[col] for col in range(width)) for joined in result}
+
+
+def test_join_dependency_matches_brute_force():
+    names = ["A", "B", "C"]
+    covers = [[1, 2], [0, 2], [0, 1]]
+    for seed in range(150):
+        rng = random.Random(seed)
+        rows = sorted(
+            {tuple(rng.randrange(2) for _ in names) for _ in range(rng.randint(3, 6))}
+        )
+        relation = make_relation(names, [], names, data=rows)
+        components = relation.join_dependency(relation.attr_mask)
+        holds = natural_join(rows, covers) == set(rows)
+        assert (components is not None) == holds
+        if components is not None:
+            found = [
+                [names.index(name) for name in relation.attr_table.names_of(mask)]
+                for mask in components
+            ]
+            assert natural_join(rows, found) == set(rows)
+
+
+def test_five_nf_splits_on_a_cyclic_join_dependency():
+    # The classic agent/company/product relation: *{AB, BC, AC} holds, no MVD does
+    rows = [(1, 1, 2), (1, 2, 1), (2, 1, 1), (1, 1, 1)]
+    relation = make_relation(["A", "B", "C"], [], ["A", "B", "C"], data=rows)
+    tables = relation.five_nf(None, interactive=False)
+    assert sorted(table.attr_names() for table in tables) == [
+        ["A", "B"],
+        ["A", "C"],
+        ["B", "C"],
+    ]
+
+
+def test_five_nf_decomposition_is_reported_lossless():
+    rows = [(1, 1, 2), (1, 2, 1), (2, 1, 1), (1, 1, 1)]
+    relation = make_relation(["A", "B", "C"], [], ["A", "B", "C"], data=rows)
+    jds = []
+    relation.five_nf(None, interactive=False, jds=jds)
+    assert jds == [
+        [
+            relation.mask(["B", "C"]),
+            relation.mask(["A", "C"]),
+            relation.mask(["A", "B"]),
+        ]
+    ]
+
+    relation = make_relation(["A", "B", "C"], [], ["A", "B", "C"], data=rows)
+    tables, lossless, lost = main.normalize(relation, "5NF", interactive=False)
+    assert len(tables) == 3
+    assert lossless is True
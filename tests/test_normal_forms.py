@@ -0,0 +1,147 @@
+import pytest
+
+import main
+from conftest import brute_lossless, brute_violates, make_relation, random_schema
+
+# 2NF used to drop the determinant of a partial dependency from the source table, leaving no join attribute
+PARTIAL_KEY_SCHEMA = (
+    ["A0", "A1", "A2", "A3", "A4", "A5"],
+    [
+        (["A5"], ["A3"]),
+        (["A0", "A3"], ["A1"]),
+        (["A2", "A4"], ["A1"]),
+        (["A3"], ["A0", "A4", "A5"]),
+        (["A1"], ["A3"]),
+    ],
+    ["A2", "A4"],
+)
+
+
+def normalize(names, fds, primary_key, target, **options):
+    relation = make_relation(names, fds, primary_key)
+    return main.normalize(relation, target, interactive=False, **options)
+
+
+def test_two_nf_keeps_the_determinant_in_the_source_table():
+    names, fds, primary_key = PARTIAL_KEY_SCHEMA
+    for target in ["2NF", "3NF", "BCNF"]:
+        tables, lossless, _ = normalize(names, fds, primary_key, target)
+        assert lossless is True
+        assert brute_lossless(names, fds, [set(t.attr_names()) for t in tables])
+
+
+def test_three_nf_sees_dependencies_through_split_off_attributes():
+    # 2 -> 0 moves A0 and A3 out, after which 1 -> 3 only holds through A0
+    names = ["A0", "A1", "A2", "A3", "A4"]
+    fds = [(["A2"], ["A0", "A3"]), (["A1"], ["A0"]), (["A0"], ["A1", "A3"])]
+    for target in ["3NF", "BCNF"]:
+        tables, lossless, _ = normalize(names, fds, ["A2", "A4"], target)
+        assert lossless is True
+        for table in tables:
+            assert not brute_violates(fds, set(table.attr_names()), target)
+
+
+@pytest.mark.parametrize(
+    "target, synthesize",
+    [("2NF", False), ("3NF", False), ("BCNF", False), ("3NF", True), ("BCNF", True)],
+)
+def test_random_schemas_are_lossless_and_normalized(target, synthesize):
+    for seed in range(150):
+        names, fds, primary_key = random_schema(seed)
+        tables, lossless, _ = normalize(
+            names, fds, primary_key, target, synthesize=synthesize
+        )
+        attrs = [set(t.attr_names()) for t in tables]
+        assert lossless is True
+        assert brute_lossless(names, fds, attrs)
+        if target != "2NF":
+            assert not any(brute_violates(fds, table, target) for table in attrs)
+
+
+# Wider schemas whose tables kept dependencies that only arise in their projection: {A1, A0} -> {A7} in seed 94, and
+# {A0, A1} -> {A8} in seed 37, which only holds through A5 and A6 together
+@pytest.mark.parametrize("seed, width, count", [(94, 8, 7), (37, 9, 9), (166, 9, 9)])
+@pytest.mark.parametrize("target", ["3NF", "BCNF"])
+def test_projected_dependencies_are_normalized(seed, width, count, target):
+    names, fds, primary_key = random_schema(seed, width, count)
+    tables, lossless, _ = normalize(names, fds, primary_key, target)
+    attrs = [set(t.attr_names()) for t in tables]
+    assert lossless is True
+    assert not any(brute_violates(fds, table, target) for table in attrs)
+
+
+def test_four_nf_piece_already_present_hands_over_its_fds(monkeypatch):
+    relation = make_relation(
+        ["A", "B", "C", "D"], [(["A"], ["B"]), (["C"], ["D"])], ["A", "C"]
+    )
+    attr_table = relation.attr_table
+
+    # Stands in for an MVD split of {A, C} whose first piece has the attributes of the 2NF table {A, B}
+    def four_nf(self, data_source=None, interactive=True):
+        if self.attr_names() != ["A", "C"]:
+            return []
+        pieces = [(["A", "B"], [(["B"], ["A"])]), (["A", "C"], [])]
+        return [
+            main.Relation(
+                "Piece",
+                attr_table.typed(names),
+                names,
+                [],
+                [],
+                fds=[
+                    main.FunctionalDependency(det, [deps], attr_table)
+                    for det, deps in fds
+                ],
+                attr_table=attr_table,
+            )
+            for names, fds in pieces
+        ]
+
+    monkeypatch.setattr(main.Relation, "four_nf", four_nf)
+    tables, _, _ = main.normalize(relation, "4NF", interactive=False)
+    (table,) = [table for table in tables if table.attr_names() == ["A", "B"]]
+    assert table.name == "AData"
+    assert sorted(map(str, table.fds)) == ["{A} -> {B}", "{B} -> {A}"]
+
+
+def test_two_nf_leaves_mvds_for_four_nf():
+    # {K} -> {A} splits A off in 2NF; {K} ->> {M} has A among its dependents but must stay for 4NF to split {K, L, M}
+    rows = [(k, l, m, k * 10) for k in range(2) for l in range(2) for m in range(2)]
+    relation = make_relation(
+        ["K", "L", "M", "A"], [(["K"], ["A"])], ["K", "L", "M"], data=rows
+    )
+    relation.fds.append(
+        main.FunctionalDependency(["K"], [["M"], ["L", "A"]], relation.attr_table)
+    )
+    tables, lossless, _ = main.normalize(relation, "4NF", interactive=False)
+    assert sorted(table.attr_names() for table in tables) == [
+        ["K", "A"],
+        ["K", "L"],
+        ["K", "M"],
+    ]
+    assert lossless is True
+
+
+def test_mvds_follow_their_determinant_out_of_the_table():
+    # B and K determine each other and the key holds B, so normalizing moves K out of {K, L, M, B, C}; {K} ->> {M}
+    # then only holds there as {B} ->> {M}
+    rows = [
+        (k, l, m, k + 10, k + 20) for k in range(2) for l in range(2) for m in range(2)
+    ]
+    relation = make_relation(
+        ["K", "L", "M", "B", "C"],
+        [(["B"], ["K"]), (["K"], ["B", "C"])],
+        ["B", "L", "M"],
+        data=rows,
+    )
+    relation.fds.append(
+        main.FunctionalDependency(["K"], [["M"], ["L", "B", "C"]], relation.attr_table)
+    )
+    tables, lossless, _ = main.normalize(relation, "4NF", interactive=False)
+    assert sorted(sorted(table.attr_names()) for table in tables) == [
+        ["B", "C"],
+        ["B", "K"],
+        ["B", "L"],
+        ["B", "M"],
+    ]
+    assert lossless is True
@@ -0,0 +1,163 @@
+import datetime
+import decimal
+
+import pytest
+
+import main
+from conftest import make_relation
+
+
+def test_remove_attributes_projects_the_data_once(monkeypatch):
+    relation = make_relation(
+        ["A", "B", "C", "D"],
+        [(["A"], ["B", "C", "D"])],
+        ["A"],
+        data=[(1, 1, 1, 1), (2, 1, 1, 2), (3, 2, 1, 2)],
+    )
+    calls = []
+    project = main.ColumnStore.project
+    monkeypatch.setattr(
+        main.ColumnStore,
+        "project",
+        lambda store, *args, **kwargs: calls.append(args)
+        or project(store, *args, **kwargs),
+    )
+    removed = relation.remove_attributes(relation.mask(["B", "D", "E"]))
+    assert removed == [["B", "INTEGER"], ["D", "INTEGER"]]
+    assert relation.attr_names() == ["A", "C"]
+    assert len(calls) == 1
+    assert sorted(map(tuple, relation.data)) == [(1, 1), (2, 1), (3, 1)]
+
+
+def test_column_store_encodes_values_once_per_column():
+    store = main.ColumnStore(["A", "B"], [[1, "x"], [2, "y"]])
+    store.extend([[1, "y"], [3, "x"]])
+    store.append([2, "z"])
+    assert list(store) == [[1, "x"], [2, "y"], [1, "y"], [3, "x"], [2, "z"]]
+    assert store.values == [[1, 2, 3], ["x", "y", "z"]]
+    assert list(store.columns[0]) == [0, 1, 0, 2, 1]
+
+
+def test_project_keeps_the_first_of_each_tuple():
+    store = main.ColumnStore(["A", "B", "C"], [[1, 1, 1], [2, 1, 2], [1, 1, 3]])
+    assert list(store.project(["B", "A"])) == [[1, 1], [1, 2]]
+    assert list(store.project(["A"], distinct=False)) == [[1], [2], [1]]
+
+
+def test_group_by_collects_the_rows_of_each_key():
+    store = main.ColumnStore(["A", "B"], [[1, "x"], [2, "y"], [1, "y"], [1, "x"]])
+    groups = {
+        tuple(store.values[0][code] for code in key): list(rows)
+        for key, rows in store.group_by(["A"]).items()
+    }
+    assert groups == {(1,): [0, 2, 3], (2,): [1]}
+    assert len(store.group_by(["A", "B"])) == 3
+    # Without columns every row shares the empty key
+    assert {key: list(rows) for key, rows in store.group_by([]).items()} == {
+        (): [0, 1, 2, 3]
+    }
+
+
+def test_read_rows_warns_about_skipped_lines_when_quiet(capsys):
+    lines = ["A, B", "1, 2", "3", "x, 4", "5, 6"]
+    chunks = list(main.read_rows(lines, [["A", "INTEGER"], ["B", "INTEGER"]]))
+    assert chunks == [[[1, 2], [5, 6]]]
+    assert capsys.readouterr().out.splitlines() == [
+        "Skipping line 3: expected 2 values but found 1.",
+        "Skipping line 4: invalid literal for int() with base 10: 'x'",
+    ]
+
+
+def test_load_data_converts_each_value_to_its_type(tmp_path):
+    path = tmp_path / "orders.csv"
+    path.write_text(
+        "Note, Cost, ID, Day\n"
+        '"Large, iced", "$1,234.50", 1, 2024-02-29\n'
+        ", $3, 2, \n"
+    )
+    relation = main.Relation(
+        "Orders",
+        [["ID", "INTEGER"], ["Day", "DATE"], ["Cost", "MONEY"], ["Note", "TEXT"]],
+        ["ID"],
+        [],
+        [],
+    )
+    assert relation.load_data(str(path), chunk_size=1) == 2
+    assert list(relation.data) == [
+        [1, datetime.date(2024, 2, 29), decimal.Decimal("1234.50"), "Large, iced"],
+        [2, None, decimal.Decimal("3"), ""],
+    ]
+
+
+def test_parse_schema_reads_every_table_with_its_data():
+    lines = [
+        "Table: Customers",
+        "Attributes: ID:INTEGER, Name:VARCHAR(20)",
+        "Primary Key: {ID}",
+        "Candidate Keys: None",
+        "Multi-Valued Attributes: None",
+        "Functional Dependencies:",
+        "{ID} -> {Name}",
+        "Data:",
+        "1, Ann",
+        "2, Bo",
+        "",
+        "Relation: Orders",
+        "Attributes: OrderID:INTEGER, ID:INTEGER, Item:TEXT, Size:TEXT",
+        "Primary Key: {OrderID, Item}",
+        "Candidate Keys: {OrderID, Size}",
+        "Multi-Valued Attributes: Item",
+        "Functional Dependencies:",
+        "{OrderID} -> {ID}",
+        "{OrderID} ->> {Item} | {Size}",
+    ]
+    customers, orders = main.parse_schema(lines)
+    assert customers.name == "Customers"
+    assert customers.attributes == [["ID", "INTEGER"], ["Name", "VARCHAR(20)"]]
+    assert [str(fd) for fd in customers.fds] == ["{ID} -> {Name}"]
+    assert list(customers.data) == [[1, "Ann"], [2, "Bo"]]
+    assert orders.name == "Orders"
+    assert orders.primary_key == ["OrderID", "Item"]
+    assert orders.candidate_keys == [["OrderID", "Size"]]
+    assert orders.multivalued_attributes == ["Item"]
+    assert [str(fd) for fd in orders.fds] == [
+        "{OrderID} -> {ID}",
+        "{OrderID} ->> {Item} | {Size}",
+    ]
+    assert list(orders.data) == []
+
+
+def test_snapshots_reject_changes_and_outlive_edits_to_the_relation():
+    relation = make_relation(
+        ["A", "B", "C"],
+        [(["A"], ["B", "C"]), (["B"], ["C"])],
+        ["A"],
+        data=[(1, 1, 1), (2, 1, 1)],
+    )
+    fd = relation.fds[0]
+    for name in ["determinant", "det_mask"]:
+        with pytest.raises(AttributeError):
+            setattr(fd, name, ())
+    with pytest.raises(AttributeError):
+        fd.extra = 1
+    assert fd.remove_dep("C") is not fd and fd.dependents == (("B", "C"),)
+
+    snapshot = relation.snapshot()
+    with pytest.raises(AttributeError):
+        snapshot.name = "S"
+    with pytest.raises(AttributeError):
+        del snapshot.fds
+    assert isinstance(snapshot.attributes, tuple)
+    assert isinstance(snapshot.fds, tuple)
+
+    # BCNF splits off {B, C} and drops C from the relation
+    assert len(relation.bcnf()) == 1
+    assert relation.attr_names() == ["A", "B"]
+    relation.name = "Changed"
+    assert snapshot.name == "R"
+    assert snapshot.attributes == (("A", "INTEGER"), ("B", "INTEGER"), ("C", "INTEGER"))
+    assert [str(fd) for fd in snapshot.fds] == ["{A} -> {B, C}", "{B} -> {C}"]
+    assert list(snapshot.data) == [[1, 1, 1], [2, 1, 1]]
+    copy = snapshot.relation()
+    assert copy.attr_names() == ["A", "B", "C"]
+    assert list(copy.data) == [[1, 1, 1], [2, 1, 1]]